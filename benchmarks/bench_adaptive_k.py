@@ -0,0 +1,131 @@
+# benchmarks/bench_adaptive_k.py
+"""
+Compare adaptive top-k retrieval with a fixed k of 3.
+
+For each query from data/medical_df.csv both retrievers fetch context and
+the app's prompt is built from it. Reports chunks sent per query (overall
+and per intent), prompt tokens (tiktoken), and retrieval latency. With
+--generate N, the first N queries are also answered by the LLM with each
+retriever's context to compare time to first token and total latency.
+Context compression is off unless --compress is given, so only k differs.
+Adaptive k only applies to dense retrieval, so run with HYBRID_RETRIEVAL=0
+when the store has a BM25 index.
+
+    HYBRID_RETRIEVAL=0 python benchmarks/bench_adaptive_k.py --queries 500 --generate 30
+"""
+
+import os
+import sys
+import time
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.vectorstore import load_vectorstore
+from src.chatbot.hybrid_retriever import make_retriever, ADAPTIVE_MIN_K, ADAPTIVE_MAX_K
+from src.chatbot.context_compressor import ContextCompressor, TokenCounter
+from src.chatbot.pipeline import create_llm, set_custom_prompt
+from src.chatbot.onnx_embeddings import load_embedding_model, EMBEDDING_MODEL_NAME
+from benchmarks.common import DB_FAISS_PATH, QUERIES_PATH, read_rows, sample, percentile_ms
+
+FIXED_K = 3
+
+
+def load_queries(path, count, seed=42):
+    """(query, intent) pairs"""
+    rows = [(row["query"], row.get("intent") or "unknown") for row in read_rows(path) if row.get("query")]
+    return sample(rows, count, np.random.default_rng(seed))
+
+
+def build_prompt(prompt, query, docs):
+    return prompt.format(context="\n\n".join(doc.page_content for doc in docs), question=query)
+
+
+def retrieve_all(retriever, queries):
+    contexts, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        contexts.append(retriever.invoke(query))
+        latencies.append(time.perf_counter() - start)
+    return contexts, latencies
+
+
+def generate(llm, prompts):
+    first_tokens, totals = [], []
+    for prompt in prompts:
+        start = time.perf_counter()
+        first = None
+        for chunk in llm.stream(prompt):
+            if first is None and getattr(chunk, "content", chunk):
+                first = time.perf_counter() - start
+        totals.append(time.perf_counter() - start)
+        first_tokens.append(first if first is not None else totals[-1])
+    return first_tokens, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-path", default=DB_FAISS_PATH)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--generate", type=int, default=0, help="queries also answered by the LLM")
+    parser.add_argument("--endpoint", help="LLM endpoint, e.g. the stub server from stub_llm_server.py")
+    parser.add_argument("--compress", action="store_true", help="compress the context as the app can")
+    args = parser.parse_args()
+
+    db = load_vectorstore(args.db_path, load_embedding_model(EMBEDDING_MODEL_NAME))
+    retrievers = {
+        f"fixed k={FIXED_K}": make_retriever(db, k=FIXED_K, adaptive=False),
+        f"adaptive {ADAPTIVE_MIN_K}-{ADAPTIVE_MAX_K}": make_retriever(db, k=FIXED_K, adaptive=True),
+    }
+    compressor = ContextCompressor(db.embeddings) if args.compress else None
+    rows = load_queries(QUERIES_PATH, args.queries)
+    queries = [query for query, _ in rows]
+    prompt = set_custom_prompt()
+    counter = TokenCounter()
+    # Load models and warm caches before timing
+    for retriever in retrievers.values():
+        retriever.invoke(queries[0])
+
+    results = {}
+    for name, retriever in retrievers.items():
+        contexts, latencies = retrieve_all(retriever, queries)
+        prompt_contexts = contexts
+        if compressor is not None:
+            prompt_contexts = [compressor.compress(query, docs) for query, docs in zip(queries, contexts)]
+        prompts = [build_prompt(prompt, query, docs) for query, docs in zip(queries, prompt_contexts)]
+        results[name] = (contexts, latencies, prompts, counter.count_many(prompts))
+
+    print(f"{len(queries)} queries, compression {'on' if args.compress else 'off'}\n")
+    print(f"{'retriever':<16} {'chunks':>7} {'1_chunk':>8} {'tok_mean':>9} {'tok_p95':>8} "
+          f"{'ret_p50':>8} {'ret_p95':>8}")
+    for name, (contexts, latencies, _, tokens) in results.items():
+        chunks = [len(docs) for docs in contexts]
+        print(f"{name:<16} {np.mean(chunks):>7.2f} {np.mean([n == 1 for n in chunks]):>8.1%} "
+              f"{np.mean(tokens):>9.0f} {np.percentile(tokens, 95):>8.0f} "
+              f"{percentile_ms(latencies, 50):>8.1f} {percentile_ms(latencies, 95):>8.1f}")
+    fixed_tokens = np.mean(results[f"fixed k={FIXED_K}"][3])
+    adaptive_name = list(results)[1]
+    print(f"\nAdaptive prompt tokens vs fixed: {np.mean(results[adaptive_name][3]) / fixed_tokens - 1:+.1%}")
+
+    print("\nAdaptive chunks per query by intent:")
+    by_intent = defaultdict(list)
+    for (_, intent), docs in zip(rows, results[adaptive_name][0]):
+        by_intent[intent].append(len(docs))
+    for intent, chunks in sorted(by_intent.items(), key=lambda item: -len(item[1])):
+        print(f"  {intent:<24} {np.mean(chunks):>5.2f}  (n={len(chunks)})")
+
+    if args.generate:
+        llm = create_llm(**({"endpoint": args.endpoint} if args.endpoint else {}))
+        print(f"\nLLM latency over {min(args.generate, len(queries))} queries")
+        print(f"{'retriever':<16} {'ttft_p50':>9} {'ttft_p95':>9} {'total_p50':>10} {'total_p95':>10}")
+        for name, (_, _, prompts, _) in results.items():
+            first_tokens, totals = generate(llm, prompts[:args.generate])
+            print(f"{name:<16} {percentile_ms(first_tokens, 50):>9.0f} {percentile_ms(first_tokens, 95):>9.0f} "
+                  f"{percentile_ms(totals, 50):>10.0f} {percentile_ms(totals, 95):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
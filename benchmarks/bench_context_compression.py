@@ -0,0 +1,73 @@
+# benchmarks/bench_context_compression.py
+"""
+Measure prompt tokens saved by sentence-level context compression.
+
+For each query from data/medical_df.csv the top k chunks are retrieved and
+the app's prompt is built twice: with the chunks verbatim, as the "stuff"
+chain did, and with the sentences the ContextCompressor keeps. Token counts
+use tiktoken. Reports the average and percentile prompt tokens per budget,
+the average reduction, and the compression latency.
+
+    python benchmarks/bench_context_compression.py --budgets 150 200 300 --queries 500
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.vectorstore import load_vectorstore
+from src.chatbot.hybrid_retriever import make_retriever
+from src.chatbot.context_compressor import ContextCompressor, TokenCounter, CONTEXT_TOKEN_BUDGET
+from src.chatbot.pipeline import set_custom_prompt, RETRIEVER_K
+from src.chatbot.onnx_embeddings import load_embedding_model, EMBEDDING_MODEL_NAME
+from benchmarks.common import DB_FAISS_PATH, QUERIES_PATH, load_queries, percentile_ms
+
+
+def prompt_tokens(prompt, counter, query, docs):
+    context = "\n\n".join(doc.page_content for doc in docs)
+    return counter.count(prompt.format(context=context, question=query))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-path", default=DB_FAISS_PATH)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[CONTEXT_TOKEN_BUDGET])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=RETRIEVER_K)
+    args = parser.parse_args()
+
+    embeddings = load_embedding_model(EMBEDDING_MODEL_NAME)
+    db = load_vectorstore(args.db_path, embeddings)
+    retriever = make_retriever(db, k=args.k)
+    prompt = set_custom_prompt()
+    counter = TokenCounter()
+    queries = load_queries(QUERIES_PATH, args.queries)
+
+    retrieved = [retriever.invoke(query) for query in queries]
+    vectors = [embeddings.embed_query(query) for query in queries]
+    baseline = [prompt_tokens(prompt, counter, query, docs) for query, docs in zip(queries, retrieved)]
+    print(f"{len(queries)} queries, top {args.k} chunks, tokenizer {counter.encoding_name}")
+    print(f"uncompressed prompt: mean {np.mean(baseline):.0f} tokens, p95 {np.percentile(baseline, 95):.0f}\n")
+
+    print(f"{'budget':>6} {'mean_tok':>9} {'p95_tok':>8} {'saved':>7} {'p50_ms':>7} {'p95_ms':>7}")
+    for budget in args.budgets:
+        compressor = ContextCompressor(embeddings, token_budget=budget, counter=counter)
+        tokens, latencies = [], []
+        for query, vector, docs in zip(queries, vectors, retrieved):
+            start = time.perf_counter()
+            compressed = compressor.compress(query, docs, query_vector=vector)
+            latencies.append(time.perf_counter() - start)
+            tokens.append(prompt_tokens(prompt, counter, query, compressed))
+
+        saved = 1 - np.mean(tokens) / np.mean(baseline)
+        print(f"{budget:>6} {np.mean(tokens):>9.0f} {np.percentile(tokens, 95):>8.0f} {saved:>7.1%} "
+              f"{percentile_ms(latencies, 50):>7.1f} {percentile_ms(latencies, 95):>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_embeddings.py
+"""
+Compare the PyTorch and ONNX int8 embedding backends.
+
+Parity: cosine similarity between torch and ONNX vectors for the same text,
+plus top-k neighbour overlap on the query set. The run exits non-zero when
+the minimum cosine falls below --min-cosine, so it doubles as a check.
+
+Speed: batch throughput (texts/s) for document embedding and single-query
+latency percentiles, which is what every chat turn pays.
+
+    python benchmarks/bench_embeddings.py --queries 500 --min-cosine 0.98
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.onnx_embeddings import load_embedding_model, EMBEDDING_MODEL_NAME
+from benchmarks.common import QUERIES_PATH, read_rows, sample, percentile_ms
+
+
+def load_texts(path, count, seed=42):
+    """Queries and answers from the dataset, standing in for chat queries and chunks"""
+    rows = read_rows(path)
+    queries = [row["query"] for row in rows if row.get("query")]
+    documents = [row["answer"] for row in rows if row.get("answer")]
+    rng = np.random.default_rng(seed)
+    return sample(queries, count, rng), sample(documents or queries, count, rng)
+
+
+def throughput(model, texts, repeats):
+    model.embed_documents(texts[:8])  # warm up
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.embed_documents(texts)
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best
+
+
+def query_latency(model, queries):
+    model.embed_query(queries[0])  # warm up
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        model.embed_query(query)
+        latencies.append(time.perf_counter() - start)
+    return percentile_ms(latencies, 50), percentile_ms(latencies, 95), percentile_ms(latencies, 99)
+
+
+def topk_overlap(reference, candidate, corpus_reference, corpus_candidate, k):
+    ref_ids = np.argsort(-reference @ corpus_reference.T, axis=1)[:, :k]
+    cand_ids = np.argsort(-candidate @ corpus_candidate.T, axis=1)[:, :k]
+    return float(np.mean([len(set(r) & set(c)) / k for r, c in zip(ref_ids, cand_ids)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    args = parser.parse_args()
+
+    queries, documents = load_texts(QUERIES_PATH, args.queries)
+    print(f"{len(queries)} queries, {len(documents)} documents from {QUERIES_PATH}\n")
+
+    backends = {
+        "torch": load_embedding_model(EMBEDDING_MODEL_NAME, "torch"),
+        "onnx": load_embedding_model(EMBEDDING_MODEL_NAME, "onnx")
+    }
+
+    vectors = {}
+    for name, model in backends.items():
+        vectors[name] = (np.asarray(model.embed_documents(queries), dtype=np.float32),
+                         np.asarray(model.embed_documents(documents), dtype=np.float32))
+
+    torch_queries, torch_docs = vectors["torch"]
+    onnx_queries, onnx_docs = vectors["onnx"]
+    cosines = np.concatenate([np.sum(torch_queries * onnx_queries, axis=1),
+                              np.sum(torch_docs * onnx_docs, axis=1)])
+    overlap = topk_overlap(torch_queries, onnx_queries, torch_docs, onnx_docs, args.k)
+    print(f"Parity: cosine mean {cosines.mean():.4f}, min {cosines.min():.4f}, "
+          f"p1 {np.percentile(cosines, 1):.4f}; top-{args.k} overlap {overlap:.3f}\n")
+
+    print(f"{'backend':<8} {'docs/s':>9} {'q_p50_ms':>9} {'q_p95_ms':>9} {'q_p99_ms':>9}")
+    for name, model in backends.items():
+        rate = throughput(model, documents, args.repeats)
+        p50, p95, p99 = query_latency(model, queries)
+        print(f"{name:<8} {rate:>9.1f} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f}")
+
+    if cosines.min() < args.min_cosine:
+        print(f"\n❌ Minimum cosine {cosines.min():.4f} is below {args.min_cosine}")
+        sys.exit(1)
+    print(f"\n✅ All vectors within cosine {args.min_cosine} of the torch output")
+
+
+if __name__ == "__main__":
+    main()
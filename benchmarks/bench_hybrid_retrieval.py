@@ -0,0 +1,90 @@
+# benchmarks/bench_hybrid_retrieval.py
+"""
+Compare dense, BM25 and hybrid (RRF) retrieval on the built knowledge base.
+
+Recall: known-item search. For sampled chunks a query is made from a window
+of the chunk's words with some words dropped, and recall@k is the share of
+queries whose source chunk is in the top k. Latency: per-query p50/p95 on
+the questions in data/medical_df.csv.
+
+    python benchmarks/bench_hybrid_retrieval.py --samples 300 --k 3
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.vectorstore import load_vectorstore, resolve_store_path
+from src.chatbot.lexical_index import load_lexical_index
+from src.chatbot.hybrid_retriever import HybridRetriever, dense_search, embed_query
+from src.chatbot.onnx_embeddings import load_embedding_model, EMBEDDING_MODEL_NAME
+from benchmarks.common import DB_FAISS_PATH, QUERIES_PATH, load_queries, percentile_ms
+
+
+def known_item_queries(db, count, window=12, drop=0.3, seed=7):
+    """(query, chunk id) pairs built from noisy excerpts of sampled chunks"""
+    rng = np.random.default_rng(seed)
+    mapping = db.index_to_docstore_id
+    positions = rng.choice(db.index.ntotal, min(count, db.index.ntotal), replace=False)
+    pairs = []
+    for position in positions:
+        doc_id = mapping[int(position)]
+        words = db.docstore.search(doc_id).page_content.split()
+        if len(words) < window:
+            continue
+        start = int(rng.integers(0, len(words) - window + 1))
+        kept = [w for w in words[start:start + window] if rng.random() > drop]
+        pairs.append((" ".join(kept), doc_id))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-path", default=DB_FAISS_PATH)
+    parser.add_argument("--samples", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    args = parser.parse_args()
+
+    _, store_path = resolve_store_path(args.db_path)
+    db = load_vectorstore(store_path, load_embedding_model(EMBEDDING_MODEL_NAME))
+    lexical = load_lexical_index(store_path)
+    if lexical is None:
+        sys.exit(f"No BM25 index in {store_path}; run src/chatbot/memory_LLM.py first")
+    hybrid = HybridRetriever(vectorstore=db, lexical_index=lexical, k=args.k, fetch_k=args.fetch_k)
+    mapping = db.index_to_docstore_id
+
+    methods = {
+        "dense": lambda q: dense_search(db, embed_query(db, q), args.k)[0],
+        "bm25": lambda q: [mapping[p] for p, _ in lexical.search(q, args.k)],
+        "hybrid": lambda q: [doc.id for doc in hybrid.invoke(q)]
+    }
+
+    pairs = known_item_queries(db, args.samples)
+    queries = load_queries(QUERIES_PATH, args.queries)
+    print(f"Corpus: {db.index.ntotal} chunks, {len(lexical.vocabulary)} terms; "
+          f"{len(pairs)} known-item queries, {len(queries)} latency queries\n")
+
+    print(f"{'method':<8} {'recall@' + str(args.k):>9} {'p50_ms':>8} {'p95_ms':>8}")
+    for name, search in methods.items():
+        search(queries[0])  # warm up
+        found = sum(doc_id in search(query) for query, doc_id in pairs)
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            search(query)
+            latencies.append(time.perf_counter() - start)
+
+        print(f"{name:<8} {found / max(len(pairs), 1):>9.3f} "
+              f"{percentile_ms(latencies, 50):>8.2f} {percentile_ms(latencies, 95):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_index_load.py
+"""
+Measure vector store load time and resident memory with and without mmap.
+
+Each measurement runs in a fresh process so page-cache sharing is visible:
+RssAnon is private heap, RssFile is file-backed pages that several app
+processes on one host share. The first search is timed separately because
+with mmap the index pages are faulted in lazily.
+
+    python benchmarks/bench_index_load.py --runs 3
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import DB_FAISS_PATH
+
+
+def memory_status():
+    """Resident memory of this process in MB, split into anonymous and file-backed pages"""
+    status = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                status[key] = int(value.split()[0]) / 1024
+    return status
+
+
+def child(db_path, mmap):
+    import numpy as np
+    from src.chatbot.vectorstore import load_vectorstore
+
+    before = memory_status()
+    start = time.perf_counter()
+    db = load_vectorstore(db_path, embedding_model=None, mmap=mmap)
+    load_seconds = time.perf_counter() - start
+    after_load = memory_status()
+
+    query = np.random.default_rng(0).standard_normal((1, db.index.d)).astype(np.float32)
+    start = time.perf_counter()
+    db.index.search(query, 3)
+    first_search_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        "load_s": load_seconds,
+        "first_search_ms": first_search_seconds * 1000,
+        "rss_mb": after_load["VmRSS"] - before["VmRSS"],
+        "anon_mb": after_load["RssAnon"] - before["RssAnon"],
+        "file_mb": after_load["RssFile"] - before["RssFile"],
+        "ntotal": db.index.ntotal
+    }))
+
+
+def run(db_path, mmap):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--db-path", db_path,
+         "--mmap" if mmap else "--no-mmap"],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-path", default=DB_FAISS_PATH)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mmap", dest="mmap", action="store_true", default=True)
+    parser.add_argument("--no-mmap", dest="mmap", action="store_false")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.db_path, args.mmap)
+        return
+
+    print(f"{'mode':<8} {'run':>3} {'load_s':>8} {'1st_ms':>8} {'rss_mb':>8} {'anon_mb':>8} {'file_mb':>8}")
+    for mmap in (False, True):
+        for i in range(args.runs):
+            result = run(args.db_path, mmap)
+            print(f"{'mmap' if mmap else 'heap':<8} {i + 1:>3} {result['load_s']:>8.3f} "
+                  f"{result['first_search_ms']:>8.2f} {result['rss_mb']:>8.1f} "
+                  f"{result['anon_mb']:>8.1f} {result['file_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_index_types.py
+"""
+Compare FAISS index types on the built knowledge base.
+
+Reports recall@k against the exact flat index, single-query search latency
+and serialized index size for flat, HNSW, IVF-Flat and IVF-PQ across a sweep
+of efSearch / nprobe values. Queries come from data/medical_df.csv.
+
+    python benchmarks/bench_index_types.py --queries 500
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.index_factory import (IndexSpec, build_index, apply_search_params, index_type_of,
+                                      FLAT_INDEX_FILENAME)
+from src.chatbot.vectorstore import resolve_store_path
+from src.chatbot.onnx_embeddings import load_embedding_model, EMBEDDING_MODEL_NAME
+from benchmarks.common import DB_FAISS_PATH, QUERIES_PATH, load_queries, percentile_ms
+
+
+def embed_queries(queries):
+    """Query vectors from the same model and backend the app serves with"""
+    model = load_embedding_model(EMBEDDING_MODEL_NAME)
+    return np.asarray(model.embed_documents(queries), dtype=np.float32)
+
+
+def measure(index, query_vectors, ground_truth, k):
+    latencies = []
+    hits = 0
+    for i, vector in enumerate(query_vectors):
+        start = time.perf_counter()
+        _, ids = index.search(vector.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(ids[0]) & set(ground_truth[i]))
+    return {
+        "recall": hits / (len(query_vectors) * k),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "size_mb": faiss.serialize_index(index).nbytes / 1e6
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-path", default=DB_FAISS_PATH)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    _, store_path = resolve_store_path(args.db_path)
+    flat = faiss.read_index(os.path.join(store_path, FLAT_INDEX_FILENAME))
+    vectors = flat.reconstruct_n(0, flat.ntotal)
+    print(f"Corpus: {flat.ntotal} vectors of dim {flat.d}")
+
+    query_vectors = embed_queries(load_queries(QUERIES_PATH, args.queries))
+    _, ground_truth = flat.search(query_vectors, args.k)
+    print(f"Queries: {len(query_vectors)}, recall measured @{args.k} against flat\n")
+
+    sweeps = [
+        ("flat", [{}]),
+        ("hnsw", [{"ef_search": ef} for ef in (16, 32, 64, 128)]),
+        ("ivf_flat", [{"nprobe": n} for n in (1, 4, 8, 16, 32)]),
+        ("ivf_pq", [{"nprobe": n} for n in (1, 4, 8, 16, 32)]),
+    ]
+
+    print(f"{'index':<10} {'params':<16} {'build_s':>8} {'recall':>7} {'p50_ms':>8} {'p95_ms':>8} {'size_mb':>8}")
+    for index_type, search_sweep in sweeps:
+        spec = IndexSpec(index_type=index_type)
+        start = time.perf_counter()
+        index = build_index(vectors, spec)
+        build_seconds = time.perf_counter() - start
+        built_type = index_type_of(index)
+
+        for search_params in search_sweep:
+            apply_search_params(index, search_params)
+            result = measure(index, query_vectors, ground_truth, args.k)
+            label = ",".join(f"{key}={value}" for key, value in search_params.items()) or "-"
+            print(f"{built_type:<10} {label:<16} {build_seconds:>8.2f} {result['recall']:>7.3f} "
+                  f"{result['p50_ms']:>8.3f} {result['p95_ms']:>8.3f} {result['size_mb']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_rerank.py
+"""
+Measure cross-encoder rerank latency for different candidate counts.
+
+For each query from data/medical_df.csv the top N chunks are fetched from
+the vector store and scored in one batched CPU pass. Reports p50/p95/p99
+rerank latency per N and how often reranking changes the top k compared
+with vector order.
+
+    python benchmarks/bench_rerank.py --candidates 10 20 50 --queries 200
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.vectorstore import load_vectorstore
+from src.chatbot.reranker import CrossEncoderReranker, RERANK_MODEL_NAME
+from src.chatbot.onnx_embeddings import load_embedding_model, EMBEDDING_MODEL_NAME
+from benchmarks.common import DB_FAISS_PATH, QUERIES_PATH, load_queries, percentile_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-path", default=DB_FAISS_PATH)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 20, 50])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--model", default=RERANK_MODEL_NAME)
+    args = parser.parse_args()
+
+    db = load_vectorstore(args.db_path, load_embedding_model(EMBEDDING_MODEL_NAME))
+    reranker = CrossEncoderReranker(args.model, batch_size=max(args.candidates))
+    queries = load_queries(QUERIES_PATH, args.queries)
+    reranker.warmup(max(args.candidates))
+
+    # Retrieve once at the largest N; smaller N are prefixes of the same ranking
+    retrieved = [db.similarity_search(query, k=max(args.candidates)) for query in queries]
+    print(f"{len(queries)} queries, model {args.model}, top {args.k} kept\n")
+
+    print(f"{'cands':>5} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'ms/cand':>8} {'top_k_changed':>14}")
+    for n in args.candidates:
+        latencies, changed = [], 0
+        for query, docs in zip(queries, retrieved):
+            candidates = docs[:n]
+            start = time.perf_counter()
+            scores = reranker.score(query, candidates)
+            latencies.append(time.perf_counter() - start)
+            reranked = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)[:args.k]
+            changed += set(reranked) != set(range(min(args.k, len(candidates))))
+
+        print(f"{n:>5} {percentile_ms(latencies, 50):>8.1f} {percentile_ms(latencies, 95):>8.1f} "
+              f"{percentile_ms(latencies, 99):>8.1f} {percentile_ms(latencies, 50) / n:>8.2f} "
+              f"{changed / len(queries):>14.1%}")
+
+
+if __name__ == "__main__":
+    main()
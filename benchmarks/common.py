@@ -0,0 +1,34 @@
+# benchmarks/common.py
+"""
+Paths and helpers shared by the benchmark scripts.
+
+Queries are sampled from data/medical_df.csv with a fixed seed, so every
+benchmark run (and every variant within one) sees the same inputs.
+"""
+
+import csv
+
+import numpy as np
+
+DB_FAISS_PATH = "vectorstore/db_faiss"
+QUERIES_PATH = "data/medical_df.csv"
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def sample(items, count, rng):
+    """Up to count items picked without replacement, in their original order"""
+    picked = rng.choice(len(items), min(count, len(items)), replace=False)
+    return [items[i] for i in sorted(picked)]
+
+
+def load_queries(path, count, seed=42):
+    queries = [row["query"] for row in read_rows(path) if row.get("query")]
+    return sample(queries, count, np.random.default_rng(seed))
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
@@ -0,0 +1,181 @@
+# benchmarks/load_test.py
+"""
+Headless load test of the chat turn: classify -> retrieve -> generate -> save.
+
+Simulated users each get their own account and chat session and replay
+queries from data/medical_df.csv through ChatPipeline, the same stages
+the Streamlit app runs per message. Generation goes to a local stub of
+the Mistral API (see stub_llm_server.py) unless --llm-url points at
+another endpoint, and messages are saved to a throwaway SQLite database
+unless --database-url is given. --answer-cache and --memory turn on the
+semantic answer cache (in memory, starting empty) and conversation memory
+as the app runs them; without them those stages are not exercised.
+Reports throughput and p50/p95/p99 per stage.
+
+    python benchmarks/load_test.py --users 8 --requests 25 --llm-latency-ms 400
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import threading
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import DB_FAISS_PATH, QUERIES_PATH, load_queries, percentile_ms
+
+STAGES = ["classify", "cache_lookup", "embed", "vector_search", "lexical_search", "docstore", "rerank", "compress", "retrieve",
+          "first_token", "generate", "coalesced", "encrypt", "db_write", "save", "memory_load", "memory_update",
+          "total"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-path", default=DB_FAISS_PATH)
+    parser.add_argument("--users", type=int, default=8, help="concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=25, help="chat turns per user")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="run for this many seconds instead of a fixed number of turns")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a user's turns")
+    parser.add_argument("--queries", type=int, default=500, help="distinct queries sampled from the dataset")
+    parser.add_argument("--no-classifier", action="store_true", help="skip intent classification")
+    parser.add_argument("--no-coalesce", action="store_true",
+                        help="give every turn its own LLM call even when users ask the same thing at once")
+    parser.add_argument("--answer-cache", action="store_true", help="reuse answers to similar questions")
+    parser.add_argument("--memory", action="store_true",
+                        help="keep conversation memory, folding old turns with the LLM in the background")
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--llm-url", default=None, help="use this endpoint instead of starting the stub")
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0)
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # db_manager reads DATABASE_URL when src.database is first imported
+    scratch = None
+    if args.database_url is None:
+        scratch = tempfile.TemporaryDirectory(prefix="load_test_")
+        args.database_url = f"sqlite:///{os.path.join(scratch.name, 'load_test.db')}"
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from src.database.database import init_database
+    from src.database.user_manager import UserManager, SessionManager
+    from src.chatbot.index_reloader import HotSwapIndex
+    from src.chatbot.onnx_embeddings import load_embedding_model, EMBEDDING_MODEL_NAME
+    from src.chatbot.pipeline import ChatPipeline, create_llm, build_qa_chain
+    from src.chatbot.answer_cache import SemanticAnswerCache
+    from src.chatbot.conversation_memory import ConversationMemoryStore, ConversationSummarizer
+    from src.chatbot.llm_governor import llm_governor, LLM_GOVERNOR_ENABLED
+    from stub_llm_server import StubSettings, start_stub_server
+
+    if not init_database():
+        sys.exit(f"Could not initialize database at {args.database_url}")
+
+    server, llm_url = None, args.llm_url
+    if llm_url is None:
+        settings = StubSettings(args.llm_latency_ms, args.tokens_per_second, args.tokens,
+                                error_rate=args.error_rate)
+        server, llm_url = start_stub_server(settings=settings)
+
+    llm = create_llm(endpoint=llm_url, api_key=os.environ.get("MISTRALI_API_KEY") or "stub")
+    embedding_model = load_embedding_model(EMBEDDING_MODEL_NAME)
+    index = HotSwapIndex(args.db_path, embedding_model, build_chain=lambda db: build_qa_chain(llm, db),
+                         poll_interval=0)
+    classifier = None
+    if not args.no_classifier:
+        from src.intent_classifier.classifier import intent_classifier
+        classifier = intent_classifier
+    session_manager = SessionManager()
+    answer_cache = SemanticAnswerCache(embedding_model, path=None) if args.answer_cache else None
+    memory_store = (ConversationMemoryStore(session_manager, ConversationSummarizer(llm))
+                    if args.memory else None)
+    pipeline = ChatPipeline(index, classifier=classifier, session_manager=session_manager,
+                            coalesce=not args.no_coalesce, answer_cache=answer_cache, memory_store=memory_store)
+
+    user_manager = UserManager()
+    sessions = []
+    for i in range(args.users):
+        name = f"load_{uuid.uuid4().hex[:8]}_{i}"
+        user = user_manager.create_user(name, f"{name}@example.com", uuid.uuid4().hex)
+        sessions.append(session_manager.create_session(user["id"], f"Load test {i}")["id"])
+
+    queries = load_queries(QUERIES_PATH, args.queries)
+    print(f"{args.users} users, {len(queries)} queries, index {index.version}, LLM at {llm_url}"
+          f"{' (stub)' if server else ''}\n")
+
+    results, lock = [], threading.Lock()
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    def simulate_user(user_number, session_id):
+        rng = random.Random(user_number)
+        history = []
+        turns = 0
+        while (deadline is None and turns < args.requests) or (deadline is not None and time.perf_counter() < deadline):
+            query = rng.choice(queries)
+            result = pipeline.run(query, session_id=session_id, history=history)
+            history.extend([{"role": "user", "content": query},
+                            {"role": "assistant", "content": result.answer or ""}])
+            with lock:
+                results.append(result)
+            turns += 1
+            if args.think_ms:
+                time.sleep(rng.expovariate(1000 / args.think_ms))
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=simulate_user, args=(i, session_id), name=f"user-{i}")
+               for i, session_id in enumerate(sessions)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    if memory_store is not None:
+        # Let the background folds finish before the stub LLM goes away
+        memory_store.close(wait=True)
+    index.close()
+    if server is not None:
+        server.shutdown()
+
+    failed = [r for r in results if r.error]
+    print(f"{len(results)} turns in {elapsed:.1f}s: {len(results) / elapsed:.2f} turns/s, "
+          f"{len(failed)} errors ({len(failed) / max(len(results), 1):.1%})")
+    routes = Counter(r.route for r in results)
+    print("routes: " + ", ".join(f"{route}={count}" for route, count in sorted(routes.items())))
+    if pipeline.single_flight is not None:
+        print(pipeline.single_flight.format_stats())
+    if answer_cache is not None:
+        print(answer_cache.format_stats())
+    if memory_store is not None:
+        print(f"Memory: {memory_store.folds} folds, {memory_store.fold_failures} failed")
+    if LLM_GOVERNOR_ENABLED:
+        print(llm_governor.format_stats())
+    print()
+
+    print(f"{'stage':<14} {'count':>6} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}")
+    for stage in STAGES:
+        samples = [r.timings[stage] for r in results if not r.error and stage in r.timings]
+        if not samples:
+            continue
+        print(f"{stage:<14} {len(samples):>6} {percentile_ms(samples, 50):>9.1f} "
+              f"{percentile_ms(samples, 95):>9.1f} {percentile_ms(samples, 99):>9.1f}")
+
+    for message, count in Counter(r.error for r in failed).most_common(5):
+        print(f"\n{count}x {message}")
+
+    if scratch is not None:
+        scratch.cleanup()
+
+
+if __name__ == "__main__":
+    main()
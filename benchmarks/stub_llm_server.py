@@ -0,0 +1,134 @@
+# benchmarks/stub_llm_server.py
+"""
+Local stand-in for the Mistral chat completions API.
+
+Answers POST /v1/chat/completions (what ChatMistralAI calls) with filler
+text after a configurable delay, streaming it at a fixed token rate when
+the client asks for stream=true. Point ChatMistralAI at it with
+endpoint="http://127.0.0.1:8765/v1".
+
+    python benchmarks/stub_llm_server.py --port 8765 --latency-ms 400 --tokens-per-second 60
+"""
+
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER = ("Based on the provided context, the condition is usually managed with a combination of "
+          "lifestyle changes, regular monitoring and medication where appropriate. Please consult "
+          "a healthcare professional for advice specific to your situation.").split()
+
+
+class StubSettings:
+    def __init__(self, latency_ms=400.0, tokens_per_second=60.0, tokens=120, jitter=0.1, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+    def delay(self, seconds):
+        time.sleep(max(0.0, seconds * random.uniform(1 - self.jitter, 1 + self.jitter)))
+
+
+def make_handler(settings: StubSettings):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"message": "not found"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            if random.random() < settings.error_rate:
+                self._send_json(429, {"message": "Requests rate limit exceeded"})
+                return
+
+            tokens = [FILLER[i % len(FILLER)] + " " for i in range(settings.tokens)]
+            completion_id = uuid.uuid4().hex
+            settings.delay(settings.latency_ms / 1000)
+
+            if request.get("stream"):
+                self._stream(request, tokens, completion_id)
+            else:
+                settings.delay(len(tokens) / settings.tokens_per_second)
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(tokens)}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}
+                })
+
+        def _stream(self, request, tokens, completion_id):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send_event(payload):
+                data = f"data: {payload}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            for i, token in enumerate(tokens):
+                if i:
+                    settings.delay(1 / settings.tokens_per_second)
+                send_event(json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": token},
+                                 "finish_reason": "stop" if i == len(tokens) - 1 else None}]
+                }))
+            send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_stub_server(host="127.0.0.1", port=0, settings: StubSettings = None):
+    """Start the stub in a daemon thread; returns (server, base URL for ChatMistralAI)"""
+    server = ThreadingHTTPServer((host, port), make_handler(settings or StubSettings()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--tokens", type=int, default=120, help="answer length in tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429")
+    args = parser.parse_args()
+
+    settings = StubSettings(args.latency_ms, args.tokens_per_second, args.tokens, error_rate=args.error_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(settings))
+    print(f"Stub Mistral API on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
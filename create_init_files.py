@@ -12,7 +12,8 @@ def create_init_files():
         "src",
         "src/database",
         "src/utils",
-        "src/chatbot"
+        "src/chatbot",
+        "src/api"
     ]
     
     for directory in directories:
@@ -32,6 +33,8 @@ def create_init_files():
                     f.write('"""Utility functions and helpers"""\n\n')
                 elif directory == "src/chatbot":
                     f.write('"""Chatbot core functionality"""\n\n')
+                elif directory == "src/api":
+                    f.write('"""HTTP chat service and its client"""\n\n')
                 else:
                     f.write("")
             
@@ -9,15 +9,6 @@ import logging
 from dotenv import load_dotenv
 load_dotenv()
 
-# Import your existing modules
-from langchain_huggingface.llms import HuggingFaceEndpoint
-from langchain_core.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_mistralai import ChatMistralAI
-from dotenv import load_dotenv
-
 # Import new modules
 from src.database.database import db_manager, init_database
 from src.database.user_manager import UserManager, SessionManager, FeedbackManager
@@ -26,6 +17,12 @@ from src.utils.encryption import encrypt_data, decrypt_data
 # Add this with your other imports
 from src.intent_classifier.classifier import intent_classifier
 from src.summarizer.summarizer import get_huggingface_summary
+from src.chatbot.index_reloader import HotSwapIndex
+from src.chatbot.pipeline import ChatPipeline, create_llm, build_qa_chain
+from src.chatbot.answer_cache import SemanticAnswerCache, ANSWER_CACHE_ENABLED
+from src.chatbot.conversation_memory import ConversationMemoryStore, ConversationSummarizer, MEMORY_ENABLED
+from src.chatbot.onnx_embeddings import load_embedding_model
+from src.api.client import ChatClient, ChatAPIError, CHAT_API_URL
 # from src.summarizer.summarizer import Summarizer, extract_text_from_pdf
 
 # Set up logging
@@ -35,6 +32,9 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Stream answer tokens into the chat as they are generated
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "1") == "1"
+
 # Page configuration
 st.set_page_config(
     page_title="AI Medical Chatbot",
@@ -104,58 +104,130 @@ def initialize_chatbot():
     """Initialize the chatbot with cached resources"""
     try:
         # Initialize the LLM
-        llm = ChatMistralAI(
-            model="mistral-large-latest",
-            temperature=0,
-            max_retries=2,
-            api_key=os.environ.get("MISTRALI_API_KEY"),
-        )
-        
-        # Custom prompt template
-        CUSTOM_PROMPT_TEMPLATE = """
-        Use the pieces of information provided in the context to answer user's question.
-        If you dont know the answer, just say that you dont know, dont try to make up an answer. 
-        Dont provide anything out of the given context. Always be professional and empathetic in medical contexts.
-
-        Context: {context}
-        Question: {question}
+        llm = create_llm()
 
-        Start the answer directly. No small talk please.
-        """
-        
-        def set_custom_prompt(custom_prompt_template):
-            prompt = PromptTemplate(template=custom_prompt_template, input_variables=["context", "question"])
-            return prompt
-        
         # Load Database
         DB_FAISS_PATH = "vectorstore/db_faiss"
-        embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        db = FAISS.load_local(DB_FAISS_PATH, embedding_model, allow_dangerous_deserialization=True)
-        
-        # Create QA chain
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=db.as_retriever(search_kwargs={'k': 3}),
-            return_source_documents=True,
-            chain_type_kwargs={'prompt': set_custom_prompt(CUSTOM_PROMPT_TEMPLATE)}
-        )
-        
-        return qa_chain
+        # EMBEDDING_BACKEND=onnx serves the model through onnxruntime with int8 weights
+        embedding_model = load_embedding_model("sentence-transformers/all-MiniLM-L6-v2")
+
+        # Loads whichever index type (flat, HNSW, IVF) ingestion built and swaps in
+        # newly published versions in the background, without a restart. Each query
+        # gets 1 to ADAPTIVE_MAX_K chunks, cut where the similarity scores fall off
+        return HotSwapIndex(DB_FAISS_PATH, embedding_model, build_chain=lambda db: build_qa_chain(llm, db))
         
     except Exception as e:
         st.error(f"Error initializing chatbot: {str(e)}")
         return None
 
-def get_response(qa_chain, query):
-    """Get response from the chatbot"""
+@st.cache_resource
+def initialize_answer_cache(_embedding_model):
+    """Semantic answer cache shared by all sessions of this process"""
+    if not ANSWER_CACHE_ENABLED:
+        return None
     try:
-        with st.spinner("Processing your query..."):
-            response = qa_chain.invoke({'query': query})
-            return response["result"], response["source_documents"]
+        return SemanticAnswerCache(_embedding_model)
+    except Exception as e:
+        logger.error(f"Answer cache unavailable: {e}")
+        return None
+
+@st.cache_resource
+def initialize_memory_store():
+    """Per-session conversation memory: recent turns plus a rolling summary kept in the session row"""
+    if not MEMORY_ENABLED:
+        return None
+    return ConversationMemoryStore(session_manager, ConversationSummarizer(create_llm()))
+
+@st.cache_resource
+def initialize_pipeline(_chatbot):
+    """Classify, route, answer and save chat turns in this process, as the chat service does"""
+    return ChatPipeline(_chatbot, classifier=intent_classifier, session_manager=session_manager,
+                        answer_cache=initialize_answer_cache(_chatbot.embedding_model),
+                        memory_store=initialize_memory_store())
+
+@st.cache_resource
+def initialize_chat_client():
+    """Client for the chat service when CHAT_API_URL is set; chat then runs there instead of in this process"""
+    if not CHAT_API_URL:
+        return None
+    return ChatClient(CHAT_API_URL)
+
+def remote_chat_turn(chat_client, query, container, history):
+    """Run one turn on the chat service, streaming its tokens into the chat area
+
+    Returns the finished turn (answer, sources, session_id, intent, ...) or None.
+    """
+    history = [{"role": m["role"], "content": m["content"]} for m in history]
+    session_id = st.session_state.selected_session_id
+    try:
+        if not STREAM_RESPONSES:
+            with st.spinner("Processing your query..."):
+                turn = chat_client.chat(st.session_state.user_id, query, session_id, history)
+        else:
+            with container:
+                st.markdown(f'<div class="chat-message user-message"><strong>👤 You:</strong><br>{query}</div>', unsafe_allow_html=True)
+                placeholder = st.empty()
+            text, turn = "", None
+            for event in chat_client.stream_chat(st.session_state.user_id, query, session_id, history):
+                if event["type"] == "token":
+                    text += event["text"]
+                    placeholder.markdown(f'<div class="chat-message bot-message"><strong>🤖 Medical AI:</strong><br>{text}▌</div>', unsafe_allow_html=True)
+                elif event["type"] == "error":
+                    raise ChatAPIError(503 if event.get("retry") else 500, event["error"])
+                else:
+                    turn = event
+        if turn is None or turn.get("error"):
+            st.error(f"Error getting response: {turn.get('error') if turn else 'no answer received'}")
+            return None
+        return turn
+    except ChatAPIError as e:
+        if e.retryable:
+            st.warning("The assistant is handling a lot of questions right now. Please try again in a moment.")
+        else:
+            st.error(f"Error getting response: {e.message}")
+        return None
     except Exception as e:
-        st.error(f"Error getting response: {str(e)}")
-        return None, None
+        st.error(f"Could not reach the chat service: {str(e)}")
+        return None
+
+def local_chat_turn(pipeline, query, container, history):
+    """Run one turn through the chat pipeline in this process, streaming its tokens into the chat area
+
+    A new session is created for the first saved turn of a new chat.
+    Returns the TurnResult, or None if no answer could be produced.
+    """
+    def new_session():
+        session = session_manager.create_session(st.session_state.user_id, f"Chat about '{query[:30]}...'")
+        if session is None:
+            raise RuntimeError("Could not create a new chat session.")
+        st.session_state.selected_session_id = session['id']
+        return session['id']
+
+    session_id = st.session_state.selected_session_id
+    if not STREAM_RESPONSES:
+        with st.spinner("Processing your query..."):
+            result = pipeline.run(query, session_id, history, session_factory=new_session)
+    else:
+        with container:
+            st.markdown(f'<div class="chat-message user-message"><strong>👤 You:</strong><br>{query}</div>', unsafe_allow_html=True)
+            placeholder = st.empty()
+        placeholder.markdown('<div class="chat-message bot-message"><strong>🤖 Medical AI:</strong><br>Processing your query...</div>', unsafe_allow_html=True)
+        parts = []
+
+        def on_token(token):
+            parts.append(token)
+            placeholder.markdown(f'<div class="chat-message bot-message"><strong>🤖 Medical AI:</strong><br>{"".join(parts)}▌</div>', unsafe_allow_html=True)
+
+        result = pipeline.run(query, session_id, history, on_token=on_token, session_factory=new_session)
+        placeholder.empty()
+
+    if result.retryable:
+        st.warning("The assistant is handling a lot of questions right now. Please try again in a moment.")
+        return None
+    if result.error:
+        st.error(f"Error getting response: {result.error}")
+    return result if result.answer else None
+
 
 def login_page():
     """Display login page"""
@@ -589,10 +661,11 @@ def session_history_page():
 
 def chat_interface():
     """Main chat interface for interacting with the chatbot"""
-    # Initialize chatbot
-    qa_chain = initialize_chatbot()
+    # With CHAT_API_URL set the chat service answers; otherwise the chatbot runs in this process
+    chat_client = initialize_chat_client()
+    chatbot = initialize_chatbot() if chat_client is None else None
 
-    if qa_chain is None:
+    if chat_client is None and chatbot is None:
         st.error("Failed to initialize the chatbot. Please check your configuration.")
         return
 
@@ -608,7 +681,11 @@ def chat_interface():
             # A session is selected, so load its messages from the database.
             try:
                 # Get messages from the database
-                db_messages = session_manager.get_session_messages(st.session_state.selected_session_id)
+                if chat_client is not None:
+                    db_messages = chat_client.session_messages(st.session_state.selected_session_id,
+                                                               st.session_state.user_id)
+                else:
+                    db_messages = session_manager.get_session_messages(st.session_state.selected_session_id)
                 
                 # Format messages for display in the UI
                 st.session_state.messages = []
@@ -685,68 +762,28 @@ def chat_interface():
 
         with col_send:
             if st.button("📤 Send", type="primary"):
-                if query.strip():
-                    # --- START OF MESSAGE SAVING LOGIC ---
-                    # 1. First, classify the user's intent
-                    predicted_intent = intent_classifier.predict(query)
-                    st.info(f"Detected Intent: **{predicted_intent}**") # Optional: for debugging
-
-                    # 2. Add user message to UI immediately
-                    st.session_state.messages.append({"role": "user", "content": query})
-                    
-                    # 3. Implement Guided Dialog based on the intent
-                    if predicted_intent == "personal_inquiry":
-                        # For this intent, ask a clarifying question instead of calling the RAG chain
-                        clarifying_message = "I understand you're asking about symptoms. To help me find the most relevant information, could you please specify the condition or illness you are concerned about?"
-                        st.session_state.messages.append({"role": "assistant", "content": clarifying_message})
-                        st.rerun() # Rerun to display the new messages
-                        return # Stop further processing for this turn
-
-                    # 2. CREATE A NEW SESSION IF NEEDED
-                    # If no session is active, create one before saving the message.
-                    if not st.session_state.selected_session_id:
-                        try:
-                            # Create a default session name from the first query
-                            new_session_name = f"Chat about '{query[:30]}...'"
-                            new_session = session_manager.create_session(st.session_state.user_id, new_session_name)
-                            if new_session:
-                                st.session_state.selected_session_id = new_session['id']
-                            else:
-                                st.error("Could not create a new chat session.")
-                                return # Stop if session creation fails
-                        except Exception as e:
-                            st.error(f"Error creating session: {e}")
-                            return
-                    
-                    # Get bot response
-                    response, sources = get_response(qa_chain, query)
-
-                    if response:
-                        # Add bot response to UI
-                        sources_for_ui = [
-                            {"page_content": doc.page_content, "metadata": doc.metadata}
-                            for doc in sources
-                        ] if sources else []
-
-                        # Add bot response to UI using the dictionary format.
-                        bot_message = {"role": "assistant", "content": response, "sources": sources_for_ui}
-                        st.session_state.messages.append(bot_message)
-                        
-                        # 3. SAVE THE CONVERSATION TO THE DATABASE
-                        try:
-                            # Pass the original 'sources' (list of Document objects) to be saved.
-                            session_manager.save_message(
-                                session_id=st.session_state.selected_session_id,
-                                user_message=query,
-                                bot_response=response,
-                                source_documents=sources 
-                            )
-                        except Exception as e:
-                            st.error(f"Failed to save message: {e}")
-                    
-                    # Rerun to update the display
-                    st.rerun()
-                    # --- END OF MESSAGE SAVING LOGIC ---
+                if query.strip() and chat_client is not None:
+                    # The service classifies, routes, answers and saves the turn
+                    turn = remote_chat_turn(chat_client, query, chat_container, st.session_state.messages)
+                    if turn:
+                        st.session_state.messages.append({"role": "user", "content": query})
+                        st.session_state.messages.append({
+                            "role": "assistant", "content": turn["answer"], "sources": turn["sources"]
+                        })
+                        st.session_state.selected_session_id = turn["session_id"]
+                        st.rerun()
+                elif query.strip():
+                    # Classify, route, answer from one index version and save the turn
+                    pipeline = initialize_pipeline(chatbot)
+                    result = local_chat_turn(pipeline, query, chat_container, st.session_state.messages)
+                    if result:
+                        st.session_state.messages.append({"role": "user", "content": query})
+                        st.session_state.messages.append({
+                            "role": "assistant", "content": result.answer,
+                            "sources": [{"page_content": doc.page_content, "metadata": doc.metadata}
+                                        for doc in result.sources or []]
+                        })
+                        st.rerun()
 
         with col_clear:
             if st.button("🗑️ Clear Chat"):
@@ -0,0 +1,2 @@
+"""HTTP chat service and its client"""
+
@@ -0,0 +1,320 @@
+"""
+ASGI chat service, served by uvicorn
+
+    python -m src.api.app                      # or
+    uvicorn src.api.app:app --host 0.0.0.0 --port 8000 --workers 2
+
+Endpoints (JSON unless noted):
+
+    GET    /health
+    GET    /metrics
+    GET    /metrics/latency?hours=24            per-stage p50/p95/p99 of saved turns
+    POST   /chat                                {"user_id", "message", "session_id"?, "history"?, "stream"?}
+    GET    /sessions?user_id=&limit=
+    POST   /sessions                            {"user_id", "session_name"?}
+    GET    /sessions/{id}/messages?user_id=
+    DELETE /sessions/{id}?user_id=
+    GET    /sessions/{id}/export?user_id=       application/pdf
+
+With "stream": true, /chat answers with NDJSON lines: {"type": "token",
+"text"} per generated token, then {"type": "done", ...} with the full
+turn. Written directly against the ASGI interface since no web framework
+is a dependency. When CHAT_API_KEY is set, requests must send it as a
+bearer token. Without it, any client can act as any user_id, so a
+warning is logged when the service is reachable beyond loopback.
+"""
+
+import os
+import re
+import json
+import asyncio
+import hmac
+import logging
+import ipaddress
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from src.chatbot.llm_governor import LLMOverloaded
+from src.api.service import ChatService, NotFound
+
+logger = logging.getLogger(__name__)
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# uvicorn worker processes; each loads the models once and serves many requests
+API_PROCESSES = int(os.getenv("API_PROCESSES", "1"))
+CHAT_API_KEY = os.getenv("CHAT_API_KEY")
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def is_loopback(host: str) -> bool:
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+def warn_if_unauthenticated(host: Optional[str]):
+    if not CHAT_API_KEY and host and not is_loopback(host):
+        logger.warning(f"Serving on {host} without CHAT_API_KEY: any client can read and write any user's "
+                       f"sessions. Set CHAT_API_KEY or bind to 127.0.0.1.")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(payload: Any) -> bytes:
+    return json.dumps(payload, default=_json_default, ensure_ascii=False).encode("utf-8")
+
+
+class Request:
+    def __init__(self, scope, receive, params: Dict[str, str]):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.params = params
+        self.query = {key: values[-1] for key, values in
+                      parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        self.headers = {key.decode("latin-1").lower(): value.decode("latin-1")
+                        for key, value in scope.get("headers", [])}
+
+    async def json(self) -> Dict[str, Any]:
+        body = b""
+        while True:
+            message = await self.receive()
+            body += message.get("body", b"")
+            if len(body) > MAX_BODY_BYTES:
+                raise HTTPError(413, "Request body too large")
+            if not message.get("more_body"):
+                break
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Request body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return payload
+
+    def require(self, source: Dict[str, Any], name: str) -> Any:
+        value = source.get(name)
+        if value in (None, ""):
+            raise HTTPError(400, f"Missing required field: {name}")
+        return value
+
+
+async def send_response(send, status: int, body: bytes, content_type: str = "application/json",
+                        headers: Optional[List[Tuple[bytes, bytes]]] = None):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode("latin-1")),
+                    (b"content-length", str(len(body)).encode("latin-1"))] + (headers or [])
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, payload: Any, status: int = 200):
+    await send_response(send, status, dumps(payload))
+
+
+Handler = Callable[[Request, Any], Awaitable[None]]
+
+
+class ChatAPI:
+    """Routes requests to the ChatService and owns its lifetime through ASGI lifespan events"""
+
+    def __init__(self, service: Optional[ChatService] = None):
+        self.service = service or ChatService()
+        self._exposure_checked = False
+        self.routes: List[Tuple[str, re.Pattern, Handler]] = []
+        self.route("GET", r"/health", self.health)
+        self.route("GET", r"/metrics", self.metrics)
+        self.route("GET", r"/metrics/latency", self.stage_latencies)
+        self.route("POST", r"/chat", self.chat)
+        self.route("GET", r"/sessions", self.list_sessions)
+        self.route("POST", r"/sessions", self.create_session)
+        self.route("GET", r"/sessions/(?P<session_id>[^/]+)/messages", self.session_messages)
+        self.route("DELETE", r"/sessions/(?P<session_id>[^/]+)", self.delete_session)
+        self.route("GET", r"/sessions/(?P<session_id>[^/]+)/export", self.export_session)
+
+    def route(self, method: str, pattern: str, handler: Handler):
+        self.routes.append((method, re.compile(pattern + r"/?$"), handler))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.handle(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.service.start()
+                except Exception as e:
+                    logger.error(f"Chat service failed to start: {e}")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.service.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _match(self, method: str, path: str) -> Tuple[Optional[Handler], Dict[str, str]]:
+        path_matched = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if match:
+                path_matched = True
+                if route_method == method:
+                    return handler, match.groupdict()
+        if path_matched:
+            raise HTTPError(405, "Method not allowed")
+        raise HTTPError(404, "Not found")
+
+    def _authorize(self, request: Request):
+        if not CHAT_API_KEY or request.path.rstrip("/") == "/health":
+            return
+        supplied = request.headers.get("authorization", "")
+        if not hmac.compare_digest(supplied, f"Bearer {CHAT_API_KEY}"):
+            raise HTTPError(401, "Invalid or missing API key")
+
+    async def handle(self, scope, receive, send):
+        if not self._exposure_checked:
+            # uvicorn's --host is not visible to the app; the first request shows the address it came in on
+            self._exposure_checked = True
+            warn_if_unauthenticated((scope.get("server") or (None,))[0])
+        try:
+            handler, params = self._match(scope["method"], scope["path"])
+            request = Request(scope, receive, params)
+            self._authorize(request)
+            if self.service.pipeline is None and handler not in (self.health, self.metrics):
+                raise HTTPError(503, "Chat service is still starting")
+            await handler(request, send)
+        except HTTPError as e:
+            await send_json(send, {"error": e.message}, e.status)
+        except NotFound as e:
+            await send_json(send, {"error": str(e)}, 404)
+        except LLMOverloaded as e:
+            await send_response(send, 503, dumps({"error": str(e)}), headers=[(b"retry-after", b"5")])
+        except Exception as e:
+            logger.exception(f"{scope['method']} {scope['path']} failed")
+            await send_json(send, {"error": f"Internal error: {e}"}, 500)
+
+    async def health(self, request: Request, send):
+        await send_json(send, await self.service.run(self.service.health))
+
+    async def metrics(self, request: Request, send):
+        await send_json(send, self.service.metrics())
+
+    async def stage_latencies(self, request: Request, send):
+        try:
+            hours = float(request.query.get("hours", 24))
+        except ValueError:
+            raise HTTPError(400, "hours must be a number")
+        await send_json(send, await self.service.run(self.service.stage_latencies, hours))
+
+    async def chat(self, request: Request, send):
+        body = await request.json()
+        user_id = request.require(body, "user_id")
+        message = str(request.require(body, "message")).strip()
+        if not message:
+            raise HTTPError(400, "Message is empty")
+        args = (user_id, message, body.get("session_id"), body.get("history"))
+
+        if not body.get("stream"):
+            await send_json(send, await self.service.run(self.service.chat, *args))
+            return
+
+        # Tokens cross from the worker thread to the event loop through a queue
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        def on_token(token: str):
+            loop.call_soon_threadsafe(events.put_nowait, token)
+
+        turn = asyncio.ensure_future(self.service.run(self.service.chat, *args, on_token=on_token))
+        turn.add_done_callback(lambda _: events.put_nowait(None))
+
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/x-ndjson"), (b"cache-control", b"no-cache")]})
+        while True:
+            token = await events.get()
+            if token is None:
+                break
+            await send({"type": "http.response.body", "more_body": True,
+                        "body": dumps({"type": "token", "text": token}) + b"\n"})
+
+        try:
+            final = {"type": "done", **turn.result()}
+        except LLMOverloaded as e:
+            final = {"type": "error", "error": str(e), "retry": True}
+        except NotFound as e:
+            final = {"type": "error", "error": str(e)}
+        except Exception as e:
+            logger.exception("Streaming chat turn failed")
+            final = {"type": "error", "error": f"Internal error: {e}"}
+        await send({"type": "http.response.body", "body": dumps(final) + b"\n"})
+
+    async def list_sessions(self, request: Request, send):
+        user_id = request.require(request.query, "user_id")
+        try:
+            limit = int(request.query.get("limit", 50))
+        except ValueError:
+            raise HTTPError(400, "limit must be an integer")
+        if limit < 1:
+            raise HTTPError(400, "limit must be positive")
+        await send_json(send, await self.service.run(self.service.list_sessions, user_id, limit))
+
+    async def create_session(self, request: Request, send):
+        body = await request.json()
+        user_id = request.require(body, "user_id")
+        session = await self.service.run(self.service.create_session, user_id, body.get("session_name"))
+        await send_json(send, session, 201)
+
+    async def session_messages(self, request: Request, send):
+        user_id = request.require(request.query, "user_id")
+        messages = await self.service.run(self.service.session_messages, request.params["session_id"], user_id)
+        await send_json(send, messages)
+
+    async def delete_session(self, request: Request, send):
+        user_id = request.require(request.query, "user_id")
+        await self.service.run(self.service.delete_session, request.params["session_id"], user_id)
+        await send_json(send, {"deleted": True})
+
+    async def export_session(self, request: Request, send):
+        user_id = request.require(request.query, "user_id")
+        session_id = request.params["session_id"]
+        pdf_bytes = await self.service.run(self.service.export_session, session_id, user_id)
+        await send_response(send, 200, pdf_bytes, "application/pdf", headers=[
+            (b"content-disposition", f'attachment; filename="session_{session_id}.pdf"'.encode("latin-1"))
+        ])
+
+
+app = ChatAPI()
+
+
+def main():
+    import uvicorn
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    warn_if_unauthenticated(API_HOST)
+    uvicorn.run("src.api.app:app", host=API_HOST, port=API_PORT, workers=API_PROCESSES)
+
+
+if __name__ == "__main__":
+    main()
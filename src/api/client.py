@@ -0,0 +1,87 @@
+"""Client for the chat service, used by the Streamlit UI when CHAT_API_URL is set"""
+
+import os
+import json
+import logging
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+CHAT_API_URL = os.getenv("CHAT_API_URL")
+CHAT_API_KEY = os.getenv("CHAT_API_KEY")
+CHAT_API_TIMEOUT_SECONDS = float(os.getenv("CHAT_API_TIMEOUT_SECONDS", "120"))
+
+
+class ChatAPIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+    @property
+    def retryable(self) -> bool:
+        return self.status == 503
+
+
+class ChatClient:
+    """Thin wrapper over the service endpoints; one instance can be shared across sessions"""
+
+    def __init__(self, base_url: str = CHAT_API_URL, api_key: Optional[str] = CHAT_API_KEY,
+                 timeout: float = CHAT_API_TIMEOUT_SECONDS):
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.http = httpx.Client(base_url=base_url.rstrip("/"), headers=headers,
+                                 timeout=httpx.Timeout(timeout, connect=5.0))
+
+    def _check(self, response: httpx.Response) -> httpx.Response:
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("error", response.text)
+            except ValueError:
+                message = response.text
+            raise ChatAPIError(response.status_code, message)
+        return response
+
+    def health(self) -> Dict[str, Any]:
+        return self._check(self.http.get("/health")).json()
+
+    def chat(self, user_id: str, message: str, session_id: Optional[str] = None,
+             history: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        payload = {"user_id": user_id, "message": message, "session_id": session_id, "history": history}
+        return self._check(self.http.post("/chat", json=payload)).json()
+
+    def stream_chat(self, user_id: str, message: str, session_id: Optional[str] = None,
+                    history: Optional[List[Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+        """Events as they arrive: {"type": "token", "text"}... then a "done" or "error" event"""
+        payload = {"user_id": user_id, "message": message, "session_id": session_id,
+                   "history": history, "stream": True}
+        with self.http.stream("POST", "/chat", json=payload) as response:
+            if response.status_code >= 400:
+                response.read()
+                self._check(response)
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def create_session(self, user_id: str, session_name: Optional[str] = None) -> Dict[str, Any]:
+        return self._check(self.http.post("/sessions", json={"user_id": user_id,
+                                                             "session_name": session_name})).json()
+
+    def list_sessions(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        return self._check(self.http.get("/sessions", params={"user_id": user_id, "limit": limit})).json()
+
+    def session_messages(self, session_id: str, user_id: str) -> List[Dict[str, Any]]:
+        return self._check(self.http.get(f"/sessions/{session_id}/messages",
+                                         params={"user_id": user_id})).json()
+
+    def delete_session(self, session_id: str, user_id: str) -> bool:
+        self._check(self.http.delete(f"/sessions/{session_id}", params={"user_id": user_id}))
+        return True
+
+    def export_session(self, session_id: str, user_id: str) -> bytes:
+        return self._check(self.http.get(f"/sessions/{session_id}/export",
+                                         params={"user_id": user_id})).content
+
+    def close(self):
+        self.http.close()
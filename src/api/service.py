@@ -0,0 +1,207 @@
+"""Chat, session and export operations behind the HTTP API, run on a worker thread pool"""
+
+import os
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from src.database.database import db_manager, init_database
+from src.database.user_manager import UserManager, SessionManager
+from src.utils.pdf_generator import generate_session_pdf
+from src.chatbot.pipeline import ChatPipeline, TurnResult, create_llm, build_qa_chain
+from src.chatbot.index_reloader import HotSwapIndex
+from src.chatbot.intent_router import intent_router
+from src.chatbot.single_flight import single_flight
+from src.chatbot.llm_governor import llm_governor, LLMOverloaded
+from src.chatbot.conversation_memory import (ConversationMemoryStore, ConversationSummarizer,
+                                             MEMORY_ENABLED)
+from src.chatbot.vectorstore import DB_FAISS_PATH
+from src.chatbot.onnx_embeddings import load_embedding_model, EMBEDDING_MODEL_NAME
+
+logger = logging.getLogger(__name__)
+
+# Threads per server process for model inference, retrieval and database work;
+# each uvicorn worker process loads its own copy of the models
+API_WORKER_THREADS = int(os.getenv("API_WORKER_THREADS", str(min(8, (os.cpu_count() or 1) + 2))))
+
+
+class NotFound(Exception):
+    pass
+
+
+def document_to_dict(doc) -> Dict[str, Any]:
+    return {"page_content": doc.page_content, "metadata": doc.metadata}
+
+
+def turn_to_dict(result: TurnResult) -> Dict[str, Any]:
+    return {
+        "session_id": result.session_id,
+        "message_id": result.message_id,
+        "query": result.query,
+        "answer": result.answer,
+        "sources": [document_to_dict(doc) for doc in result.sources or []],
+        "intent": result.intent,
+        "route": result.route,
+        "index_version": result.index_version,
+        "cached": result.cached,
+        "confidence": result.confidence,
+        "low_confidence": result.low_confidence,
+        "coalesced": result.coalesced,
+        "timings": result.timings,
+        "error": result.error
+    }
+
+
+class ChatService:
+    """
+    The chat pipeline and session store shared by all requests of one process
+
+    Models, the index and the answer cache are loaded once in start(). Every
+    blocking call (classification, retrieval, generation, SQL, PDF export)
+    runs on a thread pool of API_WORKER_THREADS so the event loop only
+    moves bytes.
+    """
+
+    def __init__(self, db_path: str = DB_FAISS_PATH, workers: int = API_WORKER_THREADS):
+        self.db_path = db_path
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat-worker")
+        # Calls waiting for a worker thread and calls running on one
+        self.queued = 0
+        self.running = 0
+        self._counts_lock = threading.Lock()
+        self.user_manager = UserManager()
+        self.session_manager = SessionManager()
+        self.index: Optional[HotSwapIndex] = None
+        self.answer_cache = None
+        self.pipeline: Optional[ChatPipeline] = None
+
+    def _load(self):
+        from src.intent_classifier.classifier import intent_classifier
+        from src.chatbot.answer_cache import SemanticAnswerCache, ANSWER_CACHE_ENABLED
+
+        if not init_database():
+            raise RuntimeError("Database initialization failed")
+        llm = create_llm()
+        embedding_model = load_embedding_model(EMBEDDING_MODEL_NAME)
+        self.index = HotSwapIndex(self.db_path, embedding_model, build_chain=lambda db: build_qa_chain(llm, db))
+        if ANSWER_CACHE_ENABLED:
+            self.answer_cache = SemanticAnswerCache(embedding_model)
+        memory_store = (ConversationMemoryStore(self.session_manager, ConversationSummarizer(llm))
+                        if MEMORY_ENABLED else None)
+        self.pipeline = ChatPipeline(self.index, classifier=intent_classifier,
+                                     session_manager=self.session_manager, answer_cache=self.answer_cache,
+                                     memory_store=memory_store)
+        logger.info(f"Chat service ready on index version {self.index.version}")
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        with self._counts_lock:
+            self.queued += 1
+        return await loop.run_in_executor(self.executor, functools.partial(self._counted, fn, *args, **kwargs))
+
+    def _counted(self, fn: Callable, *args, **kwargs):
+        with self._counts_lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._counts_lock:
+                self.running -= 1
+
+    async def start(self):
+        await self.run(self._load)
+
+    def close(self):
+        if self.index is not None:
+            self.index.close()
+        if self.pipeline is not None and self.pipeline.memory_store is not None:
+            self.pipeline.memory_store.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _owned_session(self, session_id: str, user_id: str) -> Dict[str, Any]:
+        session = self.session_manager.get_session(session_id, user_id)
+        if session is None:
+            raise NotFound(f"Session {session_id} not found")
+        return session
+
+    def _new_session(self, user_id: str, message: str) -> str:
+        session = self.session_manager.create_session(user_id, f"Chat about '{message[:30]}...'")
+        if session is None:
+            raise RuntimeError("Could not create a new chat session")
+        return session["id"]
+
+    def chat(self, user_id: str, message: str, session_id: Optional[str] = None,
+             history: Optional[List[Dict[str, Any]]] = None,
+             on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """One chat turn; without session_id a new session is created once there is a turn to save"""
+        if session_id:
+            self._owned_session(session_id, user_id)
+        result = self.pipeline.run(message, session_id=session_id, history=history, on_token=on_token,
+                                   session_factory=lambda: self._new_session(user_id, message))
+        if result.retryable:
+            raise LLMOverloaded(result.error)
+        return turn_to_dict(result)
+
+    def create_session(self, user_id: str, session_name: Optional[str] = None) -> Dict[str, Any]:
+        session = self.session_manager.create_session(user_id, session_name)
+        if session is None:
+            raise RuntimeError("Could not create a new chat session")
+        return session
+
+    def list_sessions(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        return self.session_manager.get_user_sessions(user_id, limit=limit)
+
+    def session_messages(self, session_id: str, user_id: str) -> List[Dict[str, Any]]:
+        self._owned_session(session_id, user_id)
+        return self.session_manager.get_session_messages(session_id)
+
+    def delete_session(self, session_id: str, user_id: str) -> bool:
+        if not self.session_manager.delete_session(session_id, user_id):
+            raise NotFound(f"Session {session_id} not found")
+        return True
+
+    def export_session(self, session_id: str, user_id: str) -> bytes:
+        """The session as the same PDF the history page offers for download"""
+        session = self._owned_session(session_id, user_id)
+        messages = self.session_manager.get_session_messages(session_id)
+        user_data = self.user_manager.get_user_by_id(user_id)
+        user_data_for_pdf = {
+            'username': user_data.get('username', 'Unknown') if user_data else 'Unknown',
+            'created_at': user_data.get('created_at') if user_data else None
+        }
+        session_data_for_pdf = {
+            'session_name': session.get('session_name', 'Unnamed Session'),
+            'created_at': session.get('created_at') or datetime.now()
+        }
+        return generate_session_pdf(user_data_for_pdf, session_data_for_pdf, messages,
+                                    include_sources=True, include_timestamps=True, include_ratings=True)
+
+    def stage_latencies(self, hours: float = 24) -> Dict[str, Dict[str, float]]:
+        """Per-stage p50/p95/p99 in milliseconds over messages saved in the last hours"""
+        since = datetime.utcnow() - timedelta(hours=hours)
+        return self.session_manager.get_stage_latency_percentiles(since)
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok" if self.pipeline is not None else "starting",
+            "database": db_manager.health_check(),
+            "index_version": self.index.version if self.index is not None else None
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics = {
+            "routes": intent_router.stats(),
+            "single_flight": single_flight.stats(),
+            "llm_governor": llm_governor.stats(),
+            "workers": {"queued": self.queued, "running": self.running}
+        }
+        if self.answer_cache is not None:
+            metrics["answer_cache"] = self.answer_cache.stats()
+        if self.index is not None:
+            metrics["index"] = {"version": self.index.version, "reloads": self.index.reloads}
+        return metrics
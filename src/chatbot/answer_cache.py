@@ -0,0 +1,260 @@
+"""Semantic cache of answers keyed by query embedding and knowledge base version"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.utils.encryption import encrypt_data, decrypt_data
+from src.utils.tracing import trace_stage
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "vectorstore/answer_cache.sqlite")
+# Cosine similarity between query embeddings needed to reuse an answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+# Log hit-rate metrics every N lookups
+ANSWER_CACHE_LOG_EVERY = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id TEXT PRIMARY KEY,
+    index_version TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    sources: List[Document]
+    question: str
+    similarity: float
+    index_version: str
+
+
+@dataclass
+class _Entry:
+    id: str
+    index_version: str
+    vector: np.ndarray
+    question: str
+    answer: str
+    sources: List[Dict[str, Any]]
+    created_at: float
+    last_used: float
+    hits: int = 0
+
+
+class SemanticAnswerCache:
+    """
+    Reuses answers to questions that mean the same as one asked before
+
+    Queries are embedded with the retriever's model and compared by cosine
+    similarity against the cached questions of the same knowledge base
+    version, so a rebuilt index never serves answers from an older one.
+    Entries expire after a TTL and the least recently used are evicted
+    beyond max_entries. Questions, answers, sources and embeddings are
+    stored Fernet-encrypted in SQLite; only version and timestamps are plain.
+    """
+
+    def __init__(self, embedding_model, path: Optional[str] = ANSWER_CACHE_PATH,
+                 threshold: float = ANSWER_CACHE_THRESHOLD, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.RLock()
+        # Ordered from least to most recently used
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._matrices: Dict[str, Tuple[List[str], np.ndarray]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self.conn = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.executescript(SCHEMA)
+            self._load()
+
+    def _load(self):
+        now = time.time()
+        rows = self.conn.execute(
+            "SELECT id, index_version, payload, created_at, last_used, hits FROM answers ORDER BY last_used"
+        ).fetchall()
+        for entry_id, version, payload, created_at, last_used, hits in rows:
+            if now - created_at > self.ttl_seconds:
+                continue
+            try:
+                data = json.loads(decrypt_data(payload))
+            except ValueError:
+                # Written with a different encryption key
+                continue
+            self._entries[entry_id] = _Entry(
+                id=entry_id, index_version=version,
+                vector=np.asarray(data["vector"], dtype=np.float32),
+                question=data["question"], answer=data["answer"], sources=data["sources"],
+                created_at=created_at, last_used=last_used, hits=hits
+            )
+        self._purge_expired(now)
+        self._evict()
+        logger.info(f"Answer cache loaded {len(self._entries)} entries")
+
+    def embed(self, query: str) -> np.ndarray:
+        with trace_stage("embed"):
+            vector = np.asarray(self.embedding_model.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _matrix(self, index_version: str) -> Tuple[List[str], np.ndarray]:
+        cached = self._matrices.get(index_version)
+        if cached is None:
+            ids = [e.id for e in self._entries.values() if e.index_version == index_version]
+            vectors = (np.stack([self._entries[i].vector for i in ids]) if ids
+                       else np.zeros((0, 0), dtype=np.float32))
+            cached = self._matrices[index_version] = (ids, vectors)
+        return cached
+
+    def lookup(self, query: str, index_version: str,
+               vector: Optional[np.ndarray] = None) -> Tuple[Optional[CachedAnswer], np.ndarray]:
+        """
+        Find a cached answer for a similar question on the same index version
+
+        Returns (answer or None, query embedding); pass the embedding back to
+        store() on a miss so the query is only embedded once.
+        """
+        if vector is None:
+            vector = self.embed(query)
+        now = time.time()
+
+        with self._lock:
+            self._purge_expired(now)
+            ids, matrix = self._matrix(index_version)
+            hit = None
+            if ids:
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry = self._entries[ids[best]]
+                    entry.last_used = now
+                    entry.hits += 1
+                    self._entries.move_to_end(entry.id)
+                    hit = CachedAnswer(
+                        answer=entry.answer,
+                        sources=[Document(page_content=s["page_content"], metadata=s["metadata"])
+                                 for s in entry.sources],
+                        question=entry.question,
+                        similarity=float(similarities[best]),
+                        index_version=index_version
+                    )
+                    if self.conn:
+                        self.conn.execute("UPDATE answers SET last_used = ?, hits = ? WHERE id = ?",
+                                          (now, entry.hits, entry.id))
+                        self.conn.commit()
+
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if (self.hits + self.misses) % ANSWER_CACHE_LOG_EVERY == 0:
+                logger.info(self.format_stats())
+        return hit, vector
+
+    def store(self, query: str, index_version: str, answer: str, sources: List[Document],
+              vector: Optional[np.ndarray] = None):
+        """Cache an answer produced by the chain for this index version"""
+        if vector is None:
+            vector = self.embed(query)
+        now = time.time()
+        entry = _Entry(
+            id=str(uuid.uuid4()), index_version=index_version, vector=vector,
+            question=query, answer=answer,
+            sources=[{"page_content": doc.page_content, "metadata": doc.metadata} for doc in sources or []],
+            created_at=now, last_used=now
+        )
+
+        with self._lock:
+            self._entries[entry.id] = entry
+            self._matrices.pop(index_version, None)
+            self.stores += 1
+            if self.conn:
+                payload = encrypt_data(json.dumps({
+                    "question": entry.question, "answer": entry.answer,
+                    "sources": entry.sources, "vector": entry.vector.tolist()
+                }, default=str))
+                self.conn.execute(
+                    "INSERT INTO answers (id, index_version, payload, created_at, last_used, hits) "
+                    "VALUES (?, ?, ?, ?, ?, 0)",
+                    (entry.id, index_version, payload, now, now)
+                )
+            self._evict()
+            if self.conn:
+                self.conn.commit()
+
+    def _remove(self, entry_ids: List[str]):
+        for entry_id in entry_ids:
+            entry = self._entries.pop(entry_id)
+            self._matrices.pop(entry.index_version, None)
+        if self.conn and entry_ids:
+            self.conn.executemany("DELETE FROM answers WHERE id = ?", [(i,) for i in entry_ids])
+
+    def _purge_expired(self, now: float):
+        expired = [e.id for e in self._entries.values() if now - e.created_at > self.ttl_seconds]
+        if expired:
+            self._remove(expired)
+            self.expirations += len(expired)
+            if self.conn:
+                self.conn.commit()
+
+    def _evict(self):
+        overflow = len(self._entries) - self.max_entries
+        if overflow > 0:
+            self._remove(list(self._entries)[:overflow])
+            self.evictions += overflow
+
+    def clear(self):
+        with self._lock:
+            self._remove(list(self._entries))
+            if self.conn:
+                self.conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (f"Answer cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.1%} hit rate), {stats['entries']} entries, "
+                f"{stats['evictions']} evicted, {stats['expirations']} expired")
@@ -0,0 +1,227 @@
+"""Answers many questions at once: one embedding pass, one FAISS search, bounded LLM concurrency"""
+
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+# Allow running as a script (python src/chatbot/batch_qa.py) from the project root
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.chatbot.hybrid_retriever import (reciprocal_rank_fusion, fetch_documents, AdaptiveK, ADAPTIVE_K,
+                                          HYBRID_FETCH_K, HYBRID_RETRIEVAL, RRF_K)
+from src.chatbot.lexical_index import load_lexical_index
+from src.chatbot.vectorstore import normalizes_queries
+from src.chatbot.context_compressor import ContextCompressor, CONTEXT_COMPRESSION
+from src.chatbot.confidence import (similarities_from_distances, retrieval_confidence, stamp_confidence,
+                                    confidence_from_sources, is_low_confidence, LOW_CONFIDENCE_RESPONSE)
+from src.chatbot.pipeline import create_llm, set_custom_prompt, CUSTOM_PROMPT_TEMPLATE, RETRIEVER_K
+
+logger = logging.getLogger(__name__)
+
+DB_FAISS_PATH = "vectorstore/db_faiss"
+BATCH_QA_CONCURRENCY = int(os.getenv("BATCH_QA_CONCURRENCY", "8"))
+# Queries retrieved and answered together; NDJSON output is flushed per batch
+BATCH_QA_BATCH_SIZE = int(os.getenv("BATCH_QA_BATCH_SIZE", "256"))
+
+
+@dataclass
+class BatchAnswer:
+    position: int
+    query: str
+    answer: Optional[str] = None
+    sources: List[Document] = field(default_factory=list)
+    error: Optional[str] = None
+    confidence: Optional[float] = None
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "position": self.position,
+            "query": self.query,
+            "answer": self.answer,
+            "sources": [{"source": doc.metadata.get("source"), "page": doc.metadata.get("page")}
+                        for doc in self.sources],
+            "confidence": self.confidence,
+            "error": self.error
+        }
+
+
+class BatchQA:
+    """
+    Batch version of the app's RetrievalQA chain
+
+    Retrieval embeds every query in one embed_documents call and searches
+    FAISS once with the whole query matrix; with a BM25 index next to the
+    store each query's dense hits are fused with its lexical hits, as
+    HybridRetriever does; otherwise k adapts per query as in DenseRetriever.
+    With compression on, the prompt's context is cut to the sentences
+    closest to the query as in the app. Prompts use the app's template
+    and go to the LLM with at most max_concurrency calls in flight, except
+    for queries whose retrieval confidence is too low, which get the
+    "I don't know" reply without an LLM call. Results come back in input
+    order, and a failed query only fails its own item.
+    """
+
+    def __init__(self, db: FAISS, llm=None, k: int = RETRIEVER_K, max_concurrency: int = BATCH_QA_CONCURRENCY,
+                 store_path: Optional[str] = None, fetch_k: int = HYBRID_FETCH_K):
+        self.db = db
+        self.llm = llm or create_llm()
+        self.k = k
+        self.fetch_k = fetch_k
+        self.max_concurrency = max_concurrency
+        self.prompt = set_custom_prompt(CUSTOM_PROMPT_TEMPLATE)
+        self.compressor = ContextCompressor(db.embeddings) if CONTEXT_COMPRESSION else None
+        self.lexical_index = None
+        if HYBRID_RETRIEVAL:
+            store_path = store_path or os.path.dirname(getattr(db.docstore, "path", "") or "")
+            self.lexical_index = load_lexical_index(store_path) if store_path else None
+        # Adaptive k cuts the dense ranking, so it only applies without fusion
+        self.adaptive_k = AdaptiveK() if ADAPTIVE_K and self.lexical_index is None else None
+
+    def retrieve(self, queries: List[str]) -> Tuple[List[List[Document]], np.ndarray]:
+        """The retrieved chunks for each query, and the query vectors they were found with"""
+        vectors = np.asarray(self.db.embeddings.embed_documents(queries), dtype=np.float32)
+        if normalizes_queries(self.db):
+            faiss.normalize_L2(vectors)
+        depth = self.fetch_k if self.lexical_index is not None else self.k
+        if self.adaptive_k is not None:
+            depth = max(depth, self.adaptive_k.max_k)
+        distances, positions = self.db.index.search(vectors, depth)
+
+        mapping = self.db.index_to_docstore_id
+        rankings, confidences = [], []
+        for query, row, row_distances in zip(queries, positions, distances):
+            found = row != -1
+            dense = [mapping[int(position)] for position in row[found]]
+            similarities = similarities_from_distances(self.db.index, row_distances[found])
+            confidences.append(retrieval_confidence(similarities))
+            k = self.k if self.adaptive_k is None else self.adaptive_k.cutoff(similarities)
+            if self.lexical_index is None:
+                rankings.append(dense[:k])
+                continue
+            lexical = [mapping[position] for position, _ in self.lexical_index.search(query, self.fetch_k)]
+            scores = reciprocal_rank_fusion([dense, lexical], RRF_K)
+            rankings.append(sorted(scores, key=scores.get, reverse=True)[:k])
+
+        documents = fetch_documents(self.db, list({doc_id for ranking in rankings for doc_id in ranking}))
+        contexts = [stamp_confidence([documents[doc_id] for doc_id in ranking if doc_id in documents], confidence)
+                    for ranking, confidence in zip(rankings, confidences)]
+        return contexts, vectors
+
+    def answer(self, queries: List[str], offset: int = 0) -> List[BatchAnswer]:
+        results = [BatchAnswer(position=offset + i, query=query) for i, query in enumerate(queries)]
+        pending = []
+        for result in results:
+            if result.query and result.query.strip():
+                pending.append(result)
+            else:
+                result.error = "Empty query"
+        if not pending:
+            return results
+
+        try:
+            contexts, vectors = self.retrieve([result.query for result in pending])
+        except Exception as e:
+            logger.error(f"Batch retrieval failed: {e}")
+            for result in pending:
+                result.error = f"Retrieval failed: {e}"
+            return results
+
+        prompts, asked = [], []
+        for result, docs, vector in zip(pending, contexts, vectors):
+            result.confidence = confidence_from_sources(docs)
+            if is_low_confidence(result.confidence):
+                result.answer = LOW_CONFIDENCE_RESPONSE
+                continue
+            result.sources = docs
+            asked.append(result)
+            # Only the prompt gets the compressed excerpts; sources keep the retrieved chunks
+            if self.compressor is not None:
+                docs = self.compressor.compress(result.query, docs, query_vector=vector)
+            # Same context layout as the "stuff" chain: chunk texts separated by blank lines
+            context = "\n\n".join(doc.page_content for doc in docs)
+            prompts.append(self.prompt.format_prompt(context=context, question=result.query))
+
+        if not prompts:
+            return results
+        replies = self.llm.batch(prompts, config={"max_concurrency": self.max_concurrency},
+                                 return_exceptions=True)
+        for result, reply in zip(asked, replies):
+            if isinstance(reply, Exception):
+                result.error = f"{type(reply).__name__}: {reply}"
+            else:
+                result.answer = reply.content
+        return results
+
+    def answer_all(self, queries: List[str], batch_size: int = BATCH_QA_BATCH_SIZE,
+                   output_path: Optional[str] = None) -> List[BatchAnswer]:
+        """Answer in batches of batch_size, appending each batch to output_path as NDJSON"""
+        results: List[BatchAnswer] = []
+        output = open(output_path, "w", encoding="utf-8") if output_path else None
+        try:
+            for offset in range(0, len(queries), batch_size):
+                start = time.perf_counter()
+                batch = self.answer(queries[offset:offset + batch_size], offset)
+                results.extend(batch)
+                if output is not None:
+                    for result in batch:
+                        output.write(json.dumps(result.to_json(), ensure_ascii=False) + "\n")
+                    output.flush()
+                errors = sum(1 for result in batch if result.error)
+                logger.info(f"Answered {offset + len(batch)}/{len(queries)} queries "
+                            f"({len(batch) / (time.perf_counter() - start):.1f}/s, {errors} errors in batch)")
+        finally:
+            if output is not None:
+                output.close()
+        return results
+
+
+def read_queries(path: str) -> List[str]:
+    """The "query" column of a CSV such as data/medical_df.csv, or one query per line"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            return [row["query"] for row in csv.DictReader(f) if row.get("query")]
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    from src.chatbot.vectorstore import load_vectorstore
+    from src.chatbot.onnx_embeddings import load_embedding_model, EMBEDDING_MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="Answer a file of questions with the medical RAG chain")
+    parser.add_argument("queries", help="CSV with a query column, or a text file with one query per line")
+    parser.add_argument("--output", help="NDJSON file with one answer per line, in input order")
+    parser.add_argument("--db-path", default=DB_FAISS_PATH)
+    parser.add_argument("--k", type=int, default=RETRIEVER_K)
+    parser.add_argument("--concurrency", type=int, default=BATCH_QA_CONCURRENCY, help="LLM calls in flight")
+    parser.add_argument("--batch-size", type=int, default=BATCH_QA_BATCH_SIZE)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    queries = read_queries(args.queries)[:args.limit]
+    db = load_vectorstore(args.db_path, load_embedding_model(EMBEDDING_MODEL_NAME))
+    batch_qa = BatchQA(db, k=args.k, max_concurrency=args.concurrency)
+
+    start = time.perf_counter()
+    results = batch_qa.answer_all(queries, args.batch_size, args.output)
+    elapsed = time.perf_counter() - start
+    errors = sum(1 for result in results if result.error)
+    print(f"✅ Answered {len(results) - errors}/{len(results)} queries in {elapsed:.1f}s "
+          f"({len(results) / elapsed:.1f}/s), {errors} errors"
+          + (f", written to {args.output}" if args.output else ""))
+
+
+if __name__ == "__main__":
+    main()
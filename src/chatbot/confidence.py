@@ -0,0 +1,74 @@
+"""Answer confidence from dense retrieval scores, and the reply used when it is too low"""
+
+import os
+from typing import List, Optional, Sequence
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+# Below this the chunks are unlikely to answer the question and the LLM is skipped
+CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", "0.3"))
+LOW_CONFIDENCE_FAST_PATH = os.getenv("LOW_CONFIDENCE_FAST_PATH", "1") == "1"
+# How much a clear lead of the top hit over the runner-up adds to confidence
+CONFIDENCE_GAP_WEIGHT = 0.5
+CONFIDENCE_METADATA_KEY = "retrieval_confidence"
+
+LOW_CONFIDENCE_RESPONSE = (
+    "I don't know. I couldn't find information about this in my medical knowledge base. "
+    "Try rephrasing your question with the specific condition, test or medication you mean, "
+    "or consult a healthcare professional."
+)
+
+
+def similarities_from_distances(index, distances: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarities for one row of FAISS distances
+
+    The MiniLM embeddings are unit length, so a squared L2 distance d maps
+    to cosine 1 - d / 2; inner-product indexes already return the cosine.
+    """
+    distances = np.asarray(distances, dtype=np.float32)
+    if getattr(index, "metric_type", faiss.METRIC_L2) == faiss.METRIC_INNER_PRODUCT:
+        return distances
+    return 1.0 - distances / 2.0
+
+
+def retrieval_confidence(similarities: Sequence[float]) -> float:
+    """
+    Confidence in [0, 1] from the ranked similarities of one query's hits
+
+    The top-1 similarity, plus a bonus for the gap to the second hit: one
+    chunk standing out is a better sign than several equally weak matches.
+    """
+    if len(similarities) == 0:
+        return 0.0
+    top = float(similarities[0])
+    gap = top - float(similarities[1]) if len(similarities) > 1 else 0.0
+    return float(np.clip(top + CONFIDENCE_GAP_WEIGHT * gap, 0.0, 1.0))
+
+
+def stamp_confidence(documents: List[Document], confidence: float) -> List[Document]:
+    for doc in documents:
+        doc.metadata[CONFIDENCE_METADATA_KEY] = confidence
+    return documents
+
+
+def confidence_from_sources(sources: Optional[List[Document]]) -> Optional[float]:
+    """
+    The confidence a retriever stamped on its results, if any
+
+    No results at all is zero confidence, so an empty retrieval never
+    reaches the LLM with an empty context.
+    """
+    if not sources:
+        return 0.0
+    for doc in sources:
+        value = doc.metadata.get(CONFIDENCE_METADATA_KEY)
+        if value is not None:
+            return float(value)
+    return None
+
+
+def is_low_confidence(confidence: Optional[float], threshold: float = CONFIDENCE_THRESHOLD) -> bool:
+    return LOW_CONFIDENCE_FAST_PATH and confidence is not None and confidence < threshold
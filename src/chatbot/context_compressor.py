@@ -0,0 +1,137 @@
+"""Sentence-level compression of retrieved chunks to a prompt token budget"""
+
+import os
+import re
+import logging
+import threading
+from typing import List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.utils.tracing import trace_stage
+
+logger = logging.getLogger(__name__)
+
+# Off until bench_context_compression shows the shorter context costs no answer quality;
+# it also embeds every retrieved sentence on each query
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "0") == "1"
+# Context tokens passed to the LLM; three uncompressed 500-character chunks are ~330
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "200"))
+# Mistral's tokenizer is not in tiktoken; cl100k_base counts within a few percent of it on English text
+TIKTOKEN_ENCODING = os.getenv("TIKTOKEN_ENCODING", "cl100k_base")
+# Fragments shorter than this (page numbers, headings) are never kept on their own
+MIN_SENTENCE_CHARS = 20
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences of a chunk, with PDF line breaks folded into spaces"""
+    text = _WHITESPACE.sub(" ", text).strip()
+    if not text:
+        return []
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+class TokenCounter:
+    """tiktoken token counts, or a four-characters-per-token estimate when the encoding cannot load"""
+
+    def __init__(self, encoding_name: str = TIKTOKEN_ENCODING):
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        import tiktoken
+                        self._encoding = tiktoken.get_encoding(self.encoding_name)
+                    except Exception as e:
+                        logger.warning(f"Could not load tiktoken encoding {self.encoding_name}, "
+                                       f"estimating tokens from length: {e}")
+                    self._loaded = True
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        if self.encoding is None:
+            return [self.count(text) for text in texts]
+        return [len(tokens) for tokens in self.encoding.encode_batch(list(texts), disallowed_special=())]
+
+
+class ContextCompressor:
+    """
+    Keeps the sentences of the retrieved chunks most similar to the query
+
+    Every sentence is embedded with the retrieval model in one batch and
+    scored by cosine similarity to the query. Sentences are taken best
+    first until token_budget is spent, then put back in document and
+    reading order so the LLM still sees coherent passages. The best
+    sentence is always kept, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, embeddings: Embeddings, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 counter: Optional[TokenCounter] = None):
+        self.embeddings = embeddings
+        self.token_budget = token_budget
+        self.counter = counter or TokenCounter()
+
+    def compress(self, query: str, documents: List[Document],
+                 query_vector: Optional[Sequence[float]] = None) -> List[Document]:
+        """
+        Copies of documents reduced to their selected sentences, in the same order
+
+        Documents with no selected sentence are dropped. query_vector saves
+        re-embedding the query when the caller already has it.
+        """
+        units = []  # (document index, sentence index, sentence)
+        for doc_index, doc in enumerate(documents):
+            for sentence_index, sentence in enumerate(split_sentences(doc.page_content)):
+                if len(sentence) >= MIN_SENTENCE_CHARS:
+                    units.append((doc_index, sentence_index, sentence))
+        if not units:
+            return documents
+
+        sentences = [sentence for _, _, sentence in units]
+        lengths = self.counter.count_many(sentences)
+        if sum(lengths) <= self.token_budget:
+            return documents
+
+        with trace_stage("compress"):
+            if query_vector is None:
+                query_vector = self.embeddings.embed_query(query)
+            query_vector = np.asarray(query_vector, dtype=np.float32)
+            vectors = np.asarray(self.embeddings.embed_documents(sentences), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+            similarities = vectors @ query_vector / np.maximum(norms, 1e-12)
+
+            kept, used = [], 0
+            for i in np.argsort(-similarities):
+                if kept and used + lengths[i] > self.token_budget:
+                    continue
+                kept.append(int(i))
+                used += lengths[i]
+
+        selected = {}
+        for i in sorted(kept, key=lambda i: units[i][:2]):
+            doc_index, _, sentence = units[i]
+            selected.setdefault(doc_index, []).append(sentence)
+
+        compressed = []
+        for doc_index, doc in enumerate(documents):
+            if doc_index in selected:
+                compressed.append(Document(page_content=" ".join(selected[doc_index]),
+                                           metadata={**doc.metadata, "compressed": True}))
+        return compressed
+
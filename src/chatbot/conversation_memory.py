@@ -0,0 +1,241 @@
+"""Bounded conversation memory: the last few turns verbatim plus a rolling summary of the rest"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from langchain_core.prompts import PromptTemplate
+
+from src.utils.tracing import trace_stage
+from .context_compressor import TokenCounter
+
+logger = logging.getLogger(__name__)
+
+MEMORY_ENABLED = os.getenv("MEMORY_ENABLED", "1") == "1"
+# Turns (question and answer) kept verbatim; older ones are folded into the summary
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "3"))
+# Caps that keep the history part of the prompt the same size however long the session runs
+MEMORY_SUMMARY_MAX_TOKENS = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "200"))
+MEMORY_TURN_MAX_TOKENS = int(os.getenv("MEMORY_TURN_MAX_TOKENS", "150"))
+MEMORY_FORMAT_VERSION = 1
+# Threads that fold old turns into session summaries, off the request path
+MEMORY_FOLD_WORKERS = int(os.getenv("MEMORY_FOLD_WORKERS", "2"))
+# Sessions are serialized on one of this many locks, so updates of one session never interleave
+MEMORY_LOCK_STRIPES = 64
+
+SUMMARY_PROMPT_TEMPLATE = """
+Below is the running summary of a conversation between a user and a medical assistant,
+followed by the exchanges that have just left the assistant's short-term memory.
+Write the updated summary. Keep the user's conditions, symptoms, medications, ages and
+the topics already covered; drop pleasantries. Use at most {max_words} words.
+
+Current summary: {summary}
+
+New exchanges:
+{turns}
+
+Updated summary:
+"""
+
+
+def truncate_tokens(counter: TokenCounter, text: str, max_tokens: int, keep: str = "start") -> str:
+    """text cut to at most max_tokens, keeping its start or its end"""
+    if counter.count(text) <= max_tokens:
+        return text
+    encoding = counter.encoding
+    if encoding is None:
+        limit = max_tokens * 4
+        return text[:limit] if keep == "start" else text[-limit:]
+    tokens = encoding.encode(text, disallowed_special=())
+    tokens = tokens[:max_tokens] if keep == "start" else tokens[-max_tokens:]
+    return encoding.decode(tokens)
+
+
+def format_turns(turns: List[Dict[str, str]]) -> str:
+    return "\n".join(f"User: {turn['user']}\nAssistant: {turn['assistant']}" for turn in turns)
+
+
+@dataclass
+class ConversationMemory:
+    """
+    What the LLM is told about a session's earlier turns
+
+    Stored encrypted in ChatSession.session_summary, so reopening a session
+    reads one column instead of replaying its messages.
+    """
+    summary: str = ""
+    recent: List[Dict[str, str]] = field(default_factory=list)
+    # Turns folded into the summary so far
+    summarized_turns: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.summary or self.recent)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"version": MEMORY_FORMAT_VERSION, "summary": self.summary, "recent": self.recent,
+                "summarized_turns": self.summarized_turns}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ConversationMemory":
+        if not data or data.get("version") != MEMORY_FORMAT_VERSION:
+            return cls()
+        return cls(summary=data.get("summary", ""), recent=list(data.get("recent", [])),
+                   summarized_turns=data.get("summarized_turns", 0))
+
+    def retrieval_query(self, query: str) -> str:
+        """
+        What to retrieve with: the previous question and the new one together
+
+        Follow-ups like "what are its side effects?" do not name what they
+        are about; the question before them usually does.
+        """
+        if not self.recent:
+            return query
+        return f"{self.recent[-1]['user']} {query}"
+
+    def question_with_history(self, query: str) -> str:
+        """The prompt's question: the conversation so far, then the new question"""
+        if not self:
+            return query
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation: {self.summary}")
+        if self.recent:
+            parts.append(f"Most recent exchanges:\n{format_turns(self.recent)}")
+        parts.append(f"Current question: {query}")
+        return "\n\n".join(parts)
+
+
+class ConversationSummarizer:
+    """
+    Folds turns into a summary with one LLM call over the old summary and the new turns only
+
+    The work per fold does not grow with the session. If the LLM call fails,
+    the turns' questions are appended to the summary and its oldest text is
+    dropped to stay within max_tokens.
+    """
+
+    def __init__(self, llm, max_tokens: int = MEMORY_SUMMARY_MAX_TOKENS, counter: Optional[TokenCounter] = None):
+        self.llm = llm
+        self.max_tokens = max_tokens
+        self.counter = counter or TokenCounter()
+        self.prompt = PromptTemplate(template=SUMMARY_PROMPT_TEMPLATE,
+                                     input_variables=["summary", "turns", "max_words"])
+
+    def fold(self, summary: str, turns: List[Dict[str, str]]) -> str:
+        prompt = self.prompt.format(summary=summary or "(none yet)", turns=format_turns(turns),
+                                    # Roughly 0.75 words per token in English text
+                                    max_words=int(self.max_tokens * 0.75))
+        try:
+            reply = self.llm.invoke(prompt)
+            updated = (reply.content if hasattr(reply, "content") else str(reply)).strip()
+        except Exception as e:
+            logger.warning(f"Could not summarize conversation, keeping the questions instead: {e}")
+            asked = " ".join(f"The user asked: {turn['user']}" for turn in turns)
+            updated = f"{summary} {asked}".strip()
+            return truncate_tokens(self.counter, updated, self.max_tokens, keep="end")
+        return truncate_tokens(self.counter, updated, self.max_tokens)
+
+
+class ConversationMemoryStore:
+    """
+    Loads and updates each session's ConversationMemory through the SessionManager
+
+    A finished turn is appended and saved on the request path. Once a
+    session has more than recent_turns verbatim turns, the oldest are
+    folded into the summary on a background thread and saved when the
+    summarizer returns, so no turn waits on the LLM call. Until then the
+    next turn sees a few more verbatim turns, each still capped.
+    """
+
+    def __init__(self, session_manager, summarizer: ConversationSummarizer,
+                 recent_turns: int = MEMORY_RECENT_TURNS, turn_max_tokens: int = MEMORY_TURN_MAX_TOKENS,
+                 fold_workers: int = MEMORY_FOLD_WORKERS):
+        self.session_manager = session_manager
+        self.summarizer = summarizer
+        self.recent_turns = recent_turns
+        self.turn_max_tokens = turn_max_tokens
+        self.folds = 0
+        self.fold_failures = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=fold_workers, thread_name_prefix="memory-fold")
+        self._locks = [threading.Lock() for _ in range(MEMORY_LOCK_STRIPES)]
+        self._pending_lock = threading.Lock()
+        self._folding: Set[str] = set()
+
+    def _lock_for(self, session_id: str) -> threading.Lock:
+        return self._locks[hash(session_id) % len(self._locks)]
+
+    def _read(self, session_id: str) -> ConversationMemory:
+        return ConversationMemory.from_dict(self.session_manager.get_session_memory(session_id))
+
+    def load(self, session_id: str) -> ConversationMemory:
+        with trace_stage("memory_load"):
+            return self._read(session_id)
+
+    def record(self, session_id: str, user_message: str, bot_response: str) -> bool:
+        """Add a finished turn and save it, scheduling a fold if too many turns are verbatim; False if saving failed"""
+        counter = self.summarizer.counter
+        half = self.turn_max_tokens // 2
+        turn = {"user": truncate_tokens(counter, user_message, half),
+                "assistant": truncate_tokens(counter, bot_response, half)}
+        with trace_stage("memory_update"), self._lock_for(session_id):
+            # Read again rather than reuse the turn's copy, which a background fold may have replaced
+            memory = self._read(session_id)
+            memory.recent.append(turn)
+            saved = self.session_manager.save_session_memory(session_id, memory.to_dict())
+        if saved and len(memory.recent) > self.recent_turns:
+            self._schedule_fold(session_id)
+        return saved
+
+    def _schedule_fold(self, session_id: str):
+        with self._pending_lock:
+            if session_id in self._folding:
+                return
+            self._folding.add(session_id)
+        self._executor.submit(self._fold, session_id)
+
+    def _fold(self, session_id: str):
+        try:
+            while self._fold_overflow(session_id):
+                pass
+        except Exception as e:
+            with self._pending_lock:
+                self.fold_failures += 1
+            logger.warning(f"Could not fold conversation memory of session {session_id}: {e}")
+        finally:
+            with self._pending_lock:
+                self._folding.discard(session_id)
+
+    def _fold_overflow(self, session_id: str) -> bool:
+        """Fold the turns beyond recent_turns into the summary; True if more arrived meanwhile"""
+        with self._lock_for(session_id):
+            memory = self._read(session_id)
+            overflow = len(memory.recent) - self.recent_turns
+            if overflow <= 0:
+                return False
+            folded, summary = memory.recent[:overflow], memory.summary
+
+        # The LLM call runs without the lock; turns recorded meanwhile are only appended
+        updated = self.summarizer.fold(summary, folded)
+
+        with self._lock_for(session_id):
+            memory = self._read(session_id)
+            if memory.summary != summary or memory.recent[:overflow] != folded:
+                logger.info(f"Memory of session {session_id} changed while folding, discarding the fold")
+                return False
+            memory.summary = updated
+            memory.recent = memory.recent[overflow:]
+            memory.summarized_turns += overflow
+            if not self.session_manager.save_session_memory(session_id, memory.to_dict()):
+                return False
+        with self._pending_lock:
+            self.folds += 1
+        return len(memory.recent) > self.recent_turns
+
+    def close(self, wait: bool = False):
+        """Stop folding, or with wait finish the scheduled folds first; skipped ones happen after the session's next turn"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
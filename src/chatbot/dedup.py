@@ -0,0 +1,179 @@
+"""Exact and MinHash/LSH near-duplicate detection for chunks"""
+
+import os
+import re
+import zlib
+import hashlib
+import logging
+from typing import Dict, List, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+# Estimated Jaccard similarity of word shingles above which a chunk is dropped
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+NUM_PERM = 128
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def exact_hash(text: str) -> bytes:
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).digest()
+
+
+def _choose_bands(num_perm: int, threshold: float) -> int:
+    """Pick the LSH band count whose S-curve midpoint sits just below the threshold"""
+    best, best_error = 1, float("inf")
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        midpoint = (1 / bands) ** (1 / rows)
+        # Aim a little low so true duplicates are rarely missed; candidates are verified anyway
+        error = abs(midpoint - (threshold - 0.1))
+        if error < best_error:
+            best, best_error = bands, error
+    return best
+
+
+class ChunkDeduplicator:
+    """
+    Drops chunks that repeat an already-kept chunk exactly or nearly
+
+    Exact repeats are caught by a hash of the normalized text. Near repeats
+    are found with MinHash signatures over word shingles, bucketed with LSH
+    and confirmed when the estimated Jaccard similarity reaches the threshold.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = NUM_PERM,
+                 shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands = _choose_bands(num_perm, threshold)
+        self.rows = num_perm // self.bands
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+        self.exact: Dict[bytes, str] = {}
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.exact_of: Dict[str, bytes] = {}
+        self.buckets: Dict[Tuple[int, bytes], List[str]] = {}
+
+        # Rows produced during this run, persisted by the caller
+        self.new_signatures: List[Tuple[str, bytes, bytes]] = []
+        self.new_duplicates: List[Tuple[str, str, str, Optional[int]]] = []
+
+        self.kept = 0
+        self.exact_dropped = 0
+        self.near_dropped = 0
+        self.dropped_chars = 0
+
+    def minhash(self, text: str) -> np.ndarray:
+        tokens = normalize_text(text).split()
+        if len(tokens) <= self.shingle_size:
+            shingles = {" ".join(tokens)}
+        else:
+            shingles = {" ".join(tokens[i:i + self.shingle_size])
+                        for i in range(len(tokens) - self.shingle_size + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # Universal hashing (a*x + b mod p), same scheme as datasketch
+        permuted = np.bitwise_and((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME, _MAX_HASH)
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)]
+
+    def _register(self, chunk_id: str, digest: bytes, signature: np.ndarray):
+        self.exact.setdefault(digest, chunk_id)
+        self.exact_of[chunk_id] = digest
+        self.signatures[chunk_id] = signature
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, []).append(chunk_id)
+
+    def load(self, rows: Iterable[Tuple[str, bytes, bytes]]):
+        """Seed the index with signatures of chunks already in the vector store"""
+        for chunk_id, digest, signature in rows:
+            self._register(chunk_id, digest, np.frombuffer(signature, dtype=np.uint32))
+
+    def remove(self, chunk_ids: Iterable[str]):
+        """Forget chunks that were deleted from the vector store"""
+        for chunk_id in chunk_ids:
+            signature = self.signatures.pop(chunk_id, None)
+            digest = self.exact_of.pop(chunk_id, None)
+            if digest is not None and self.exact.get(digest) == chunk_id:
+                del self.exact[digest]
+            if signature is None:
+                continue
+            for key in self._band_keys(signature):
+                bucket = self.buckets.get(key)
+                if bucket and chunk_id in bucket:
+                    bucket.remove(chunk_id)
+                    if not bucket:
+                        del self.buckets[key]
+
+    def find_duplicate(self, text: str) -> Tuple[Optional[str], bytes, np.ndarray, bool]:
+        """Return (kept chunk ID or None, exact hash, signature, is_exact)"""
+        digest = exact_hash(text)
+        signature = self.minhash(text)
+        if digest in self.exact:
+            return self.exact[digest], digest, signature, True
+
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+
+        best_id, best_similarity = None, self.threshold
+        for candidate in candidates:
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = candidate, similarity
+        return best_id, digest, signature, False
+
+    def filter(self, chunks: Iterable[Tuple[str, Document]], report=None) -> Iterator[Tuple[str, Document]]:
+        """Yield only chunks that are not duplicates of one already kept"""
+        for chunk_id, doc in chunks:
+            if report is not None:
+                with report.stage("dedup", 1):
+                    kept_id, digest, signature, is_exact = self.find_duplicate(doc.page_content)
+            else:
+                kept_id, digest, signature, is_exact = self.find_duplicate(doc.page_content)
+
+            if kept_id is None:
+                self._register(chunk_id, digest, signature)
+                self.new_signatures.append((chunk_id, digest, signature.tobytes()))
+                self.kept += 1
+                yield chunk_id, doc
+                continue
+
+            if is_exact:
+                self.exact_dropped += 1
+            else:
+                self.near_dropped += 1
+            self.dropped_chars += len(doc.page_content)
+            self.new_duplicates.append((chunk_id, kept_id, doc.metadata.get("source"), doc.metadata.get("page")))
+
+    @property
+    def dropped(self) -> int:
+        return self.exact_dropped + self.near_dropped
+
+    def summary(self, dim: int) -> str:
+        """One-line report; dim is the width of the index's vectors, used to estimate the bytes saved"""
+        total = self.kept + self.dropped
+        shrink = self.dropped / total if total else 0.0
+        saved_mb = (self.dropped * dim * 4 + self.dropped_chars) / 1e6
+        return (f"dedup  {self.kept} kept, {self.exact_dropped} exact + {self.near_dropped} near "
+                f"duplicates dropped ({shrink:.1%} fewer vectors, ~{saved_mb:.1f} MB saved)")
@@ -0,0 +1,251 @@
+"""SQLite-backed docstore that reads chunk rows on demand"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections.abc import Mapping
+from typing import Dict, List, Iterator, Optional, Union
+
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore, AddableMixin
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DOCSTORE_FILENAME = "docstore.sqlite"
+# "zstd" compresses chunk rows, "none" stores them as plain JSON
+DOCSTORE_COMPRESSION = os.getenv("DOCSTORE_COMPRESSION", "none").lower()
+
+CODEC_NONE = 0
+CODEC_ZSTD = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id TEXT PRIMARY KEY,
+    codec INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    position INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS signatures (
+    id TEXT PRIMARY KEY,
+    exact_hash BLOB NOT NULL,
+    minhash BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS duplicates (
+    dropped_id TEXT PRIMARY KEY,
+    kept_id TEXT NOT NULL,
+    source TEXT,
+    page INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_duplicates_kept ON duplicates (kept_id);
+CREATE INDEX IF NOT EXISTS idx_duplicates_source ON duplicates (source);
+"""
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """
+    Maps vector IDs to chunk text and metadata stored in one SQLite file
+
+    Nothing is loaded up front: each search reads only the requested rows,
+    and the file is shared between processes through the OS page cache.
+    The positions table maps FAISS row numbers to vector IDs.
+    """
+
+    def __init__(self, path: str, read_only: bool = False, compression: str = DOCSTORE_COMPRESSION):
+        self.path = path
+        self.read_only = read_only
+        self._lock = threading.Lock()
+
+        self.codec = CODEC_ZSTD if compression == "zstd" else CODEC_NONE
+        if self.codec == CODEC_ZSTD and zstandard is None:
+            logger.warning("zstandard is not installed, storing docstore rows uncompressed")
+            self.codec = CODEC_NONE
+
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.executescript(SCHEMA)
+
+        # Stores written before deduplication existed have no duplicates table
+        self.has_duplicates = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'duplicates'"
+        ).fetchone() is not None
+
+    def _encode(self, doc: Document) -> bytes:
+        payload = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata},
+                             default=str).encode("utf-8")
+        if self.codec == CODEC_ZSTD:
+            return zstandard.ZstdCompressor(level=3).compress(payload)
+        return payload
+
+    @staticmethod
+    def _decode(doc_id: str, codec: int, payload: bytes) -> Document:
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("Docstore rows are zstd-compressed but zstandard is not installed")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        data = json.loads(payload)
+        return Document(id=doc_id, page_content=data["page_content"], metadata=data["metadata"])
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """Add documents, refusing IDs that already exist like InMemoryDocstore"""
+        if self.read_only:
+            raise ValueError("Docstore is opened read-only")
+        with self._lock:
+            rows = [(doc_id, self.codec, self._encode(doc)) for doc_id, doc in texts.items()]
+            try:
+                self.conn.executemany("INSERT INTO chunks (id, codec, payload) VALUES (?, ?, ?)", rows)
+            except sqlite3.IntegrityError:
+                raise ValueError("Tried to add ids that already exist")
+
+    def delete(self, ids: List) -> None:
+        """Delete documents along with their dedup signatures and duplicate records"""
+        if self.read_only:
+            raise ValueError("Docstore is opened read-only")
+        params = [(doc_id,) for doc_id in ids]
+        with self._lock:
+            self.conn.executemany("DELETE FROM chunks WHERE id = ?", params)
+            self.conn.executemany("DELETE FROM signatures WHERE id = ?", params)
+            self.conn.executemany("DELETE FROM duplicates WHERE kept_id = ?", params)
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT codec, payload FROM chunks WHERE id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        doc = self._decode(search, *row)
+
+        duplicate_sources = self.duplicate_sources(search)
+        if duplicate_sources:
+            doc.metadata["duplicate_sources"] = duplicate_sources
+        return doc
+
+    def search_many(self, ids: List[str]) -> Dict[str, Document]:
+        """Fetch several documents in one query"""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT id, codec, payload FROM chunks WHERE id IN ({placeholders})", list(ids)
+            ).fetchall()
+        return {doc_id: self._decode(doc_id, codec, payload) for doc_id, codec, payload in rows}
+
+    def iter_documents(self) -> Iterator[Document]:
+        """Stream every stored document in FAISS position order"""
+        cursor = self.conn.execute(
+            "SELECT c.id, c.codec, c.payload FROM positions p JOIN chunks c ON c.id = p.doc_id "
+            "ORDER BY p.position"
+        )
+        for doc_id, codec, payload in cursor:
+            yield self._decode(doc_id, codec, payload)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def load_signatures(self) -> Iterator:
+        """Yield (id, exact hash, minhash) rows of every kept chunk"""
+        return self.conn.execute("SELECT id, exact_hash, minhash FROM signatures")
+
+    def add_signatures(self, rows: List):
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO signatures (id, exact_hash, minhash) VALUES (?, ?, ?)", rows)
+
+    def add_duplicates(self, rows: List):
+        """Record (dropped id, kept id, source, page) for chunks removed as duplicates"""
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO duplicates (dropped_id, kept_id, source, page) VALUES (?, ?, ?, ?)",
+                rows)
+
+    def duplicate_sources(self, kept_id: str) -> List[Dict]:
+        """Sources and pages whose copy of this chunk was dropped in its favour"""
+        if not self.has_duplicates:
+            return []
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT source, page FROM duplicates WHERE kept_id = ? ORDER BY source, page", (kept_id,)
+            ).fetchall()
+        return [{"source": source, "page": page} for source, page in rows]
+
+    def dependent_sources(self, kept_ids: List[str]) -> set:
+        """Files that had chunks dropped as duplicates of the given chunks"""
+        sources = set()
+        with self._lock:
+            for start in range(0, len(kept_ids), 500):
+                batch = kept_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                sources.update(row[0] for row in self.conn.execute(
+                    f"SELECT DISTINCT source FROM duplicates WHERE kept_id IN ({placeholders})", batch))
+        return sources
+
+    def forget_duplicates_from(self, sources: List[str]):
+        """Drop duplicate records of files that are being re-ingested or removed"""
+        with self._lock:
+            self.conn.executemany("DELETE FROM duplicates WHERE source = ?", [(source,) for source in sources])
+
+    def load_positions(self) -> Dict[int, str]:
+        """Read the full position -> vector ID map (IDs only, no chunk text)"""
+        with self._lock:
+            return dict(self.conn.execute("SELECT position, doc_id FROM positions"))
+
+    def write_positions(self, index_to_docstore_id: Dict[int, str]):
+        """Replace the position -> vector ID map after the index changed"""
+        with self._lock:
+            self.conn.execute("DELETE FROM positions")
+            self.conn.executemany(
+                "INSERT INTO positions (position, doc_id) VALUES (?, ?)",
+                ((int(position), doc_id) for position, doc_id in index_to_docstore_id.items())
+            )
+
+    def position_map(self) -> "PositionMap":
+        return PositionMap(self)
+
+    def commit(self):
+        with self._lock:
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+class PositionMap(Mapping):
+    """Lazy FAISS position -> vector ID mapping backed by the docstore file"""
+
+    def __init__(self, docstore: SQLiteDocstore):
+        self.docstore = docstore
+
+    def __getitem__(self, position) -> str:
+        with self.docstore._lock:
+            row = self.docstore.conn.execute(
+                "SELECT doc_id FROM positions WHERE position = ?", (int(position),)
+            ).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __iter__(self) -> Iterator[int]:
+        with self.docstore._lock:
+            positions = [row[0] for row in self.docstore.conn.execute(
+                "SELECT position FROM positions ORDER BY position")]
+        return iter(positions)
+
+    def __len__(self) -> int:
+        with self.docstore._lock:
+            return self.docstore.conn.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
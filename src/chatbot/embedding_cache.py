@@ -0,0 +1,237 @@
+"""Persistent content-addressable cache for chunk embeddings"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Empty string disables the cache
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "vectorstore/embedding_cache")
+
+DIGEST_SIZE = 16
+
+
+def text_digest(text: str) -> bytes:
+    """Content hash of a chunk used as the cache key"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+class EmbeddingCache:
+    """
+    Append-only on-disk store of float32 vectors keyed by chunk text hash
+
+    One directory per model holds:
+      vectors.f32  - row-major float32 matrix, memory-mapped for reads
+      keys.bin     - 16-byte text digests, one per row (the offset index)
+      meta.json    - model name and vector dimension
+      lock         - held while the files are checked or appended to, so
+                     several ingestion processes can share the directory
+
+    A digest written twice (by processes that both missed it) keeps two
+    rows; lookups use the first and appends always go after the last row.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str):
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+        self.path = os.path.join(cache_dir, slug)
+        self.model_name = model_name
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.keys_path = os.path.join(self.path, "keys.bin")
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self.lock_path = os.path.join(self.path, "lock")
+
+        self.dim: Optional[int] = None
+        self.rows: Dict[bytes, int] = {}
+        # Complete rows in the files, duplicates included
+        self.count = 0
+        self._mmap: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self.read_only = False
+        self.hits = 0
+        self.misses = 0
+
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            return
+
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model_name") != self.model_name:
+            logger.warning(f"Embedding cache at {self.path} belongs to another model, ignoring it")
+            self.read_only = True
+            return
+        self.dim = meta["dim"]
+
+        with self._file_lock():
+            self._sync()
+        logger.info(f"Loaded embedding cache with {len(self.rows)} vectors from {self.path}")
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive lock on the cache files across processes"""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync(self):
+        """
+        Index rows other processes appended since the last look; call with the file lock held
+
+        A crash between (or during) the two appends can leave one file longer
+        than the other, or a partial row at the end; only complete pairs
+        count and the rest is cut off.
+        """
+        keys_size = os.path.getsize(self.keys_path) if os.path.exists(self.keys_path) else 0
+        vectors_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        count = min(keys_size // DIGEST_SIZE, vectors_size // self._row_bytes())
+        if count < self.count:
+            # The files were replaced under us; index them from the start
+            self.rows, self.count = {}, 0
+        if count > self.count:
+            with open(self.keys_path, "rb") as f:
+                f.seek(self.count * DIGEST_SIZE)
+                keys = f.read((count - self.count) * DIGEST_SIZE)
+            for i in range(count - self.count):
+                self.rows.setdefault(keys[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE], self.count + i)
+            self.count = count
+        self._truncate(count)
+
+    def _row_bytes(self) -> int:
+        return self.dim * np.dtype(np.float32).itemsize
+
+    def _truncate(self, count: int):
+        """Cut both files back to count rows so the next append lands at row count"""
+        for path, size in ((self.vectors_path, count * self._row_bytes()),
+                           (self.keys_path, count * DIGEST_SIZE)):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                logger.warning(f"Dropping {os.path.getsize(path) - size} trailing bytes from {path}")
+                os.truncate(path, size)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _matrix(self) -> np.memmap:
+        if self._mmap is None or self._mmap.shape[0] < self.count:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                   shape=(self.count, self.dim))
+        return self._mmap
+
+    def get_many(self, digests: List[bytes]) -> List[Optional[np.ndarray]]:
+        """Return cached vectors for the given digests, None where missing"""
+        with self._lock:
+            found = [self.rows.get(digest) for digest in digests]
+            hit_rows = [row for row in found if row is not None]
+            self.hits += len(hit_rows)
+            self.misses += len(found) - len(hit_rows)
+            if not hit_rows:
+                return [None] * len(digests)
+
+            vectors = iter(np.asarray(self._matrix()[hit_rows]))
+            return [next(vectors) if row is not None else None for row in found]
+
+    def put_many(self, digests: List[bytes], vectors: List[List[float]]):
+        """Append new vectors to the cache"""
+        if self.read_only:
+            return
+
+        with self._lock:
+            new = {}
+            for digest, vector in zip(digests, vectors):
+                if digest not in self.rows and digest not in new:
+                    new[digest] = vector
+            if not new:
+                return
+
+            with self._file_lock():
+                if self.dim is None:
+                    self.dim = len(next(iter(new.values())))
+                    os.makedirs(self.path, exist_ok=True)
+                    if not os.path.exists(self.meta_path):
+                        with open(self.meta_path, "w", encoding="utf-8") as f:
+                            json.dump({"model_name": self.model_name, "dim": self.dim}, f)
+
+                # Pick up what other processes appended and drop rows a failed
+                # append left behind, so the new rows land right after the last complete one
+                self._sync()
+                new = {digest: vector for digest, vector in new.items() if digest not in self.rows}
+                if not new:
+                    return
+
+                # Vectors first and keys second: a row only becomes visible once its key exists
+                matrix = np.asarray(list(new.values()), dtype=np.float32)
+                with open(self.vectors_path, "ab") as f:
+                    f.write(matrix.tobytes())
+                with open(self.keys_path, "ab") as f:
+                    f.write(b"".join(new.keys()))
+
+                for offset, digest in enumerate(new.keys()):
+                    self.rows[digest] = self.count + offset
+                self.count += len(new)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that consults an EmbeddingCache before running the model
+
+    The underlying model is created lazily, so a run where every chunk is
+    already cached never loads it. Queries are passed straight through.
+    """
+
+    def __init__(self, embedding_factory: Callable[[], Embeddings], cache: EmbeddingCache):
+        self._factory = embedding_factory
+        self._model: Optional[Embeddings] = None
+        self.cache = cache
+
+    @property
+    def model(self) -> Embeddings:
+        if self._model is None:
+            self._model = self._factory()
+        return self._model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        digests = [text_digest(text) for text in texts]
+        cached = self.cache.get_many(digests)
+
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            computed = self.model.embed_documents([texts[i] for i in missing])
+            self.cache.put_many([digests[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                cached[i] = vector
+
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in cached]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
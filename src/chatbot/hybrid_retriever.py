@@ -0,0 +1,212 @@
+"""Retriever that fuses BM25 and dense FAISS results with reciprocal rank fusion"""
+
+import os
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_community.vectorstores import FAISS
+
+from src.utils.tracing import trace_stage
+from .confidence import similarities_from_distances, retrieval_confidence, stamp_confidence
+from .lexical_index import BM25Index, load_lexical_index
+from .reranker import RerankRetriever, get_reranker, RERANK_ENABLED, RERANK_FETCH_K
+from .vectorstore import normalizes_queries
+
+logger = logging.getLogger(__name__)
+
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+# Candidates taken from each retriever before fusion
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))
+# Standard RRF damping constant from Cormack et al.
+RRF_K = 60
+
+# Adaptive k: send as many chunks as the similarity scores support, between min and max
+ADAPTIVE_K = os.getenv("ADAPTIVE_K", "1") == "1"
+ADAPTIVE_MIN_K = int(os.getenv("ADAPTIVE_MIN_K", "1"))
+ADAPTIVE_MAX_K = int(os.getenv("ADAPTIVE_MAX_K", "5"))
+# Cut where cosine similarity falls by more than this from one chunk to the next...
+ADAPTIVE_MAX_DROP = float(os.getenv("ADAPTIVE_MAX_DROP", "0.08"))
+# ...or below this absolute similarity
+ADAPTIVE_MIN_SIMILARITY = float(os.getenv("ADAPTIVE_MIN_SIMILARITY", "0.45"))
+
+
+@dataclass
+class AdaptiveK:
+    """
+    Chooses how many chunks to keep from the ranked dense similarities
+
+    A definition question usually has one chunk far ahead of the rest and
+    gets min_k; a broad question has a flat run of good matches and gets
+    up to max_k.
+    """
+    min_k: int = ADAPTIVE_MIN_K
+    max_k: int = ADAPTIVE_MAX_K
+    max_drop: float = ADAPTIVE_MAX_DROP
+    min_similarity: float = ADAPTIVE_MIN_SIMILARITY
+
+    def cutoff(self, similarities) -> int:
+        available = min(len(similarities), self.max_k)
+        keep = available
+        for i in range(1, available):
+            if (similarities[i] < self.min_similarity
+                    or similarities[i - 1] - similarities[i] > self.max_drop):
+                keep = i
+                break
+        return max(keep, min(self.min_k, available))
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = RRF_K,
+                           weights: Optional[List[float]] = None) -> Dict[str, float]:
+    """Fuse ranked ID lists: score(d) = sum of weight / (rrf_k + rank)"""
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (rrf_k + rank)
+    return scores
+
+
+def embed_query(vectorstore: FAISS, query: str) -> np.ndarray:
+    """The query's vector as the index expects it, shape (1, dim)"""
+    with trace_stage("embed"):
+        vector = np.asarray([vectorstore.embeddings.embed_query(query)], dtype=np.float32)
+        if normalizes_queries(vectorstore):
+            faiss.normalize_L2(vector)
+    return vector
+
+
+def dense_search(vectorstore: FAISS, vector: np.ndarray, k: int) -> Tuple[List[str], np.ndarray]:
+    """Docstore IDs of the k nearest chunks and their cosine similarities, searching FAISS directly"""
+    with trace_stage("vector_search"):
+        distances, positions = vectorstore.index.search(vector, k)
+    found = positions[0] != -1
+    mapping = vectorstore.index_to_docstore_id
+    ids = [mapping[int(position)] for position in positions[0][found]]
+    return ids, similarities_from_distances(vectorstore.index, distances[0][found])
+
+
+def fetch_documents(vectorstore: FAISS, ids: List[str]) -> Dict[str, Document]:
+    """Documents for the given IDs, in one query when the docstore supports it"""
+    docstore = vectorstore.docstore
+    with trace_stage("docstore"):
+        if hasattr(docstore, "search_many"):
+            return docstore.search_many(ids)
+        found = {}
+        for doc_id in ids:
+            doc = docstore.search(doc_id)
+            if isinstance(doc, Document):
+                found[doc_id] = doc
+        return found
+
+
+class DenseRetriever(BaseRetriever):
+    """
+    Top-k chunks by vector search alone; same results as db.as_retriever, with stages traced
+
+    With adaptive_k, up to its max_k are fetched and the list is cut where
+    the similarities say the relevant chunks end.
+    """
+
+    vectorstore: FAISS
+    k: int = 3
+    adaptive_k: Optional[AdaptiveK] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.search_with_vector(query)[0]
+
+    def search_with_vector(self, query: str) -> Tuple[List[Document], np.ndarray]:
+        """The retrieved chunks and the query vector they were found with"""
+        vector = embed_query(self.vectorstore, query)
+        if self.adaptive_k is None:
+            ids, similarities = dense_search(self.vectorstore, vector, self.k)
+        else:
+            ids, similarities = dense_search(self.vectorstore, vector, self.adaptive_k.max_k)
+            ids = ids[:self.adaptive_k.cutoff(similarities)]
+        documents = fetch_documents(self.vectorstore, ids)
+        results = [documents[doc_id] for doc_id in ids if doc_id in documents]
+        return stamp_confidence(results, retrieval_confidence(similarities)), vector[0]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Top-k chunks by reciprocal rank fusion of BM25 and vector search
+
+    Lexical matching catches drug names, acronyms and codes the MiniLM
+    embedding blurs together; the dense side keeps paraphrase recall.
+    k is fixed: adaptive k reads the drop in dense similarities, which says
+    nothing about where to cut the fused ranking.
+    """
+
+    vectorstore: FAISS
+    lexical_index: Any
+    k: int = 3
+    fetch_k: int = HYBRID_FETCH_K
+    rrf_k: int = RRF_K
+    dense_weight: float = 1.0
+    lexical_weight: float = 1.0
+
+    def _lexical_ids(self, query: str) -> List[str]:
+        mapping = self.vectorstore.index_to_docstore_id
+        with trace_stage("lexical_search"):
+            hits = self.lexical_index.search(query, self.fetch_k)
+        return [mapping[position] for position, _ in hits]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.search_with_vector(query)[0]
+
+    def search_with_vector(self, query: str) -> Tuple[List[Document], np.ndarray]:
+        """The retrieved chunks and the query vector they were found with"""
+        vector = embed_query(self.vectorstore, query)
+        dense_ids, similarities = dense_search(self.vectorstore, vector, self.fetch_k)
+        scores = reciprocal_rank_fusion([dense_ids, self._lexical_ids(query)], self.rrf_k,
+                                        [self.dense_weight, self.lexical_weight])
+        top_ids = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        # Only the fused top k are read from the docstore
+        documents = self._fetch(top_ids)
+
+        results = []
+        for doc_id in top_ids:
+            doc = documents.get(doc_id)
+            if doc is None:
+                continue
+            doc.metadata["rrf_score"] = scores[doc_id]
+            results.append(doc)
+        # Confidence comes from the dense scores; BM25 scores are not comparable across queries
+        return stamp_confidence(results, retrieval_confidence(similarities)), vector[0]
+
+    def _fetch(self, ids: List[str]) -> Dict[str, Document]:
+        return fetch_documents(self.vectorstore, ids)
+
+
+def make_retriever(db: FAISS, k: int = 3, store_path: Optional[str] = None,
+                   lexical_index: Optional[BM25Index] = None, rerank: bool = RERANK_ENABLED,
+                   adaptive: bool = ADAPTIVE_K) -> BaseRetriever:
+    """
+    Hybrid retriever when a BM25 index was built for the store, dense otherwise
+
+    The BM25 index is looked up next to the SQLite docstore unless store_path
+    or an already loaded index is given. HYBRID_RETRIEVAL=0 forces dense only.
+    With rerank, RERANK_FETCH_K candidates are fetched and a cross-encoder
+    keeps the best k. With adaptive, dense-only retrieval (no rerank)
+    replaces k by ADAPTIVE_MIN_K to ADAPTIVE_MAX_K chunks chosen per query
+    from the similarity scores; hybrid retrieval keeps k.
+    """
+    if rerank:
+        base = make_retriever(db, max(RERANK_FETCH_K, k), store_path, lexical_index, rerank=False, adaptive=False)
+        return RerankRetriever(base_retriever=base, reranker=get_reranker(), k=k)
+
+    if HYBRID_RETRIEVAL and lexical_index is None:
+        store_path = store_path or os.path.dirname(getattr(db.docstore, "path", "") or "")
+        lexical_index = load_lexical_index(store_path) if store_path else None
+        if lexical_index is None:
+            logger.warning("No BM25 index found for the vector store, using dense retrieval only")
+
+    if not HYBRID_RETRIEVAL or lexical_index is None:
+        return DenseRetriever(vectorstore=db, k=k, adaptive_k=AdaptiveK() if adaptive else None)
+    return HybridRetriever(vectorstore=db, lexical_index=lexical_index, k=k)
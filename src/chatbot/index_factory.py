@@ -0,0 +1,191 @@
+"""Build and tune exact or approximate FAISS indexes"""
+
+import os
+import json
+import math
+import logging
+from datetime import datetime
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional
+
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+INDEX_META_FILENAME = "index_meta.json"
+SERVING_INDEX_FILENAME = "serving.faiss"
+FLAT_INDEX_FILENAME = "index.faiss"
+
+# faiss wants roughly 39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+@dataclass
+class IndexSpec:
+    """Index type plus build-time and search-time parameters"""
+    index_type: str = "flat"
+    # HNSW
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    ef_search: int = 64
+    # IVF
+    nlist: Optional[int] = None  # None picks ~4*sqrt(n)
+    nprobe: int = 8
+    train_sample: int = 50000
+    # PQ
+    pq_m: int = 16
+    pq_bits: int = 8
+    seed: int = 42
+
+    @classmethod
+    def from_env(cls) -> "IndexSpec":
+        """Read the index configuration from FAISS_* environment variables"""
+        spec = cls(index_type=os.getenv("FAISS_INDEX_TYPE", "flat").lower())
+        for name, env in (("hnsw_m", "FAISS_HNSW_M"), ("ef_construction", "FAISS_EF_CONSTRUCTION"),
+                          ("ef_search", "FAISS_EF_SEARCH"), ("nlist", "FAISS_NLIST"),
+                          ("nprobe", "FAISS_NPROBE"), ("train_sample", "FAISS_TRAIN_SAMPLE"),
+                          ("pq_m", "FAISS_PQ_M"), ("pq_bits", "FAISS_PQ_BITS")):
+            if os.getenv(env):
+                setattr(spec, name, int(os.environ[env]))
+        if spec.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS_INDEX_TYPE {spec.index_type!r}, expected one of {INDEX_TYPES}")
+        return spec
+
+
+def search_overrides_from_env() -> Dict[str, int]:
+    """Search-time parameters explicitly set in the environment"""
+    overrides = {}
+    if os.getenv("FAISS_NPROBE"):
+        overrides["nprobe"] = int(os.environ["FAISS_NPROBE"])
+    if os.getenv("FAISS_EF_SEARCH"):
+        overrides["ef_search"] = int(os.environ["FAISS_EF_SEARCH"])
+    return overrides
+
+
+def _choose_nlist(spec: IndexSpec, n: int) -> int:
+    if spec.nlist:
+        return spec.nlist
+    return max(1, min(int(4 * math.sqrt(n)), n // MIN_POINTS_PER_CENTROID))
+
+
+def _choose_pq_m(spec: IndexSpec, dim: int) -> int:
+    # The number of sub-quantizers must divide the vector dimension
+    m = min(spec.pq_m, dim)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def _training_sample(vectors: np.ndarray, size: int, seed: int) -> np.ndarray:
+    if len(vectors) <= size:
+        return vectors
+    rng = np.random.default_rng(seed)
+    return vectors[np.sort(rng.choice(len(vectors), size, replace=False))]
+
+
+def build_index(vectors: np.ndarray, spec: IndexSpec) -> faiss.Index:
+    """
+    Build an L2 index of the requested type over vectors
+
+    Vectors are added in order, so position i in the new index is the same
+    chunk as position i in the flat index it was built from. Approximate
+    types fall back to flat when there is too little data to train them.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    index_type = spec.index_type
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = _choose_nlist(spec, n)
+        min_points = max(nlist * MIN_POINTS_PER_CENTROID, 2 ** spec.pq_bits if index_type == "ivf_pq" else 0)
+        if n < min_points or nlist < 2:
+            logger.warning(f"Only {n} vectors, too few to train {index_type}; building a flat index")
+            index_type = "flat"
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, spec.hnsw_m)
+        index.hnsw.efConstruction = spec.ef_construction
+    else:
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_L2)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _choose_pq_m(spec, dim), spec.pq_bits)
+        sample = _training_sample(vectors, max(spec.train_sample, nlist * MIN_POINTS_PER_CENTROID), spec.seed)
+        logger.info(f"Training {index_type} (nlist={nlist}) on {len(sample)} vectors")
+        index.train(sample)
+
+    index.add(vectors)
+    apply_search_params(index, asdict(spec))
+    return index
+
+
+def apply_search_params(index: faiss.Index, params: Dict[str, Any]):
+    """Set nprobe / efSearch on an index that supports them"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and params.get("nprobe"):
+        ivf.nprobe = int(params["nprobe"])
+    if hasattr(index, "hnsw") and params.get("ef_search"):
+        index.hnsw.efSearch = int(params["ef_search"])
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Map a faiss index object back to one of INDEX_TYPES"""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def save_serving_index(db_path: str, flat_index: faiss.Index, spec: IndexSpec) -> Dict[str, Any]:
+    """
+    Build the serving index from the flat index and record it in index_meta.json
+
+    The flat index stays the source of truth for incremental updates; the
+    serving index is rebuilt from it whenever the corpus changes.
+    """
+    if spec.index_type == "flat":
+        serving_file = FLAT_INDEX_FILENAME
+        built_type = "flat"
+        serving_path = os.path.join(db_path, SERVING_INDEX_FILENAME)
+        if os.path.exists(serving_path):
+            os.remove(serving_path)
+    else:
+        vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+        index = build_index(vectors, spec)
+        built_type = index_type_of(index)
+        serving_file = SERVING_INDEX_FILENAME
+        # Write then rename so processes with the old index mapped are unaffected
+        serving_path = os.path.join(db_path, serving_file)
+        faiss.write_index(index, f"{serving_path}.tmp")
+        os.replace(f"{serving_path}.tmp", serving_path)
+
+    meta = {
+        "index_type": built_type,
+        "index_file": serving_file,
+        "ntotal": int(flat_index.ntotal),
+        "params": asdict(spec),
+        "built_at": datetime.utcnow().isoformat()
+    }
+    tmp_path = os.path.join(db_path, f"{INDEX_META_FILENAME}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(db_path, INDEX_META_FILENAME))
+    logger.info(f"Serving index: {built_type} with {meta['ntotal']} vectors")
+    return meta
+
+
+def load_index_meta(db_path: str) -> Dict[str, Any]:
+    """Read index_meta.json, defaulting to the plain flat index"""
+    path = os.path.join(db_path, INDEX_META_FILENAME)
+    if not os.path.exists(path):
+        return {"index_type": "flat", "index_file": FLAT_INDEX_FILENAME, "params": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,139 @@
+"""Background reload of newly published vector index versions"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+from langchain_community.vectorstores import FAISS
+
+from .vectorstore import load_vectorstore, resolve_store_path, current_version, UNVERSIONED, DB_FAISS_PATH
+
+logger = logging.getLogger(__name__)
+
+# How often the CURRENT pointer is checked; 0 disables background reloads
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "10"))
+
+
+@dataclass
+class IndexSnapshot:
+    """One loaded index version and the chain built on top of it"""
+    version: str
+    db: FAISS
+    chain: Any = None
+    loaded_at: float = field(default_factory=time.time)
+    # Queries currently using the snapshot, and whether a newer version replaced it
+    users: int = 0
+    retired: bool = False
+
+    def close(self):
+        """Release the docstore connection; the pickled legacy docstore has nothing to close"""
+        close = getattr(self.db.docstore, "close", None)
+        if close is not None:
+            close()
+
+
+class HotSwapIndex:
+    """
+    Serves the published index version and swaps in new ones as they appear
+
+    A daemon thread polls CURRENT and loads a new version next to the one in
+    use. Only when it is fully loaded is the snapshot reference replaced, so
+    queries never wait on a reload. Queries should hold `acquire()` for
+    their whole run and use its db/chain/version together; a replaced
+    snapshot's docstore is closed when the last query using it finishes.
+    """
+
+    def __init__(self, db_path: str = DB_FAISS_PATH, embedding_model=None,
+                 build_chain: Optional[Callable[[FAISS], Any]] = None,
+                 poll_interval: float = INDEX_POLL_SECONDS):
+        self.db_path = db_path
+        self.embedding_model = embedding_model
+        self.build_chain = build_chain
+        self.poll_interval = poll_interval
+        self.reloads = 0
+
+        self._reload_lock = threading.Lock()
+        self._users_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._snapshot = self._load()
+        logger.info(f"Serving index version {self._snapshot.version}")
+
+        self._thread = None
+        if poll_interval > 0:
+            self._thread = threading.Thread(target=self._watch, name="index-reloader", daemon=True)
+            self._thread.start()
+
+    @property
+    def snapshot(self) -> IndexSnapshot:
+        return self._snapshot
+
+    @contextmanager
+    def acquire(self) -> Iterator[IndexSnapshot]:
+        """The current snapshot, kept open until the block exits even if a new version is swapped in"""
+        with self._users_lock:
+            snapshot = self._snapshot
+            snapshot.users += 1
+        try:
+            yield snapshot
+        finally:
+            with self._users_lock:
+                snapshot.users -= 1
+                unused = snapshot.retired and snapshot.users == 0
+            if unused:
+                self._close_snapshot(snapshot)
+
+    @property
+    def version(self) -> str:
+        return self._snapshot.version
+
+    def _load(self) -> IndexSnapshot:
+        version, store_path = resolve_store_path(self.db_path)
+        db = load_vectorstore(store_path, self.embedding_model)
+        chain = self.build_chain(db) if self.build_chain else None
+        return IndexSnapshot(version=version, db=db, chain=chain)
+
+    def check_for_update(self) -> bool:
+        """Load and swap in a newly published version; returns True if one was swapped in"""
+        published = current_version(self.db_path) or UNVERSIONED
+        if published == self._snapshot.version:
+            return False
+
+        with self._reload_lock:
+            if published == self._snapshot.version:
+                return False
+            start = time.perf_counter()
+            snapshot = self._load()
+            with self._users_lock:
+                previous = self._snapshot
+                self._snapshot = snapshot
+                previous.retired = True
+                unused = previous.users == 0
+            self.reloads += 1
+        logger.info(f"Swapped index version {previous.version} -> {snapshot.version} "
+                    f"in {time.perf_counter() - start:.2f}s")
+        if unused:
+            self._close_snapshot(previous)
+        return True
+
+    @staticmethod
+    def _close_snapshot(snapshot: IndexSnapshot):
+        try:
+            snapshot.close()
+            logger.info(f"Closed index version {snapshot.version}")
+        except Exception as e:
+            logger.warning(f"Could not close index version {snapshot.version}: {e}")
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check_for_update()
+            except Exception as e:
+                # Keep serving the loaded version; the next poll retries
+                logger.error(f"Failed to reload index from {self.db_path}: {e}")
+
+    def close(self):
+        self._stop.set()
@@ -0,0 +1,145 @@
+"""Streaming load -> chunk -> embed -> index pipeline for the knowledge base"""
+
+import os
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple, Optional, Any, Callable
+
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+# Chunks embedded per model call; bounds the working set of the pipeline
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+# Log a progress line every N embedded chunks
+PROGRESS_EVERY = int(os.getenv("INGEST_PROGRESS_EVERY", "2048"))
+
+
+class StageStats:
+    """Item count and busy time of one pipeline stage"""
+
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.seconds = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.name:<7} {self.items:>8} {self.unit:<7} "
+                f"{self.seconds:>8.2f}s  {self.throughput:>9.1f} {self.unit}/s")
+
+
+class IngestionReport:
+    """Per-stage progress and throughput for an ingestion run"""
+
+    def __init__(self, progress_every: int = PROGRESS_EVERY):
+        self.progress_every = progress_every
+        self.started = time.perf_counter()
+        self.stages = OrderedDict(
+            (name, StageStats(name, unit)) for name, unit in (
+                ("load", "pages"),
+                ("chunk", "chunks"),
+                ("dedup", "chunks"),
+                ("embed", "chunks"),
+                ("index", "vectors"),
+                ("lexical", "chunks")
+            )
+        )
+        self._next_progress = progress_every
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0):
+        """Time a block of work and attribute it to a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats = self.stages[name]
+            stats.seconds += time.perf_counter() - start
+            stats.items += items
+
+    def add_items(self, name: str, items: int):
+        self.stages[name].items += items
+
+    def timed(self, name: str, iterable: Iterable) -> Iterator:
+        """Wrap an iterator so time spent producing each item is charged to a stage"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            self.add_items(name, 1)
+            yield item
+
+    def maybe_log_progress(self):
+        if self.stages["index"].items >= self._next_progress:
+            self._next_progress += self.progress_every
+            logger.info(self.progress_line())
+            print(f"⏳ {self.progress_line()}")
+
+    def progress_line(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        return ", ".join(
+            f"{stats.name}={stats.items}" for stats in self.stages.values()
+        ) + f" ({elapsed:.1f}s)"
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        lines = [str(stats) for stats in self.stages.values()]
+        lines.append(f"total  {elapsed:.2f}s wall clock")
+        return "\n".join(lines)
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List[Any]]:
+    """Yield lists of up to size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def embed_and_index(chunks: Iterable[Tuple[str, Document]], embedding_model,
+                    db: Optional[FAISS] = None, report: IngestionReport = None,
+                    batch_size: int = EMBED_BATCH_SIZE,
+                    docstore_factory: Callable[[], Any] = None) -> Optional[FAISS]:
+    """
+    Embed (id, chunk) pairs in fixed-size batches and append them to the index
+
+    Only one batch of chunks and vectors is alive at a time, so memory does not
+    grow with the number of input documents beyond the index itself. When a
+    new store has to be created, docstore_factory supplies its docstore.
+    """
+    report = report or IngestionReport()
+
+    for batch in batched(chunks, batch_size):
+        ids = [chunk_id for chunk_id, _ in batch]
+        texts = [doc.page_content for _, doc in batch]
+        metadatas = [doc.metadata for _, doc in batch]
+
+        with report.stage("embed", len(batch)):
+            vectors = embedding_model.embed_documents(texts)
+
+        with report.stage("index", len(batch)):
+            text_embeddings = list(zip(texts, vectors))
+            if db is None:
+                extra = {"docstore": docstore_factory()} if docstore_factory else {}
+                db = FAISS.from_embeddings(text_embeddings, embedding_model,
+                                           metadatas=metadatas, ids=ids, **extra)
+            else:
+                db.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+        report.maybe_log_progress()
+
+    return db
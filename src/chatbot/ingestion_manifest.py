@@ -0,0 +1,168 @@
+"""Ingestion manifest for incremental knowledge base builds"""
+
+import os
+import json
+import uuid
+import hashlib
+import logging
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "ingestion_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_id(source: str, file_hash: str, index: int) -> str:
+    """Create a deterministic vector ID for the index-th chunk of a file"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}#{file_hash}#{index}"))
+
+
+def make_chunk_ids(source: str, file_hash: str, count: int) -> List[str]:
+    """Create deterministic vector IDs for the chunks produced by one file"""
+    return [make_chunk_id(source, file_hash, i) for i in range(count)]
+
+
+@dataclass
+class ManifestDiff:
+    """Files that need work to bring the index up to date"""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    hashes: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    @property
+    def to_ingest(self) -> List[str]:
+        return self.added + self.changed
+
+    @property
+    def to_delete(self) -> List[str]:
+        return self.changed + self.removed
+
+
+class IngestionManifest:
+    """Tracks the content hash and chunk IDs of every file in the vector store"""
+
+    def __init__(self, db_path: str, settings: Dict[str, Any] = None):
+        self.db_path = db_path
+        self.path = os.path.join(db_path, MANIFEST_FILENAME)
+        self.settings = settings or {}
+        self.files: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def load(cls, db_path: str, settings: Dict[str, Any] = None) -> "IngestionManifest":
+        """Load the manifest for a vector store, starting empty if absent or stale"""
+        manifest = cls(db_path, settings)
+        if not os.path.exists(manifest.path):
+            return manifest
+
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read ingestion manifest {manifest.path}: {e}")
+            return manifest
+
+        if data.get("version") != MANIFEST_VERSION:
+            logger.warning("Ingestion manifest version mismatch, rebuilding from scratch")
+            return manifest
+
+        if settings is not None and data.get("settings") != settings:
+            # Chunking or embedding settings changed, so every stored vector is stale
+            logger.info("Ingestion settings changed, all files will be re-ingested")
+            manifest.files = {
+                source: dict(entry, sha256=None)
+                for source, entry in data.get("files", {}).items()
+            }
+            return manifest
+
+        manifest.files = data.get("files", {})
+        return manifest
+
+    def diff(self, paths: Iterable[str]) -> ManifestDiff:
+        """Compare files on disk against the manifest"""
+        result = ManifestDiff()
+        seen = set()
+
+        for path in sorted(paths):
+            seen.add(path)
+            entry = self.files.get(path)
+            stat = os.stat(path)
+
+            # Skip re-hashing when size and mtime match the recorded values
+            if (entry and entry.get("sha256") and entry.get("size") == stat.st_size
+                    and entry.get("mtime") == stat.st_mtime):
+                file_hash = entry["sha256"]
+            else:
+                file_hash = hash_file(path)
+            result.hashes[path] = file_hash
+
+            if entry is None:
+                result.added.append(path)
+            elif entry.get("sha256") != file_hash:
+                result.changed.append(path)
+            else:
+                result.unchanged.append(path)
+                # Refresh stat info so the next run can skip hashing again
+                entry["size"] = stat.st_size
+                entry["mtime"] = stat.st_mtime
+
+        result.removed = sorted(source for source in self.files if source not in seen)
+        return result
+
+    def chunk_ids(self, sources: Iterable[str]) -> List[str]:
+        """Return all vector IDs recorded for the given files"""
+        ids = []
+        for source in sources:
+            entry = self.files.get(source)
+            if entry:
+                ids.extend(entry.get("chunk_ids", []))
+        return ids
+
+    def record(self, source: str, file_hash: str, chunk_ids: List[str]):
+        """Record the result of ingesting one file"""
+        stat = os.stat(source)
+        self.files[source] = {
+            "sha256": file_hash,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "chunk_ids": list(chunk_ids),
+            "ingested_at": datetime.utcnow().isoformat()
+        }
+
+    def forget(self, source: str):
+        """Drop a file from the manifest"""
+        self.files.pop(source, None)
+
+    def save(self, directory: Optional[str] = None):
+        """Write the manifest atomically next to the index, or into directory"""
+        directory = directory or self.db_path
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, MANIFEST_FILENAME)
+        data = {
+            "version": MANIFEST_VERSION,
+            "settings": self.settings,
+            "updated_at": datetime.utcnow().isoformat(),
+            "files": self.files
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+        logger.info(f"Ingestion manifest saved to {path}")
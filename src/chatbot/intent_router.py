@@ -0,0 +1,140 @@
+"""Routes conversational intents to canned responses instead of the RAG chain"""
+
+import os
+import re
+import random
+import logging
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Classifier confidence needed before a query skips retrieval and the LLM
+INTENT_ROUTE_MIN_SCORE = float(os.getenv("INTENT_ROUTE_MIN_SCORE", "0.85"))
+# Longer messages likely carry a medical question alongside the greeting
+INTENT_ROUTE_MAX_WORDS = int(os.getenv("INTENT_ROUTE_MAX_WORDS", "12"))
+RAG_ROUTE = "rag"
+
+GREETING_RESPONSES = [
+    "Hello! I'm your medical information assistant. What health question can I help you with today?",
+    "Hi there! Ask me about symptoms, conditions, tests, treatments or medications and I'll look it up for you.",
+    "Welcome! How can I help with your health question today?"
+]
+
+GOODBYE_RESPONSES = [
+    "Take care! If you have more health questions later, I'm here to help.",
+    "Goodbye, and stay well. Remember to consult a healthcare professional for personal medical advice.",
+    "Thanks for chatting. Wishing you good health!"
+]
+
+CAPABILITY_RESPONSE = (
+    "I can answer questions using a curated medical knowledge base, for example about:\n"
+    "- symptoms and causes of conditions\n"
+    "- diagnostic tests and what they measure\n"
+    "- treatments, medications and their side effects\n"
+    "- prevention, diet and nutrition\n"
+    "- basic first aid and which specialist to see\n\n"
+    "I can also summarize medical PDFs on the Summarize page. I can't diagnose you or replace "
+    "a doctor, so please consult a healthcare professional for personal medical advice."
+)
+
+CLARIFICATION_WITH_CONTEXT = (
+    "Of course. In short, my last answer said:\n\n> {summary}\n\n"
+    "Which part would you like me to explain further? Asking about a specific term or step helps me find "
+    "the most relevant information."
+)
+
+CLARIFICATION_NO_CONTEXT = (
+    "Happy to help clarify. Could you tell me which condition, test or medication you'd like me to explain?"
+)
+
+
+def first_sentences(text: str, count: int = 2, max_chars: int = 400) -> str:
+    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
+    summary = " ".join(sentences[:count])
+    return summary if len(summary) <= max_chars else summary[:max_chars].rsplit(" ", 1)[0] + "..."
+
+
+@dataclass
+class RouteDecision:
+    route: str
+    intent: str
+    score: float
+    response: Optional[str] = None
+
+    @property
+    def is_fast_path(self) -> bool:
+        return self.route != RAG_ROUTE
+
+
+class IntentRouter:
+    """
+    Answers greetings, goodbyes, capability and clarification requests locally
+
+    A query takes a fast path only when the classifier is confident and the
+    message is short; everything else goes to the RAG chain. Per-route
+    counters show how many LLM calls the fast paths avoided.
+    """
+
+    def __init__(self, min_score: float = INTENT_ROUTE_MIN_SCORE, max_words: int = INTENT_ROUTE_MAX_WORDS):
+        self.min_score = min_score
+        self.max_words = max_words
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+        self.handlers = {
+            "greeting": self._greeting,
+            "goodbye": self._goodbye,
+            "capability_inquiry": self._capability,
+            "clarification_request": self._clarification
+        }
+
+    def route(self, query: str, intent: str, score: float,
+              history: Optional[List[Dict]] = None) -> RouteDecision:
+        """Pick the route for a classified query; history is the chat's message list"""
+        handler = self.handlers.get(intent)
+        if handler and score >= self.min_score and len(query.split()) <= self.max_words:
+            decision = RouteDecision(route=intent, intent=intent, score=score, response=handler(history or []))
+        else:
+            decision = RouteDecision(route=RAG_ROUTE, intent=intent, score=score)
+
+        with self._lock:
+            self.counters[decision.route] += 1
+        logger.info(f"Intent route {decision.route} ({intent}, score {score:.2f}); {self.format_stats()}")
+        return decision
+
+    def _greeting(self, history: List[Dict]) -> str:
+        return random.choice(GREETING_RESPONSES)
+
+    def _goodbye(self, history: List[Dict]) -> str:
+        return random.choice(GOODBYE_RESPONSES)
+
+    def _capability(self, history: List[Dict]) -> str:
+        return CAPABILITY_RESPONSE
+
+    def _clarification(self, history: List[Dict]) -> str:
+        last_answer = next((m["content"] for m in reversed(history) if m.get("role") == "assistant"), None)
+        if not last_answer:
+            return CLARIFICATION_NO_CONTEXT
+        return CLARIFICATION_WITH_CONTEXT.format(summary=first_sentences(last_answer))
+
+    @property
+    def llm_calls_avoided(self) -> int:
+        return sum(count for route, count in self.counters.items() if route != RAG_ROUTE)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["llm_calls_avoided"] = self.llm_calls_avoided
+        return stats
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        routes = ", ".join(f"{route}={count}" for route, count in sorted(stats.items())
+                           if route != "llm_calls_avoided")
+        return f"routes {routes}; {stats['llm_calls_avoided']} LLM calls avoided"
+
+
+# Create a single instance to be used by the app
+intent_router = IntentRouter()
@@ -0,0 +1,171 @@
+"""Array-backed BM25 inverted index over the knowledge base chunks"""
+
+import os
+import re
+import json
+import math
+import logging
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_META_FILENAME = "bm25_meta.json"
+LEXICAL_ARRAYS = ("offsets", "docs", "tfs", "doc_lengths")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Keeps drug names and codes such as "covid-19", "hba1c" or "ace-inhibitor" whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+STOPWORDS = frozenset("""
+a an and are as at be been but by can do does for from had has have how i if in into is it its
+me my no not of on or our should so than that the their them then there these they this to
+was we were what when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _array_path(db_path: str, name: str) -> str:
+    return os.path.join(db_path, f"bm25_{name}.npy")
+
+
+def lexical_index_exists(db_path: str) -> bool:
+    return os.path.exists(os.path.join(db_path, LEXICAL_META_FILENAME))
+
+
+class BM25Index:
+    """
+    BM25 over chunks numbered by their FAISS position
+
+    Postings are stored as flat numpy arrays: offsets[t]:offsets[t+1] slices
+    docs (int32 positions) and tfs (uint16 term counts) for term t. The arrays
+    are saved as .npy files next to the vector index and memory-mapped on load.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], offsets: np.ndarray, docs: np.ndarray,
+                 tfs: np.ndarray, doc_lengths: np.ndarray, k1: float = BM25_K1, b: float = BM25_B):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.num_docs = len(doc_lengths)
+        self.avg_doc_length = float(doc_lengths.mean()) if self.num_docs else 0.0
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        """Build from chunk texts given in FAISS position order"""
+        vocabulary: Dict[str, int] = {}
+        term_ids, doc_ids, counts = array("i"), array("i"), array("H")
+        doc_lengths = array("I")
+
+        for position, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            frequencies: Dict[int, int] = {}
+            for token in tokens:
+                term_id = vocabulary.setdefault(token, len(vocabulary))
+                frequencies[term_id] = frequencies.get(term_id, 0) + 1
+            for term_id, count in frequencies.items():
+                term_ids.append(term_id)
+                doc_ids.append(position)
+                counts.append(min(count, 0xFFFF))
+
+        term_ids = np.frombuffer(term_ids, dtype=np.int32) if term_ids else np.zeros(0, np.int32)
+        # Stable sort keeps each term's postings in position order
+        order = np.argsort(term_ids, kind="stable")
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=offsets[1:])
+
+        return cls(
+            vocabulary,
+            offsets,
+            np.frombuffer(doc_ids, dtype=np.int32)[order] if doc_ids else np.zeros(0, np.int32),
+            np.frombuffer(counts, dtype=np.uint16)[order] if counts else np.zeros(0, np.uint16),
+            np.frombuffer(doc_lengths, dtype=np.uint32).copy() if doc_lengths else np.zeros(0, np.uint32),
+            k1, b
+        )
+
+    def save(self, db_path: str):
+        """Write the arrays and vocabulary, each through a temp file and rename"""
+        arrays = {"offsets": self.offsets, "docs": self.docs, "tfs": self.tfs, "doc_lengths": self.doc_lengths}
+        for name, values in arrays.items():
+            path = _array_path(db_path, name)
+            with open(f"{path}.tmp", "wb") as f:
+                np.save(f, values)
+            os.replace(f"{path}.tmp", path)
+
+        meta = {
+            "num_docs": self.num_docs,
+            "num_terms": len(self.vocabulary),
+            "k1": self.k1,
+            "b": self.b,
+            "terms": sorted(self.vocabulary, key=self.vocabulary.get)
+        }
+        tmp_path = os.path.join(db_path, f"{LEXICAL_META_FILENAME}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(db_path, LEXICAL_META_FILENAME))
+        logger.info(f"BM25 index: {meta['num_terms']} terms, {len(self.docs)} postings, {self.num_docs} chunks")
+
+    @classmethod
+    def load(cls, db_path: str) -> "BM25Index":
+        with open(os.path.join(db_path, LEXICAL_META_FILENAME), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(_array_path(db_path, name), mmap_mode="r") for name in LEXICAL_ARRAYS}
+        vocabulary = {term: term_id for term_id, term in enumerate(meta["terms"])}
+        return cls(vocabulary, k1=meta["k1"], b=meta["b"], **arrays)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Return up to k (position, score) pairs, best first"""
+        term_ids = {self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}
+        if not term_ids or not self.num_docs:
+            return []
+
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term_id in term_ids:
+            start, end = int(self.offsets[term_id]), int(self.offsets[term_id + 1])
+            docs = self.docs[start:end]
+            tfs = self.tfs[start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avg_doc_length)
+            # A term occurs once per chunk in its postings, so plain fancy-index addition is safe
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        best = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(position), float(scores[position])) for position in best]
+
+
+def build_lexical_index(docstore, index_to_docstore_id, db_path: str, batch_size: int = 512) -> BM25Index:
+    """Build and save the BM25 index for the chunks of a vector store, in FAISS position order"""
+    positions = sorted(index_to_docstore_id)
+
+    def texts():
+        for start in range(0, len(positions), batch_size):
+            ids = [index_to_docstore_id[p] for p in positions[start:start + batch_size]]
+            documents = docstore.search_many(ids)
+            for doc_id in ids:
+                doc = documents.get(doc_id)
+                yield doc.page_content if doc is not None else ""
+
+    index = BM25Index.build(texts())
+    index.save(db_path)
+    return index
+
+
+def load_lexical_index(db_path: str) -> Optional[BM25Index]:
+    """Load the BM25 index stored with a vector store version, if it has one"""
+    if not lexical_index_exists(db_path):
+        return None
+    return BM25Index.load(db_path)
@@ -0,0 +1,303 @@
+"""Client-side admission control for Mistral calls shared by every session in the process"""
+
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import numpy as np
+from pydantic import Field
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_mistralai import ChatMistralAI
+
+logger = logging.getLogger(__name__)
+
+LLM_GOVERNOR_ENABLED = os.getenv("LLM_GOVERNOR_ENABLED", "1") == "1"
+# Token bucket: sustained requests per second and the burst allowed above it
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "5"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+# AIMD concurrency window
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))
+# Slower calls than this (time to first token when streaming) shrink the window like a 429
+LLM_LATENCY_TARGET_MS = float(os.getenv("LLM_LATENCY_TARGET_MS", "8000"))
+LLM_DECREASE_FACTOR = 0.5
+LLM_DECREASE_COOLDOWN_SECONDS = 1.0
+# Waiters beyond LLM_MAX_QUEUE are rejected; admitted waiters give up after the deadline
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_DEADLINE_SECONDS = float(os.getenv("LLM_QUEUE_DEADLINE_SECONDS", "30"))
+# Retries of rate-limited calls, with full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_CAP_SECONDS = float(os.getenv("LLM_BACKOFF_CAP_SECONDS", "8"))
+LLM_GOVERNOR_LOG_EVERY = 100
+WAIT_SAMPLES = 1000
+
+
+class LLMOverloaded(RuntimeError):
+    """The governor did not admit the call; the caller should ask the user to retry"""
+
+
+class LLMQueueFull(LLMOverloaded):
+    pass
+
+
+class LLMQueueTimeout(LLMOverloaded):
+    pass
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """429 from the provider; ChatMistralAI raises httpx.HTTPStatusError for it"""
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    message = str(error)
+    return "429" in message or "rate limit" in message.lower()
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to capacity; not locked, the governor holds its lock"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """0 if a token was taken, otherwise seconds until one is available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def drain(self):
+        self.tokens = 0.0
+
+
+class LLMGovernor:
+    """
+    Rate limit, adaptive concurrency and retry for LLM calls
+
+    Calls wait in a FIFO queue of at most max_queue entries until a slot in
+    the concurrency window and a token-bucket token are both available, or
+    their deadline passes. The window grows by one slot per window's worth
+    of fast successes and halves on a 429 or a call slower than the latency
+    target (additive increase, multiplicative decrease). Rate-limited calls
+    are retried after a jittered exponential backoff, within the deadline.
+    """
+
+    def __init__(self, rate_per_second: float = LLM_RATE_PER_SECOND, burst: int = LLM_BURST,
+                 min_concurrency: int = LLM_MIN_CONCURRENCY, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 initial_concurrency: int = LLM_INITIAL_CONCURRENCY,
+                 latency_target_ms: float = LLM_LATENCY_TARGET_MS, max_queue: int = LLM_MAX_QUEUE,
+                 deadline_seconds: float = LLM_QUEUE_DEADLINE_SECONDS, max_retries: int = LLM_MAX_RETRIES,
+                 backoff_base: float = LLM_BACKOFF_BASE_SECONDS, backoff_cap: float = LLM_BACKOFF_CAP_SECONDS):
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(max(min_concurrency, min(initial_concurrency, max_concurrency)))
+        self.latency_target = latency_target_ms / 1000
+        self.max_queue = max_queue
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self._cond = threading.Condition()
+        self._waiters: deque = deque()
+        self._last_decrease = 0.0
+        self._waits: deque = deque(maxlen=WAIT_SAMPLES)
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.throttled = 0
+        self.slow = 0
+        self.retries = 0
+
+    def acquire(self, deadline: float) -> float:
+        """Block until admitted; returns seconds waited. Raises LLMOverloaded"""
+        start = time.monotonic()
+        with self._cond:
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise LLMQueueFull(f"LLM queue is full ({self.max_queue} waiting)")
+            waiter = object()
+            self._waiters.append(waiter)
+            try:
+                while True:
+                    now = time.monotonic()
+                    retry_in = None
+                    if self._waiters[0] is waiter and self.in_flight < int(self.limit):
+                        retry_in = self.bucket.take(now)
+                        if retry_in == 0:
+                            self.in_flight += 1
+                            self.admitted += 1
+                            break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise LLMQueueTimeout(f"No LLM slot within {now - start:.1f}s")
+                    self._cond.wait(remaining if retry_in is None else min(retry_in, remaining))
+            finally:
+                self._waiters.remove(waiter)
+                self._cond.notify_all()
+            waited = time.monotonic() - start
+            self._waits.append(waited)
+        return waited
+
+    def release(self, latency: float, succeeded: bool, throttled: bool = False):
+        """Free the slot and adapt the window to how the call went"""
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                # Stop the bucket from admitting a burst straight back into the limit
+                self.bucket.drain()
+                self._decrease()
+            elif succeeded and latency > self.latency_target:
+                self.slow += 1
+                self._decrease()
+            elif succeeded:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+            calls = self.admitted
+        if throttled or calls % LLM_GOVERNOR_LOG_EVERY == 0:
+            logger.info(self.format_stats())
+
+    def _decrease(self):
+        now = time.monotonic()
+        # One decrease per cooldown: a burst of 429s reflects one overload, not several
+        if now - self._last_decrease >= LLM_DECREASE_COOLDOWN_SECONDS:
+            self.limit = max(self.min_concurrency, self.limit * LLM_DECREASE_FACTOR)
+            self._last_decrease = now
+
+    def backoff(self, attempt: int, deadline: float, error: BaseException):
+        """Sleep before retry number attempt, or re-raise error if that would pass the deadline"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            raise error
+        with self._cond:
+            self.retries += 1
+        logger.warning(f"LLM rate limited, retry {attempt}/{self.max_retries} in {delay:.2f}s")
+        time.sleep(delay)
+
+    def call(self, fn: Callable[[], Any], deadline_seconds: Optional[float] = None) -> Any:
+        deadline = time.monotonic() + (deadline_seconds or self.deadline_seconds)
+        attempt = 0
+        while True:
+            self.acquire(deadline)
+            start = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                throttled = is_rate_limited(e)
+                self.release(time.monotonic() - start, succeeded=False, throttled=throttled)
+                if not throttled or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.backoff(attempt, deadline, e)
+                continue
+            self.release(time.monotonic() - start, succeeded=True)
+            return result
+
+    def stream(self, make_stream: Callable[[], Iterator[Any]],
+               deadline_seconds: Optional[float] = None) -> Iterator[Any]:
+        """
+        Governed iteration over make_stream()
+
+        The slot is held until the stream is exhausted or closed. Only a
+        failure before the first chunk is retried, since chunks already
+        yielded cannot be taken back; latency is time to the first chunk.
+        """
+        deadline = time.monotonic() + (deadline_seconds or self.deadline_seconds)
+        attempt = 0
+        while True:
+            self.acquire(deadline)
+            start = time.monotonic()
+            latency, succeeded, throttled = None, False, False
+            try:
+                for chunk in make_stream():
+                    if latency is None:
+                        latency = time.monotonic() - start
+                    yield chunk
+                succeeded = True
+                return
+            except Exception as e:
+                throttled = is_rate_limited(e)
+                if latency is not None or not throttled or attempt >= self.max_retries:
+                    raise
+                error = e
+            finally:
+                self.release(latency if latency is not None else time.monotonic() - start,
+                             succeeded, throttled)
+            attempt += 1
+            self.backoff(attempt, deadline, error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            waits = list(self._waits)
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "queue_depth": len(self._waiters),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "throttled": self.throttled,
+                "slow": self.slow,
+                "retries": self.retries,
+                "wait_p50_ms": float(np.percentile(waits, 50) * 1000) if waits else 0.0,
+                "wait_p95_ms": float(np.percentile(waits, 95) * 1000) if waits else 0.0,
+                "wait_max_ms": max(waits) * 1000 if waits else 0.0
+            }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (f"LLM governor: limit {stats['limit']:.1f}, {stats['in_flight']} in flight, "
+                f"{stats['queue_depth']} queued, wait p50 {stats['wait_p50_ms']:.0f}ms "
+                f"p95 {stats['wait_p95_ms']:.0f}ms; {stats['admitted']} admitted, "
+                f"{stats['rejected']} rejected, {stats['timeouts']} timed out, "
+                f"{stats['throttled']} throttled, {stats['slow']} slow, {stats['retries']} retries")
+
+
+class GovernedChatMistralAI(ChatMistralAI):
+    """ChatMistralAI whose calls and streams go through an LLMGovernor"""
+
+    governor: Any = Field(default=None, exclude=True)
+
+    def _generate(self, *args, **kwargs):
+        if self.governor is None:
+            return super()._generate(*args, **kwargs)
+        return self.governor.call(lambda: super(GovernedChatMistralAI, self)._generate(*args, **kwargs))
+
+    def _stream(self, *args, **kwargs):
+        if self.governor is None:
+            yield from super()._stream(*args, **kwargs)
+            return
+        yield from self.governor.stream(lambda: super(GovernedChatMistralAI, self)._stream(*args, **kwargs))
+
+    # The async paths fall back to BaseChatModel, which runs the governed sync calls in an executor
+    async def _agenerate(self, *args, **kwargs):
+        if self.governor is None:
+            return await super()._agenerate(*args, **kwargs)
+        return await BaseChatModel._agenerate(self, *args, **kwargs)
+
+    async def _astream(self, *args, **kwargs):
+        if self.governor is None:
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
+            return
+        async for chunk in BaseChatModel._astream(self, *args, **kwargs):
+            yield chunk
+
+
+# Create a single instance to be used by the app
+llm_governor = LLMGovernor()
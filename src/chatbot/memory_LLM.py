@@ -1,7 +1,38 @@
+"""
+Ingestion entry point: builds the FAISS index from the PDFs in data/
+
+Run as a script (python src/chatbot/memory_LLM.py) to bring the vector
+store in line with the data directory. Unchanged PDFs are skipped using
+the ingestion manifest, and each build is published as a new index
+version that the running app picks up.
+"""
+
+import os
+import sys
+import glob
+import shutil
+from dataclasses import asdict
+
 from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+import faiss
+
+# Allow running as a script (python src/chatbot/memory_LLM.py) from the project root
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.chatbot.ingestion_manifest import IngestionManifest, make_chunk_id
+from src.chatbot.ingestion import IngestionReport, embed_and_index, EMBED_BATCH_SIZE
+from src.chatbot.onnx_embeddings import (load_embedding_model, embedding_model_id, EMBEDDING_BACKEND,
+                                         EMBEDDING_MODEL_NAME)
+from src.chatbot.embedding_cache import EmbeddingCache, CachedEmbeddings, EMBEDDING_CACHE_DIR
+from src.chatbot.index_factory import IndexSpec, save_serving_index, load_index_meta, FLAT_INDEX_FILENAME
+from src.chatbot.docstore import SQLiteDocstore, DOCSTORE_FILENAME
+from src.chatbot.lexical_index import build_lexical_index, lexical_index_exists
+from src.chatbot.dedup import ChunkDeduplicator, DEDUP_ENABLED, DEDUP_THRESHOLD
+from src.chatbot.vectorstore import (open_vectorstore_for_update, new_docstore, publish_vectorstore,
+                                     resolve_store_path, begin_version, publish_version, copy_store_files)
+from src.utils.pdf_loader import PDF_PARSE_WORKERS, iter_pdf_pages, load_pdf_files_parallel
 
 ## Uncomment the following files if you're not using pipenv as your virtual environment manager
 #from dotenv import load_dotenv, find_dotenv
@@ -10,40 +41,236 @@ from langchain_community.vectorstores import FAISS
 
 # Step 1: Load raw PDF(s)
 DATA_PATH="data/"
-def load_pdf_files(data):
+def load_pdf_files(data, workers=PDF_PARSE_WORKERS):
+    # workers != 1 spreads files and page ranges across a process pool
+    if workers != 1:
+        return load_pdf_files_parallel(list_pdf_files(data), max_workers=workers)
+
     loader = DirectoryLoader(data,
                              glob='*.pdf',
                              loader_cls=PyPDFLoader)
-    
+
     documents=loader.load()
     return documents
 
-documents = load_pdf_files(data=DATA_PATH)
-# print("Length of PDF pages: ", len(documents))
+def list_pdf_files(data):
+    return sorted(glob.glob(os.path.join(data, '*.pdf')))
+
+def load_pdf_file(path):
+    return PyPDFLoader(path).load()
+
+def iter_pages(paths, workers=PDF_PARSE_WORKERS):
+    """Stream pages of the given files, parsing in parallel when configured"""
+    if workers != 1:
+        yield from iter_pdf_pages(paths, max_workers=workers)
+    else:
+        for path in paths:
+            yield from PyPDFLoader(path).lazy_load()
 
 
 # Step 2: Create Chunks
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+def get_text_splitter():
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE,
+                                          chunk_overlap=CHUNK_OVERLAP)
+
 def create_chunks(extracted_data):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500,
-                                                 chunk_overlap=50)
+    text_splitter = get_text_splitter()
     text_chunks = text_splitter.split_documents(extracted_data)
     return text_chunks
 
-text_chunks = create_chunks(documents)
+def iter_chunks(pages, file_hashes, report):
+    """Split pages as they stream in, yielding (chunk_id, chunk) pairs"""
+    text_splitter = get_text_splitter()
+    counters = {}
+    for page in pages:
+        source = page.metadata["source"]
+        with report.stage("chunk"):
+            page_chunks = text_splitter.split_documents([page])
+        report.add_items("chunk", len(page_chunks))
+
+        for chunk in page_chunks:
+            index = counters.get(source, 0)
+            counters[source] = index + 1
+            yield make_chunk_id(source, file_hashes[source], index), chunk
+
+def collect_chunk_ids(chunks, chunk_ids):
+    """Pass chunks through, recording the IDs that reach the index per source file
+
+    Only chunks that survive deduplication are recorded, so the manifest
+    never lists IDs that are missing from the index.
+    """
+    for chunk_id, chunk in chunks:
+        chunk_ids.setdefault(chunk.metadata["source"], []).append(chunk_id)
+        yield chunk_id, chunk
 
-print(type(text_chunks))
 
-# print("Number of chunks created: ", len(text_chunks))
+# Step 3: Create Vector Embeddings
 
-# Step 3: Create Vector Embeddings 
+def get_embedding_model(cache_dir=EMBEDDING_CACHE_DIR, backend=EMBEDDING_BACKEND):
+    # Unchanged chunks are served from the on-disk cache instead of the model
+    if not cache_dir:
+        return load_embedding_model(EMBEDDING_MODEL_NAME, backend)
 
-def get_embedding_model():
-    embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    embedding_model = CachedEmbeddings(
+        lambda: load_embedding_model(EMBEDDING_MODEL_NAME, backend),
+        EmbeddingCache(cache_dir, embedding_model_id(EMBEDDING_MODEL_NAME, backend))
+    )
     return embedding_model
 
-embedding_model = get_embedding_model()
 
 # Step 4: Store embeddings in FAISS
 DB_FAISS_PATH = "vectorstore/db_faiss"
-db = FAISS.from_documents(text_chunks, embedding_model)
-db.save_local(DB_FAISS_PATH)
+
+def ingestion_settings():
+    """Settings that invalidate every stored vector when they change"""
+    return {
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        # Model and backend: torch and int8 ONNX vectors must never share an index
+        "embedding_model": embedding_model_id(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND),
+        "dedup_threshold": DEDUP_THRESHOLD if DEDUP_ENABLED else None
+    }
+
+def expand_duplicate_dependents(db, manifest, changes):
+    """Re-ingest unchanged files whose dropped duplicates point at chunks being deleted
+
+    A file only keeps the chunks that were not already in the index, so when
+    the kept copy goes away its duplicates have to be embedded again.
+    """
+    pending = manifest.chunk_ids(changes.to_delete)
+    while pending:
+        dependents = sorted(source for source in db.docstore.dependent_sources(pending)
+                            if source in changes.unchanged)
+        for source in dependents:
+            changes.unchanged.remove(source)
+            changes.changed.append(source)
+            print(f"🔗 {source}: re-ingesting, it shared chunks with a changed file")
+        pending = manifest.chunk_ids(dependents)
+
+def serving_index_is_current(db_path, spec):
+    meta = load_index_meta(db_path)
+    return meta.get("params") == asdict(spec) and os.path.exists(os.path.join(db_path, meta["index_file"]))
+
+def build_vectorstore(data_path=DATA_PATH, db_path=DB_FAISS_PATH, workers=PDF_PARSE_WORKERS,
+                      batch_size=EMBED_BATCH_SIZE, index_spec=None):
+    """Incrementally bring the FAISS index in line with the PDFs in data_path
+
+    Pages stream through chunking and batched embedding straight into the
+    index, so peak memory does not depend on how many PDFs are ingested.
+    The flat index is the source of truth; the serving index type
+    (FAISS_INDEX_TYPE) is rebuilt from it after every change. Every build
+    is written to a new version directory and published by flipping the
+    CURRENT pointer, which running apps pick up without a restart.
+    Exact and near-duplicate chunks are dropped before embedding
+    (DEDUP_ENABLED, DEDUP_THRESHOLD); the kept chunk lists the sources of
+    its dropped copies.
+    """
+    index_spec = index_spec or IndexSpec.from_env()
+    current, store_path = resolve_store_path(db_path)
+    index_exists = os.path.exists(os.path.join(store_path, FLAT_INDEX_FILENAME))
+    manifest = IngestionManifest.load(store_path, settings=ingestion_settings())
+
+    if index_exists and not manifest.files:
+        # An index built without a manifest cannot be mapped back to files
+        print("⚠️  No ingestion manifest found, rebuilding the index from scratch")
+        index_exists = False
+    elif not index_exists:
+        manifest.files = {}
+
+    changes = manifest.diff(list_pdf_files(data_path))
+    print(f"📄 Files: {len(changes.added)} new, {len(changes.changed)} changed, "
+          f"{len(changes.removed)} removed, {len(changes.unchanged)} unchanged")
+
+    if index_exists and not changes.has_changes:
+        serving_current = serving_index_is_current(store_path, index_spec)
+        lexical_current = lexical_index_exists(store_path)
+        if not (serving_current and lexical_current):
+            version, work_path = begin_version(db_path)
+            copy_store_files(store_path, work_path)
+            if not serving_current:
+                flat_index = faiss.read_index(os.path.join(work_path, FLAT_INDEX_FILENAME))
+                meta = save_serving_index(work_path, flat_index, index_spec)
+                print(f"🔁 Rebuilt {meta['index_type']} serving index")
+            if not lexical_current:
+                docstore = SQLiteDocstore(os.path.join(work_path, DOCSTORE_FILENAME), read_only=True)
+                build_lexical_index(docstore, docstore.load_positions(), work_path)
+                docstore.close()
+                print("🔁 Built BM25 lexical index")
+            manifest.save(work_path)
+            publish_version(work_path, db_path, version)
+            print(f"✅ Published version {version}")
+            return
+        print(f"✅ Vector store is already up to date (version {current})")
+        return
+
+    embedding_model = get_embedding_model()
+    version, work_path = begin_version(db_path)
+
+    db = None
+    dedup = ChunkDeduplicator() if DEDUP_ENABLED else None
+    if index_exists:
+        db = open_vectorstore_for_update(store_path, work_path, embedding_model)
+        if dedup:
+            expand_duplicate_dependents(db, manifest, changes)
+            dedup.load(db.docstore.load_signatures())
+        db.docstore.forget_duplicates_from(changes.to_delete)
+
+        stale_ids = manifest.chunk_ids(changes.to_delete)
+        if stale_ids:
+            db.delete(stale_ids)
+            if dedup:
+                dedup.remove(stale_ids)
+            print(f"🗑️  Deleted {len(stale_ids)} stale chunks")
+
+    for source in changes.removed:
+        manifest.forget(source)
+
+    report = IngestionReport()
+    chunk_ids = {}
+    pages = report.timed("load", iter_pages(changes.to_ingest, workers))
+    chunks = iter_chunks(pages, changes.hashes, report)
+    if dedup:
+        chunks = dedup.filter(chunks, report)
+    chunks = collect_chunk_ids(chunks, chunk_ids)
+    db = embed_and_index(chunks, embedding_model, db, report, batch_size,
+                         docstore_factory=lambda: new_docstore(work_path))
+
+    for source in changes.to_ingest:
+        ids = chunk_ids.get(source, [])
+        manifest.record(source, changes.hashes[source], ids)
+        print(f"➕ {source}: {len(ids)} chunks")
+
+    print("📊 Ingestion stages:")
+    print(report.summary())
+    if dedup:
+        print(f"🧹 {dedup.summary(db.index.d if db is not None else 0)}")
+    if isinstance(embedding_model, CachedEmbeddings):
+        cache_stats = embedding_model.cache.stats()
+        print(f"💾 Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['entries']} entries")
+
+    if db is None:
+        print("⚠️  No documents to index")
+        shutil.rmtree(work_path, ignore_errors=True)
+        return
+
+    if dedup:
+        db.docstore.add_signatures(dedup.new_signatures)
+        db.docstore.add_duplicates(dedup.new_duplicates)
+
+    with report.stage("lexical", db.index.ntotal):
+        build_lexical_index(db.docstore, db.index_to_docstore_id, work_path)
+    print(f"🔤 BM25 index built in {report.stages['lexical'].seconds:.2f}s")
+
+    meta = save_serving_index(work_path, db.index, index_spec)
+    manifest.save(work_path)
+    publish_vectorstore(db, work_path, db_path, version)
+    print(f"✅ Saved {db.index.ntotal} vectors to {db_path} as version {version} "
+          f"({meta['index_type']} serving index)")
+
+
+if __name__ == "__main__":
+    build_vectorstore()
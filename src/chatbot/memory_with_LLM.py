@@ -1,4 +1,5 @@
 import os
+import sys
 
 from langchain_huggingface.llms import HuggingFaceEndpoint
 from langchain_core.prompts import PromptTemplate
@@ -7,6 +8,14 @@ from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_mistralai import ChatMistralAI
 
+# Allow running as a script (python src/chatbot/memory_with_LLM.py) from the project root
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.chatbot.vectorstore import load_vectorstore
+from src.chatbot.hybrid_retriever import make_retriever
+from src.chatbot.onnx_embeddings import load_embedding_model
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -36,14 +45,17 @@ def set_custom_prompt(custom_prompt_template):
 
 # Load Database
 DB_FAISS_PATH="vectorstore/db_faiss"
-embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-db=FAISS.load_local(DB_FAISS_PATH, embedding_model, allow_dangerous_deserialization = True)
+# EMBEDDING_BACKEND=onnx serves the model through onnxruntime with int8 weights
+embedding_model = load_embedding_model("sentence-transformers/all-MiniLM-L6-v2")
+db=load_vectorstore(DB_FAISS_PATH, embedding_model)
 
 # Create QA chain
 qa_chain = RetrievalQA.from_chain_type(
     llm = llm,
     chain_type = "stuff",
-    retriever = db.as_retriever(search_kwargs={'k':3}),
+    # Between ADAPTIVE_MIN_K and ADAPTIVE_MAX_K chunks per query, picked from the
+    # similarity scores; ADAPTIVE_K=0 goes back to a fixed k of 3
+    retriever = make_retriever(db, k=3),
     return_source_documents = True,
     chain_type_kwargs = {'prompt':set_custom_prompt(CUSTOM_PROMPT_TEMPLATE)}
     )
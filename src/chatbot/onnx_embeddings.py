@@ -0,0 +1,166 @@
+"""ONNX Runtime int8 backend for the sentence-transformer embedding model"""
+
+import os
+import json
+import logging
+import threading
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# "torch" runs sentence-transformers through PyTorch, "onnx" the quantized ONNX export
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/onnx")
+ONNX_BATCH_SIZE = int(os.getenv("ONNX_BATCH_SIZE", "64"))
+# 0 lets onnxruntime use every physical core
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+# all-MiniLM-L6-v2 truncates at 256 word pieces
+MAX_SEQ_LENGTH = 256
+
+FP32_FILENAME = "model.onnx"
+INT8_FILENAME = "model.int8.onnx"
+ONNX_META_FILENAME = "onnx_meta.json"
+OPSET = 14
+
+
+def model_dir_for(model_name: str, root: str = ONNX_MODEL_DIR) -> str:
+    return os.path.join(root, model_name.replace("/", "__"))
+
+
+def export_onnx(model_name: str = EMBEDDING_MODEL_NAME, output_dir: Optional[str] = None,
+                quantize: bool = True) -> str:
+    """
+    Export the transformer to ONNX and quantize its weights to int8
+
+    Only the encoder is exported; mean pooling and normalization are cheap and
+    done in numpy. Weights are quantized dynamically (activations stay float),
+    which needs no calibration data. Returns the output directory.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir = output_dir or model_dir_for(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["export sample"], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(output_dir, FP32_FILENAME)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=OPSET,
+            do_constant_folding=True
+        )
+    tokenizer.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILENAME), weight_type=QuantType.QInt8)
+
+    with open(os.path.join(output_dir, ONNX_META_FILENAME), "w", encoding="utf-8") as f:
+        json.dump({"model_name": model_name, "opset": OPSET, "quantized": quantize,
+                   "input_names": input_names}, f, indent=2)
+
+    logger.info(f"Exported {model_name} to {output_dir}")
+    return output_dir
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from an ONNX export served by onnxruntime
+
+    Produces the same mean-pooled, L2-normalized vectors as the
+    sentence-transformers pipeline. Documents are sorted by length before
+    batching so each batch pads to a similar sequence length.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, model_dir: Optional[str] = None,
+                 quantized: bool = True, batch_size: int = ONNX_BATCH_SIZE,
+                 threads: int = ONNX_THREADS, max_length: int = MAX_SEQ_LENGTH):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.model_dir = model_dir or model_dir_for(model_name)
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        model_path = os.path.join(self.model_dir, INT8_FILENAME if quantized else FP32_FILENAME)
+        if not os.path.exists(model_path):
+            logger.info(f"No ONNX export at {model_path}, exporting {model_name}")
+            export_onnx(model_name, self.model_dir, quantize=quantized)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        # The fast tokenizer is not safe to call from several threads at once
+        self._tokenizer_lock = threading.Lock()
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        with self._tokenizer_lock:
+            encoded = self.tokenizer(texts, padding=True, truncation=True,
+                                     max_length=self.max_length, return_tensors="np")
+        feed = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, feed)[0]
+
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a float32 matrix in input order"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = None
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            embedded = self._encode_batch([texts[i] for i in batch])
+            if vectors is None:
+                vectors = np.empty((len(texts), embedded.shape[1]), dtype=np.float32)
+            vectors[batch] = embedded
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode_batch([text])[0].tolist()
+
+
+def embedding_model_id(model_name: str = EMBEDDING_MODEL_NAME, backend: str = EMBEDDING_BACKEND) -> str:
+    """Name that identifies vectors produced by a model and backend, e.g. for caching"""
+    return f"{model_name}@onnx-int8" if backend == "onnx" else model_name
+
+
+def load_embedding_model(model_name: str = EMBEDDING_MODEL_NAME, backend: str = EMBEDDING_BACKEND) -> Embeddings:
+    """Create the embedding model for the configured backend"""
+    if backend == "onnx":
+        return OnnxEmbeddings(model_name)
+    if backend != "torch":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}, expected 'torch' or 'onnx'")
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name)
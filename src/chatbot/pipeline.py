@@ -0,0 +1,302 @@
+"""Headless chat pipeline: intent routing, retrieval, generation and persistence"""
+
+import os
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+from langchain.chains import RetrievalQA
+from langchain_mistralai import ChatMistralAI
+
+from src.utils.tracing import Trace, start_trace
+from .hybrid_retriever import make_retriever
+from .llm_governor import GovernedChatMistralAI, LLMOverloaded, llm_governor, LLM_GOVERNOR_ENABLED
+from .intent_router import IntentRouter, intent_router as default_router
+from .confidence import confidence_from_sources
+from .context_compressor import ContextCompressor, CONTEXT_COMPRESSION
+from .conversation_memory import ConversationMemory, ConversationMemoryStore
+from .single_flight import SingleFlight, single_flight as default_single_flight, SINGLE_FLIGHT_ENABLED
+from .streaming import AnswerStream
+
+logger = logging.getLogger(__name__)
+
+MISTRAL_MODEL = "mistral-large-latest"
+RETRIEVER_K = 3
+
+# Guided dialog: ask for the condition instead of answering a vague personal question
+PERSONAL_INQUIRY_INTENT = "personal_inquiry"
+PERSONAL_INQUIRY_RESPONSE = ("I understand you're asking about symptoms. To help me find the most relevant "
+                             "information, could you please specify the condition or illness you are concerned about?")
+
+CUSTOM_PROMPT_TEMPLATE = """
+        Use the pieces of information provided in the context to answer user's question.
+        If you dont know the answer, just say that you dont know, dont try to make up an answer. 
+        Dont provide anything out of the given context. Always be professional and empathetic in medical contexts.
+
+        Context: {context}
+        Question: {question}
+
+        Start the answer directly. No small talk please.
+        """
+
+
+def set_custom_prompt(custom_prompt_template: str = CUSTOM_PROMPT_TEMPLATE) -> PromptTemplate:
+    return PromptTemplate(template=custom_prompt_template, input_variables=["context", "question"])
+
+
+def create_llm(governor=None, **overrides) -> ChatMistralAI:
+    """
+    The chat model used by the app; overrides e.g. endpoint= point it at a stub server
+
+    Calls go through the process-wide LLM governor (or the one given) so
+    sessions share one rate limit and concurrency window; LLM_GOVERNOR_ENABLED=0
+    turns that off. Governed calls are retried by the governor only.
+    """
+    settings = dict(
+        model=MISTRAL_MODEL,
+        temperature=0,
+        max_retries=2,
+        api_key=os.environ.get("MISTRALI_API_KEY"),
+    )
+    settings.update(overrides)
+    if governor is None and LLM_GOVERNOR_ENABLED:
+        governor = llm_governor
+    if governor is None:
+        return ChatMistralAI(**settings)
+    # The governor backs off within its window and deadline; client retries
+    # underneath would multiply attempts inside a single governed call
+    settings["max_retries"] = overrides.get("max_retries", 0)
+    return GovernedChatMistralAI(governor=governor, **settings)
+
+
+def build_qa_chain(llm, db, k: int = RETRIEVER_K) -> RetrievalQA:
+    """RetrievalQA "stuff" chain over one loaded index version"""
+    return RetrievalQA.from_chain_type(
+        llm=llm,
+        chain_type="stuff",
+        # BM25 + dense fusion when ingestion built a lexical index
+        retriever=make_retriever(db, k=k),
+        return_source_documents=True,
+        chain_type_kwargs={'prompt': set_custom_prompt(CUSTOM_PROMPT_TEMPLATE)}
+    )
+
+
+@dataclass
+class TurnResult:
+    """Outcome of one chat turn with the seconds spent in each stage"""
+    query: str
+    answer: Optional[str]
+    sources: List[Document]
+    intent: str
+    route: str
+    index_version: Optional[str] = None
+    message_id: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+    # Answer shared from a concurrent identical query rather than generated
+    coalesced: bool = False
+    cached: bool = False
+    # Retrieval confidence in [0, 1]; low_confidence turns were answered without the LLM
+    confidence: Optional[float] = None
+    low_confidence: bool = False
+    session_id: Optional[str] = None
+    # The LLM was overloaded; the same message can be sent again shortly
+    retryable: bool = False
+
+
+class ChatPipeline:
+    """
+    One chat turn, as run by the Streamlit app and the HTTP service
+
+    classify -> route -> (retrieve -> generate) -> save, with each stage
+    timed. index is a HotSwapIndex whose snapshot chain answers the query;
+    classifier, session_manager and answer_cache are optional so parts can
+    be skipped. Concurrent turns with the same query and index version
+    share one generation through single_flight, unless it is disabled.
+
+    With a memory_store, answered turns are added to the session's
+    conversation memory and later turns are asked with it in the prompt.
+    Such follow-ups depend on the conversation, so they skip the answer
+    cache and single_flight, retrieve with the previous question included
+    and always reach the LLM.
+    """
+
+    def __init__(self, index, classifier=None, session_manager=None,
+                 router: Optional[IntentRouter] = None,
+                 single_flight: Optional[SingleFlight] = None, coalesce: bool = SINGLE_FLIGHT_ENABLED,
+                 answer_cache=None, memory_store: Optional[ConversationMemoryStore] = None,
+                 compress: bool = CONTEXT_COMPRESSION):
+        self.index = index
+        self.classifier = classifier
+        self.session_manager = session_manager
+        self.router = router or default_router
+        self.single_flight = (single_flight or default_single_flight) if coalesce else None
+        self.answer_cache = answer_cache
+        self.memory_store = memory_store
+        self.compress = compress
+        self._compressor: Optional[ContextCompressor] = None
+
+    def run(self, query: str, session_id: Optional[str] = None,
+            history: Optional[List[Dict[str, Any]]] = None,
+            on_token: Optional[Callable[[str], None]] = None,
+            session_factory: Optional[Callable[[], str]] = None) -> TurnResult:
+        """
+        Answer one message; on_token is called with each generated token
+
+        Without a session_id, session_factory is called for a new session
+        once there is a turn to save. A personal_inquiry turn gets the
+        guided clarifying question and is not saved, so it never creates
+        a session.
+        """
+        with start_trace() as trace:
+            result = self._run(trace, query, session_id, history, on_token, session_factory)
+            trace.add("total", trace.elapsed())
+        result.timings = dict(trace.stages)
+        return result
+
+    def _run(self, trace: Trace, query: str, session_id: Optional[str],
+             history: Optional[List[Dict[str, Any]]], on_token: Optional[Callable[[str], None]],
+             session_factory: Optional[Callable[[], str]]) -> TurnResult:
+        intent, score = "unknown", 0.0
+        if self.classifier is not None:
+            with trace.stage("classify"):
+                intent, score = self.classifier.predict_with_score(query)
+
+        if intent == PERSONAL_INQUIRY_INTENT:
+            return TurnResult(query=query, answer=PERSONAL_INQUIRY_RESPONSE, sources=[], intent=intent,
+                              route=PERSONAL_INQUIRY_INTENT, session_id=session_id)
+
+        decision = self.router.route(query, intent, score, history)
+        result = TurnResult(query=query, answer=None, sources=[], intent=intent, route=decision.route,
+                            session_id=session_id)
+
+        memory = None
+        try:
+            if decision.is_fast_path:
+                result.answer = decision.response
+            else:
+                if self.memory_store is not None:
+                    memory = self.memory_store.load(session_id) if session_id else ConversationMemory()
+                with self.index.acquire() as snapshot:
+                    result.index_version = snapshot.version
+                    self._answer(snapshot, result, trace, on_token, memory)
+
+            if self.session_manager is not None and not session_id and session_factory is not None:
+                session_id = result.session_id = session_factory()
+            if self.session_manager is not None and session_id:
+                stages = trace.stages
+                with trace.stage("save"):
+                    result.message_id = self.session_manager.save_message(
+                        session_id=session_id,
+                        user_message=query,
+                        bot_response=result.answer,
+                        source_documents=result.sources,
+                        response_time=trace.elapsed(),
+                        time_to_first_token=(stages["retrieve"] + stages["first_token"]
+                                             if "first_token" in stages else None),
+                        index_version=result.index_version,
+                        confidence_score=result.confidence
+                    )
+            if memory is not None and session_id and result.answer:
+                # After the save, so response_time does not include the memory update
+                self.memory_store.record(session_id, query, result.answer)
+        except LLMOverloaded as e:
+            logger.warning(f"Chat turn rejected, LLM overloaded: {e}")
+            result.error, result.retryable = str(e), True
+        except Exception as e:
+            logger.error(f"Chat turn failed: {e}")
+            result.error = str(e)
+        return result
+
+    def _answer(self, snapshot, result: TurnResult, trace: Trace,
+                on_token: Optional[Callable[[str], None]] = None, memory: Optional[ConversationMemory] = None):
+        """
+        Fill in answer and sources from the cache, a concurrent identical turn or the chain
+
+        AnswerStream records retrieve, first_token and generate in the
+        trace; a coalesced turn records its wait as "coalesced" instead,
+        and runs the chain itself if the leader takes longer than the
+        single_flight wait.
+        Low-confidence "I don't know" replies are shared but not cached.
+        A turn with conversation memory always goes to the chain. A cached
+        or coalesced answer reaches on_token as a single token.
+        """
+        query = result.query
+        if memory:
+            self._generate(snapshot, result, on_token, memory)
+            return
+
+        vector = None
+        if self.answer_cache is not None:
+            with trace.stage("cache_lookup"):
+                cached, vector = self.answer_cache.lookup(query, snapshot.version)
+            if cached:
+                result.answer, result.sources, result.cached = cached.answer, cached.sources, True
+                result.confidence = confidence_from_sources(cached.sources)
+                if on_token is not None:
+                    on_token(result.answer)
+                return
+
+        flight, leader = None, True
+        if self.single_flight is not None:
+            flight, leader = self.single_flight.join(query, snapshot.version)
+        if not leader:
+            # The leader shares its finished AnswerStream
+            try:
+                with trace.stage("coalesced"):
+                    stream = self.single_flight.wait(flight)
+            except TimeoutError:
+                logger.warning(f"Leader still answering after {self.single_flight.wait_seconds:.0f}s, "
+                               f"answering the coalesced turn itself")
+                # Answer independently; the stalled leader still settles its own flight
+                flight = None
+            else:
+                self._fill(result, stream)
+                result.coalesced = True
+                if on_token is not None and result.answer:
+                    on_token(result.answer)
+                return
+
+        try:
+            stream = self._generate(snapshot, result, on_token)
+        except BaseException as e:
+            if flight is not None:
+                self.single_flight.finish(flight, error=e)
+            raise
+        if flight is not None:
+            self.single_flight.finish(flight, stream)
+
+        if self.answer_cache is not None and stream.answer and not stream.low_confidence:
+            try:
+                self.answer_cache.store(query, snapshot.version, stream.answer, stream.sources, vector=vector)
+            except Exception as e:
+                logger.warning(f"Could not cache answer: {e}")
+
+    def _compressor_for(self, snapshot) -> Optional[ContextCompressor]:
+        if self.compress and self._compressor is None:
+            # Every index version is loaded with the same embedding model
+            self._compressor = ContextCompressor(snapshot.db.embeddings)
+        return self._compressor
+
+    def _generate(self, snapshot, result: TurnResult, on_token: Optional[Callable[[str], None]] = None,
+                  memory: Optional[ConversationMemory] = None) -> AnswerStream:
+        compressor = self._compressor_for(snapshot)
+        if memory:
+            # Weak retrieval does not mean "I don't know" here: the LLM also has the conversation
+            stream = AnswerStream(snapshot.chain, memory.retrieval_query(result.query),
+                                  question=memory.question_with_history(result.query), min_confidence=0.0,
+                                  compressor=compressor)
+        else:
+            stream = AnswerStream(snapshot.chain, result.query, compressor=compressor)
+        for token in stream:
+            if on_token is not None:
+                on_token(token)
+        self._fill(result, stream)
+        return stream
+
+    @staticmethod
+    def _fill(result: TurnResult, stream: AnswerStream):
+        result.answer, result.sources = stream.answer, stream.sources
+        result.confidence, result.low_confidence = stream.confidence, stream.low_confidence
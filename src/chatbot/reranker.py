@@ -0,0 +1,145 @@
+"""Cross-encoder reranking of retrieved chunks under a latency budget"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from src.utils.tracing import trace_stage
+
+logger = logging.getLogger(__name__)
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Candidates fetched from the first-stage retriever before reranking
+RERANK_FETCH_K = int(os.getenv("RERANK_FETCH_K", "20"))
+# Per-request budget for retrieval plus reranking; vector order is kept past it
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "250"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+RERANK_MAX_LENGTH = 256
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk) pairs with a small cross-encoder on CPU
+
+    The model is loaded on first use. A running average of the cost per
+    candidate lets callers skip scoring that cannot finish within budget.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL_NAME, batch_size: int = RERANK_BATCH_SIZE,
+                 max_length: int = RERANK_MAX_LENGTH):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._model = None
+        self._lock = threading.Lock()
+        self.seconds_per_candidate: Optional[float] = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        return self._model
+
+    def warmup(self, candidates: int = RERANK_FETCH_K):
+        """Load the model and seed the cost estimate so the first request is not over budget"""
+        probe = [Document(page_content="warm up " * 50)] * candidates
+        self.score("warm up", probe)
+
+    def estimate_seconds(self, candidates: int) -> float:
+        return (self.seconds_per_candidate or 0.0) * candidates
+
+    def score(self, query: str, documents: List[Document], deadline: Optional[float] = None) -> Optional[List[float]]:
+        """
+        Relevance score per document, or None if the deadline passed first
+
+        Candidates go through the model in batches of batch_size; with the
+        default settings that is a single pass.
+        """
+        pairs = [(query, doc.page_content) for doc in documents]
+        scores: List[float] = []
+        start = time.perf_counter()
+        for offset in range(0, len(pairs), self.batch_size):
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            batch = pairs[offset:offset + self.batch_size]
+            scores.extend(float(s) for s in self.model.predict(batch, batch_size=len(batch),
+                                                               show_progress_bar=False))
+
+        if pairs:
+            cost = (time.perf_counter() - start) / len(pairs)
+            previous = self.seconds_per_candidate
+            self.seconds_per_candidate = cost if previous is None else 0.8 * previous + 0.2 * cost
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+        return scores
+
+
+class RerankRetriever(BaseRetriever):
+    """
+    Over-fetches from a first-stage retriever and keeps the k best by cross-encoder
+
+    When retrieval plus reranking would exceed budget_ms, the first k
+    candidates are returned in the first-stage order instead.
+    """
+
+    base_retriever: BaseRetriever
+    reranker: CrossEncoderReranker
+    k: int = 3
+    budget_ms: float = RERANK_BUDGET_MS
+    reranked: int = 0
+    fallbacks: int = 0
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.search_with_vector(query)[0]
+
+    def search_with_vector(self, query: str) -> Tuple[List[Document], Optional[Any]]:
+        """The reranked chunks and the first stage's query vector, None if it does not expose one"""
+        start = time.perf_counter()
+        deadline = start + self.budget_ms / 1000
+        search = getattr(self.base_retriever, "search_with_vector", None)
+        candidates, vector = search(query) if search else (self.base_retriever.invoke(query), None)
+        if len(candidates) <= self.k:
+            return candidates, vector
+
+        remaining = deadline - time.perf_counter()
+        scores = None
+        if self.reranker.estimate_seconds(len(candidates)) <= remaining:
+            with trace_stage("rerank"):
+                scores = self.reranker.score(query, candidates, deadline)
+
+        if scores is None:
+            self.fallbacks += 1
+            logger.info(f"Rerank budget of {self.budget_ms:.0f}ms exhausted, keeping vector order "
+                        f"({self.fallbacks} fallbacks, {self.reranked} reranked)")
+            return candidates[:self.k], vector
+
+        self.reranked += 1
+        ranked = sorted(zip(scores, range(len(candidates))), key=lambda item: item[0], reverse=True)
+        results = []
+        for score, i in ranked[:self.k]:
+            doc = candidates[i]
+            doc.metadata["rerank_score"] = score
+            results.append(doc)
+        return results, vector
+
+
+_default_reranker: Optional[CrossEncoderReranker] = None
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Process-wide reranker so the model is loaded once"""
+    global _default_reranker
+    if _default_reranker is None:
+        _default_reranker = CrossEncoderReranker()
+        _default_reranker.warmup()
+    return _default_reranker
@@ -0,0 +1,152 @@
+"""Coalesces concurrent identical queries onto one retrieval + LLM call"""
+
+import os
+import re
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1") == "1"
+# How long a follower waits on the leader before giving up and answering the query itself
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "120"))
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the answer"""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!. ").lower()
+
+
+class Flight:
+    """One in-progress call; followers block in wait() until the leader settles it"""
+
+    def __init__(self, key: Tuple[str, str]):
+        self.key = key
+        self.started_at = time.perf_counter()
+        self.followers = 0
+        self._done = threading.Event()
+        self._result: Any = None
+        self._error: Optional[BaseException] = None
+
+    def resolve(self, result: Any):
+        self._result = result
+        self._done.set()
+
+    def fail(self, error: BaseException):
+        self._error = error
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """The leader's result; re-raises its error, TimeoutError if it took too long"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Coalesced call still running after {timeout:.0f}s")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class SingleFlight:
+    """
+    Lets the first caller for a key do the work while later callers wait
+
+    Keys are (normalized query, index version), so a query against a newly
+    published index never shares an answer computed on the old one. Results
+    are not kept once the leader finishes; the answer cache covers reuse
+    after that.
+    """
+
+    def __init__(self, wait_seconds: float = SINGLE_FLIGHT_WAIT_SECONDS):
+        self.wait_seconds = wait_seconds
+        self._flights: Dict[Tuple[str, str], Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    @staticmethod
+    def key(query: str, index_version: Optional[str]) -> Tuple[str, str]:
+        return normalize_query(query), index_version or ""
+
+    def join(self, query: str, index_version: Optional[str]) -> Tuple[Flight, bool]:
+        """
+        The flight for this query and whether the caller leads it
+
+        A leader must call finish() once it has a result or an error; a
+        follower calls wait() on the flight instead.
+        """
+        key = self.key(query, index_version)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.coalesced += 1
+                return flight, False
+            flight = Flight(key)
+            self._flights[key] = flight
+            self.leaders += 1
+            return flight, True
+
+    def finish(self, flight: Flight, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            if error is not None:
+                self.failures += 1
+        if error is not None:
+            flight.fail(error)
+        else:
+            flight.resolve(result)
+        if flight.followers:
+            logger.info(f"Shared one answer with {flight.followers} coalesced requests; {self.format_stats()}")
+
+    def wait(self, flight: Flight) -> Any:
+        """The leader's result; raises TimeoutError after wait_seconds, for the caller to do the work itself"""
+        try:
+            return flight.wait(self.wait_seconds)
+        except TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def do(self, query: str, index_version: Optional[str], fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per concurrent (query, version); returns (result, shared)"""
+        flight, leader = self.join(query, index_version)
+        if not leader:
+            return self.wait(flight), True
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(flight, error=e)
+            raise
+        self.finish(flight, result)
+        return result, False
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self.leaders + self.coalesced
+            return {
+                "calls": calls,
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_rate": self.coalesced / calls if calls else 0.0,
+                "in_flight": len(self._flights),
+                "failures": self.failures,
+                "timeouts": self.timeouts
+            }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (f"Single flight: {stats['coalesced']} of {stats['calls']} calls coalesced "
+                f"({stats['coalesced_rate']:.1%}), {stats['in_flight']} in flight, "
+                f"{stats['failures']} failed, {stats['timeouts']} timed out")
+
+
+# Create a single instance to be used by the app
+single_flight = SingleFlight()
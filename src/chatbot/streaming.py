@@ -0,0 +1,112 @@
+"""Token streaming for answers from a RetrievalQA chain"""
+
+import time
+import logging
+from typing import Iterator, List, Optional
+
+from langchain_core.documents import Document
+
+from src.utils.tracing import record_stage
+from .confidence import confidence_from_sources, is_low_confidence, CONFIDENCE_THRESHOLD, LOW_CONFIDENCE_RESPONSE
+from .context_compressor import ContextCompressor
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerStream:
+    """
+    Retrieves context, then streams the LLM answer token by token
+
+    Uses the retriever, LLM and prompt of a "stuff" RetrievalQA chain so the
+    streamed answer sees exactly what qa_chain.invoke would. Iterate over the
+    stream to receive tokens; answer, sources and timings are filled in as
+    it progresses.
+
+    When the retriever's confidence is below min_confidence the LLM is not
+    called: the stream yields the "I don't know" reply and keeps no sources;
+    a min_confidence of 0 always calls it.
+    question, when given, replaces the query in the prompt (e.g. with the
+    conversation so far prepended); retrieval always uses the query.
+    With a compressor, only the prompt's context is cut down to the
+    sentences closest to the query; sources stay the retrieved chunks.
+    """
+
+    def __init__(self, qa_chain, query: str, min_confidence: float = CONFIDENCE_THRESHOLD,
+                 question: Optional[str] = None, compressor: Optional[ContextCompressor] = None):
+        self.query = query
+        self.question = question or query
+        self.min_confidence = min_confidence
+        self.compressor = compressor
+        self.retriever = qa_chain.retriever
+        combine_chain = qa_chain.combine_documents_chain
+        self.llm = combine_chain.llm_chain.llm
+        self.prompt = combine_chain.llm_chain.prompt
+        self.document_separator = getattr(combine_chain, "document_separator", "\n\n")
+
+        self.sources: List[Document] = []
+        self.query_vector = None
+        self.answer = ""
+        self.confidence: Optional[float] = None
+        self.low_confidence = False
+        self.started = time.perf_counter()
+        self.retrieval_time: Optional[float] = None
+        self.time_to_first_token: Optional[float] = None
+        self.total_time: Optional[float] = None
+
+    def retrieve(self) -> List[Document]:
+        """Fetch the context documents; called automatically when iteration starts"""
+        if self.retrieval_time is None:
+            # The compressor reuses the query vector when the retriever exposes it
+            search = getattr(self.retriever, "search_with_vector", None) if self.compressor else None
+            if search is not None:
+                self.sources, self.query_vector = search(self.query)
+            else:
+                self.sources = self.retriever.invoke(self.query)
+            self.retrieval_time = time.perf_counter() - self.started
+            record_stage("retrieve", self.retrieval_time)
+            self.confidence = confidence_from_sources(self.sources)
+            self.low_confidence = is_low_confidence(self.confidence, self.min_confidence)
+        return self.sources
+
+    def __iter__(self) -> Iterator[str]:
+        self.retrieve()
+        if self.low_confidence:
+            yield from self._decline()
+            return
+
+        context_documents = self.sources
+        if self.compressor is not None:
+            context_documents = self.compressor.compress(self.query, self.sources, query_vector=self.query_vector)
+        context = self.document_separator.join(doc.page_content for doc in context_documents)
+        prompt = self.prompt.format(context=context, question=self.question)
+
+        parts = []
+        for chunk in self.llm.stream(prompt):
+            token = chunk.content if hasattr(chunk, "content") else str(chunk)
+            if not token:
+                continue
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - self.started
+            parts.append(token)
+            yield token
+
+        self.answer = "".join(parts)
+        self.total_time = time.perf_counter() - self.started
+        record_stage("first_token", (self.time_to_first_token or self.total_time) - self.retrieval_time)
+        record_stage("generate", self.total_time - self.retrieval_time)
+        logger.info(f"Streamed answer: retrieval {self.retrieval_time:.2f}s, "
+                    f"first token {self.time_to_first_token or 0:.2f}s, total {self.total_time:.2f}s")
+
+    def collect(self) -> "AnswerStream":
+        """Run the stream to the end without a consumer, for callers that want the whole answer"""
+        for _ in self:
+            pass
+        return self
+
+    def _decline(self) -> Iterator[str]:
+        logger.info(f"Retrieval confidence {self.confidence:.2f} below {self.min_confidence:.2f}, "
+                    f"answering without the LLM")
+        self.sources = []
+        self.answer = LOW_CONFIDENCE_RESPONSE
+        self.time_to_first_token = self.total_time = time.perf_counter() - self.started
+        yield self.answer
@@ -0,0 +1,253 @@
+"""Load, update and publish the knowledge base vector store"""
+
+import os
+import pickle
+import shutil
+import logging
+from datetime import datetime
+from typing import Optional, Tuple, List
+
+import faiss
+from langchain_community.vectorstores import FAISS
+
+from .docstore import SQLiteDocstore, DOCSTORE_FILENAME
+from .index_factory import (load_index_meta, apply_search_params, search_overrides_from_env,
+                            FLAT_INDEX_FILENAME, SERVING_INDEX_FILENAME, INDEX_META_FILENAME)
+from .ingestion_manifest import MANIFEST_FILENAME
+
+logger = logging.getLogger(__name__)
+
+DB_FAISS_PATH = "vectorstore/db_faiss"
+# Memory-map the serving index read-only so processes share it through the page cache
+FAISS_MMAP = os.getenv("FAISS_MMAP", "1") == "1"
+LEGACY_DOCSTORE_FILENAME = "index.pkl"
+
+# Each build is published to versions/<version>; CURRENT names the live one
+CURRENT_FILENAME = "CURRENT"
+VERSIONS_DIRNAME = "versions"
+WORK_SUFFIX = ".work"
+# Older versions are kept so processes still serving them are not pulled from under
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "3"))
+UNVERSIONED = "unversioned"
+
+
+def current_version(db_path: str = DB_FAISS_PATH) -> Optional[str]:
+    """Name of the published index version, or None for an unversioned store"""
+    try:
+        with open(os.path.join(db_path, CURRENT_FILENAME), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_path(db_path: str, version: str) -> str:
+    return os.path.join(db_path, VERSIONS_DIRNAME, version)
+
+
+def resolve_store_path(db_path: str = DB_FAISS_PATH) -> Tuple[str, str]:
+    """
+    Return (version, directory) of the store that is currently published
+
+    Stores written before versioning keep their files directly in db_path
+    and resolve to it with the version "unversioned".
+    """
+    version = current_version(db_path)
+    if version is None:
+        return UNVERSIONED, db_path
+    return version, version_path(db_path, version)
+
+
+def list_versions(db_path: str = DB_FAISS_PATH) -> List[str]:
+    """Published versions, oldest first"""
+    versions_dir = os.path.join(db_path, VERSIONS_DIRNAME)
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(name for name in os.listdir(versions_dir)
+                  if not name.endswith(WORK_SUFFIX) and os.path.isdir(os.path.join(versions_dir, name)))
+
+
+def begin_version(db_path: str = DB_FAISS_PATH) -> Tuple[str, str]:
+    """Pick a new version name and create its empty work directory"""
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+    work_path = version_path(db_path, version) + WORK_SUFFIX
+    shutil.rmtree(work_path, ignore_errors=True)
+    os.makedirs(work_path)
+    return version, work_path
+
+
+def publish_version(work_path: str, db_path: str, version: str, keep: int = INDEX_KEEP_VERSIONS):
+    """
+    Make a finished work directory the live index version
+
+    The directory is renamed into place and then CURRENT is replaced in one
+    rename, so readers see either the old version or the new one, never a mix.
+    """
+    os.replace(work_path, version_path(db_path, version))
+
+    tmp_path = os.path.join(db_path, f"{CURRENT_FILENAME}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(db_path, CURRENT_FILENAME))
+    logger.info(f"Published index version {version}")
+
+    _remove_unversioned_files(db_path)
+    prune_versions(db_path, keep)
+
+
+def prune_versions(db_path: str = DB_FAISS_PATH, keep: int = INDEX_KEEP_VERSIONS):
+    """Delete all but the newest keep versions, never the current one"""
+    current = current_version(db_path)
+    for version in list_versions(db_path)[:-keep or None]:
+        if version == current:
+            continue
+        # Open handles keep working on POSIX; on Windows a busy version is retried next publish
+        shutil.rmtree(version_path(db_path, version), ignore_errors=True)
+        logger.info(f"Removed index version {version}")
+
+
+def _remove_unversioned_files(db_path: str):
+    """Clear the files of a pre-versioning store once its data lives in a version"""
+    for name in (FLAT_INDEX_FILENAME, SERVING_INDEX_FILENAME, INDEX_META_FILENAME, DOCSTORE_FILENAME,
+                 LEGACY_DOCSTORE_FILENAME, MANIFEST_FILENAME):
+        path = os.path.join(db_path, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def read_index(path: str, mmap: bool = FAISS_MMAP) -> faiss.Index:
+    """
+    Read a faiss index, memory-mapped and read-only when possible
+
+    Inverted lists (IVF) and flat codes are mapped rather than copied onto the
+    heap; index types faiss cannot map are read normally.
+    """
+    if mmap:
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        try:
+            return faiss.read_index(path, flags)
+        except RuntimeError as e:
+            logger.warning(f"Could not memory-map {path}, reading it into memory: {e}")
+    return faiss.read_index(path)
+
+
+def serving_vectorstore(embedding_model, index: faiss.Index, docstore, index_to_docstore_id,
+                        normalize_queries: bool = False) -> FAISS:
+    """
+    FAISS wrapper over an already loaded index and docstore
+
+    Whether query vectors are L2-normalized before searching is kept in
+    normalize_queries, for code that searches the index directly. Ingestion
+    builds with FAISS's default of unnormalized vectors.
+    """
+    db = FAISS(embedding_model, index, docstore, index_to_docstore_id, normalize_L2=normalize_queries)
+    db.normalize_queries = normalize_queries
+    return db
+
+
+def normalizes_queries(vectorstore: FAISS) -> bool:
+    """Whether query vectors must be L2-normalized before searching vectorstore.index"""
+    return getattr(vectorstore, "normalize_queries", False)
+
+
+def load_legacy_docstore(db_path: str):
+    """
+    (docstore, index_to_docstore_id) from a store saved with FAISS.save_local
+
+    Only index.pkl is unpickled, as FAISS.load_local does, so an index that
+    is already open is not read a second time.
+    """
+    with open(os.path.join(db_path, LEGACY_DOCSTORE_FILENAME), "rb") as f:
+        return pickle.load(f)
+
+
+def load_vectorstore(db_path: str = DB_FAISS_PATH, embedding_model=None, mmap: bool = FAISS_MMAP) -> FAISS:
+    """
+    Open whichever index type ingestion built, with its docstore
+
+    db_path may be the store root, in which case the version named by
+    CURRENT is opened, or a single version directory. Search parameters
+    stored at build time can be overridden with FAISS_NPROBE /
+    FAISS_EF_SEARCH. Chunk text and metadata stay on disk in the SQLite
+    docstore and only the hit rows are read per query, so no pickle is
+    deserialized at startup. The store is meant for serving only.
+    """
+    _, db_path = resolve_store_path(db_path)
+    meta = load_index_meta(db_path)
+    params = dict(meta.get("params", {}), **search_overrides_from_env())
+
+    index = read_index(os.path.join(db_path, meta["index_file"]), mmap=mmap)
+    apply_search_params(index, params)
+
+    docstore_path = os.path.join(db_path, DOCSTORE_FILENAME)
+    if not os.path.exists(docstore_path):
+        logger.warning(f"No {DOCSTORE_FILENAME} in {db_path}, falling back to the pickled docstore. "
+                       f"Re-run ingestion to migrate it.")
+        docstore, index_to_docstore_id = load_legacy_docstore(db_path)
+        return serving_vectorstore(embedding_model, index, docstore, index_to_docstore_id)
+
+    docstore = SQLiteDocstore(docstore_path, read_only=True)
+    logger.info(f"Loaded {meta['index_type']} index with {index.ntotal} vectors from {db_path}")
+    return serving_vectorstore(embedding_model, index, docstore, docstore.position_map())
+
+
+def new_docstore(work_path: str) -> SQLiteDocstore:
+    """Create an empty writable docstore in the ingestion work directory"""
+    os.makedirs(work_path, exist_ok=True)
+    path = os.path.join(work_path, DOCSTORE_FILENAME)
+    if os.path.exists(path):
+        os.remove(path)
+    return SQLiteDocstore(path)
+
+
+def open_vectorstore_for_update(db_path: str, work_path: str, embedding_model) -> Optional[FAISS]:
+    """
+    Open a writable copy of the flat index and docstore in work_path
+
+    db_path is the directory of the published version to start from.
+    Serving processes keep reading it untouched while the copy is updated.
+    A store saved with the old pickled docstore is migrated to SQLite here.
+    """
+    if not os.path.exists(os.path.join(db_path, FLAT_INDEX_FILENAME)):
+        return None
+
+    os.makedirs(work_path, exist_ok=True)
+    docstore_path = os.path.join(db_path, DOCSTORE_FILENAME)
+    if os.path.exists(docstore_path):
+        shutil.copyfile(docstore_path, os.path.join(work_path, DOCSTORE_FILENAME))
+        docstore = SQLiteDocstore(os.path.join(work_path, DOCSTORE_FILENAME))
+        index = faiss.read_index(os.path.join(db_path, FLAT_INDEX_FILENAME))
+        return FAISS(embedding_model, index, docstore, docstore.load_positions())
+
+    logger.info("Migrating pickled docstore to SQLite")
+    legacy = FAISS.load_local(db_path, embedding_model, allow_dangerous_deserialization=True)
+    docstore = new_docstore(work_path)
+    docstore.add(dict(legacy.docstore._dict))
+    return FAISS(embedding_model, legacy.index, docstore, dict(legacy.index_to_docstore_id))
+
+
+def copy_store_files(source_path: str, work_path: str):
+    """Seed a work directory with the files of a published version, hard-linked when possible"""
+    for name in os.listdir(source_path):
+        source = os.path.join(source_path, name)
+        if not os.path.isfile(source):
+            continue
+        target = os.path.join(work_path, name)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+
+
+def publish_vectorstore(db: FAISS, work_path: str, db_path: str, version: str):
+    """
+    Write the flat index and docstore into the work directory and publish it
+
+    Published versions are never modified, so processes that have an older
+    version mapped or its docstore open keep a consistent view.
+    """
+    db.docstore.write_positions(db.index_to_docstore_id)
+    db.docstore.close()
+    faiss.write_index(db.index, os.path.join(work_path, FLAT_INDEX_FILENAME))
+    publish_version(work_path, db_path, version)
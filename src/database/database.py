@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 from .models import Base
@@ -41,10 +41,26 @@ class DatabaseManager:
         """Create all tables"""
         try:
             Base.metadata.create_all(bind=self.engine)
+            self.migrate_schema()
             logger.info("Database tables created successfully")
         except Exception as e:
             logger.error(f"Error creating database tables: {e}")
             raise
+
+    def migrate_schema(self):
+        """Add nullable columns that were added to the models after a table was created"""
+        inspector = inspect(self.engine)
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing or not column.nullable:
+                        continue
+                    column_type = column.type.compile(dialect=self.engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    logger.info(f"Added column {table.name}.{column.name}")
     
     def drop_tables(self):
         """Drop all tables (use with caution!)"""
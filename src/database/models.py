@@ -84,7 +84,10 @@ class ChatMessage(Base):
     # Message metadata
     timestamp = Column(DateTime, default=datetime.utcnow)
     response_time = Column(Float, nullable=True)  # Response time in seconds
+    time_to_first_token = Column(Float, nullable=True)  # Seconds until the first answer token
     confidence_score = Column(Float, nullable=True)  # AI confidence score
+    index_version = Column(String(64), nullable=True)  # Knowledge base version used for the answer
+    stage_timings = Column(Text, nullable=True)  # JSON {stage: milliseconds} for the turn
     
     # User interaction
     is_bookmarked = Column(Boolean, default=False)
@@ -7,10 +7,18 @@ from sqlalchemy import and_, or_, desc
 from .models import User, ChatSession, ChatMessage, UserFeedback, MedicalProfile, SessionExport
 from .database import get_db_session
 from ..utils.encryption import encrypt_data, decrypt_data
+from ..utils.tracing import current_trace, trace_stage
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Linear interpolation between closest ranks, as numpy.percentile does by default"""
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
 class UserManager:
     def __init__(self):
         pass
@@ -238,12 +246,27 @@ class SessionManager:
             'created_at': session_obj.created_at,
             'updated_at': session_obj.updated_at,
             'is_bookmarked': session_obj.is_bookmarked,
-            'session_summary': session_obj.session_summary,
+            'session_summary': self._summary_text(session_obj.session_summary),
             'language_used': session_obj.language_used,
             'is_shared': session_obj.is_shared,
             'shared_with_provider': session_obj.shared_with_provider
         }
     
+    @staticmethod
+    def _decode_memory(encrypted_memory: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Conversation memory JSON stored encrypted in session_summary"""
+        if not encrypted_memory:
+            return None
+        try:
+            return json.loads(decrypt_data(encrypted_memory))
+        except Exception as e:
+            logger.warning(f"Could not decrypt session memory: {e}")
+            return None
+
+    def _summary_text(self, encrypted_memory: Optional[str]) -> Optional[str]:
+        memory = self._decode_memory(encrypted_memory)
+        return (memory.get('summary') or None) if memory else None
+
     def create_session(self, user_id: str, session_name: str = None) -> Optional[Dict[str, Any]]:
         """Create a new chat session"""
         try:
@@ -285,20 +308,70 @@ class SessionManager:
         except Exception as e:
             logger.error(f"Error getting user sessions: {e}")
             return []
-    
+
+    def get_session(self, session_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get a chat session as a dictionary if the user is the owner"""
+        try:
+            with get_db_session() as session:
+                session_obj = session.query(ChatSession).filter(
+                    and_(
+                        ChatSession.id == session_id,
+                        ChatSession.user_id == user_id
+                    )
+                ).first()
+                return self._session_to_dict(session_obj)
+
+        except Exception as e:
+            logger.error(f"Error getting session {session_id}: {e}")
+            return None
+
+    def get_session_memory(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """The session's conversation memory (rolling summary and recent turns), read by primary key"""
+        try:
+            with get_db_session() as session:
+                row = session.query(ChatSession.session_summary).filter(
+                    ChatSession.id == session_id
+                ).first()
+                return self._decode_memory(row[0]) if row else None
+
+        except Exception as e:
+            logger.error(f"Error getting memory for session {session_id}: {e}")
+            return None
+
+    def save_session_memory(self, session_id: str, memory: Dict[str, Any]) -> bool:
+        """Encrypt and store the session's conversation memory in session_summary"""
+        try:
+            with get_db_session() as session:
+                encrypted_memory = encrypt_data(json.dumps(memory, separators=(",", ":")))
+                updated = session.query(ChatSession).filter(
+                    ChatSession.id == session_id
+                ).update({ChatSession.session_summary: encrypted_memory}, synchronize_session=False)
+                return updated > 0
+
+        except Exception as e:
+            logger.error(f"Error saving memory for session {session_id}: {e}")
+            return False
+
     def save_message(self, session_id: str, user_message: str, bot_response: str, 
                     source_documents: List[Any] = None, response_time: float = None,
-                    confidence_score: float = None) -> Optional[str]:
-        """Save a chat message and return message ID"""
+                    confidence_score: float = None, index_version: str = None,
+                    time_to_first_token: float = None) -> Optional[str]:
+        """Save a chat message and return message ID
+
+        Inside a traced turn the encryption and insert are timed too, and the
+        turn's stage breakdown is stored with the message.
+        """
+        trace = current_trace()
         try:
             with get_db_session() as session:
                 # Encrypt message content
-                encrypted_user_msg = encrypt_data(user_message)
-                encrypted_bot_response = encrypt_data(bot_response)
-                encrypted_sources = encrypt_data(json.dumps([
-                    {"content": doc.page_content, "metadata": doc.metadata} 
-                    for doc in source_documents
-                ])) if source_documents else None
+                with trace_stage("encrypt"):
+                    encrypted_user_msg = encrypt_data(user_message)
+                    encrypted_bot_response = encrypt_data(bot_response)
+                    encrypted_sources = encrypt_data(json.dumps([
+                        {"content": doc.page_content, "metadata": doc.metadata}
+                        for doc in source_documents
+                    ])) if source_documents else None
                 
                 new_message = ChatMessage(
                     session_id=session_id,
@@ -306,11 +379,20 @@ class SessionManager:
                     bot_response=encrypted_bot_response,
                     source_documents=encrypted_sources,
                     response_time=response_time,
-                    confidence_score=confidence_score
+                    time_to_first_token=time_to_first_token,
+                    confidence_score=confidence_score,
+                    index_version=index_version
                 )
                 
-                session.add(new_message)
-                session.flush()
+                with trace_stage("db_write"):
+                    session.add(new_message)
+                    session.flush()
+
+                if trace is not None:
+                    # Written in the same transaction as the insert, once db_write is known
+                    if new_message.response_time is None:
+                        new_message.response_time = trace.elapsed()
+                    new_message.stage_timings = json.dumps(trace.breakdown_ms(), separators=(",", ":"))
                 
                 # Get message ID before session closes
                 message_id = new_message.id
@@ -347,7 +429,11 @@ class SessionManager:
                             'timestamp': msg.timestamp,
                             'is_bookmarked': msg.is_bookmarked,
                             'user_rating': msg.user_rating,
-                            'confidence_score': msg.confidence_score
+                            'response_time': msg.response_time,
+                            'time_to_first_token': msg.time_to_first_token,
+                            'confidence_score': msg.confidence_score,
+                            'index_version': msg.index_version,
+                            'stage_timings': json.loads(msg.stage_timings) if msg.stage_timings else None
                         }
                         
                         if msg.source_documents:
@@ -368,6 +454,44 @@ class SessionManager:
             logger.error(f"Error getting session messages: {e}")
             return []
     
+    def get_stage_latency_percentiles(self, since: datetime = None, until: datetime = None,
+                                      percentiles: List[float] = (50, 95, 99)) -> Dict[str, Dict[str, float]]:
+        """Per-stage latency percentiles in milliseconds over messages in [since, until)
+
+        Defaults to the last 24 hours. Every stage seen in the window gets
+        {"count", "p50", "p95", "p99"}; "total" comes from response_time.
+        """
+        since = since or datetime.utcnow() - timedelta(hours=24)
+        try:
+            with get_db_session() as session:
+                query = session.query(ChatMessage.stage_timings, ChatMessage.response_time).filter(
+                    ChatMessage.timestamp >= since
+                )
+                if until is not None:
+                    query = query.filter(ChatMessage.timestamp < until)
+
+                samples: Dict[str, List[float]] = {}
+                for stage_timings, response_time in query.all():
+                    if response_time is not None:
+                        samples.setdefault("total", []).append(response_time * 1000)
+                    if not stage_timings:
+                        continue
+                    try:
+                        for stage, ms in json.loads(stage_timings).items():
+                            samples.setdefault(stage, []).append(float(ms))
+                    except ValueError:
+                        continue
+
+            return {
+                stage: {"count": len(values),
+                        **{f"p{q:g}": _percentile(sorted(values), q) for q in percentiles}}
+                for stage, values in samples.items()
+            }
+
+        except Exception as e:
+            logger.error(f"Error aggregating stage latencies: {e}")
+            return {}
+    
     def bookmark_message(self, message_id: str, user_id: str) -> bool:
         """Bookmark/unbookmark a message"""
         try:
@@ -19,15 +19,19 @@ class IntentClassifier:
 
     def predict(self, query: str) -> str:
         """Predicts the intent of a user query."""
+        return self.predict_with_score(query)[0]
+
+    def predict_with_score(self, query: str) -> tuple:
+        """Predicts the intent of a user query along with the classifier's confidence."""
         if not query:
-            return "unknown"
+            return "unknown", 0.0
         try:
             prediction = self.pipeline(query)
             # The pipeline returns a list of dictionaries, e.g., [{'label': 'symptom_inquiry', 'score': 0.99}]
-            return prediction[0]['label']
+            return prediction[0]['label'], float(prediction[0]['score'])
         except Exception as e:
             print(f"Error during intent prediction: {e}")
-            return "unknown"
+            return "unknown", 0.0
 
 # Create a single instance to be used by the app
 intent_classifier = IntentClassifier()
\ No newline at end of file
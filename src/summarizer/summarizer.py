@@ -6,6 +6,8 @@ import streamlit as st
 from pypdf import PdfReader
 import time
 
+from src.utils.pdf_loader import resolve_workers, extract_pdf_text_parallel
+
 # The model we'll use from the Hugging Face Hub
 API_URL = "https://api-inference.huggingface.co/models/facebook/bart-large-cnn"
 
@@ -57,11 +59,16 @@ def get_huggingface_summary(text: str) -> str:
         print(error_message)
         return error_message
 
-def extract_text_from_pdf(pdf_file) -> str:
+def extract_text_from_pdf(pdf_file, max_workers: int = None) -> str:
     """
     Extracts text content from an uploaded PDF file.
+    Page ranges are parsed on a process pool when more than one worker is configured.
     """
     try:
+        if resolve_workers(max_workers) > 1:
+            pdf_bytes = pdf_file.getvalue() if hasattr(pdf_file, "getvalue") else pdf_file.read()
+            return extract_pdf_text_parallel(pdf_bytes, max_workers=max_workers)
+
         pdf_reader = PdfReader(pdf_file)
         text = ""
         for page in pdf_reader.pages:
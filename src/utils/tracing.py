@@ -0,0 +1,75 @@
+"""Per-turn stage timing that code deep in the call stack can add to without passing it around"""
+
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """
+    Seconds spent in each named stage of one chat turn
+
+    Stages may nest (retrieve contains embed and vector_search), and a
+    stage entered more than once accumulates.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def breakdown_ms(self) -> Dict[str, float]:
+        """Compact form stored with the message: stage -> milliseconds, rounded to 0.1ms"""
+        return {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()}
+
+
+@contextmanager
+def start_trace() -> Iterator[Trace]:
+    """Make a new trace current for the duration of the block (one chat turn)"""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_stage(name: str) -> Iterator[None]:
+    """Time the block into the current trace; a no-op outside a traced turn"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
+
+
+def record_stage(name: str, seconds: Optional[float]):
+    """Add an already measured duration to the current trace"""
+    trace = _current_trace.get()
+    if trace is not None and seconds is not None:
+        trace.add(name, seconds)
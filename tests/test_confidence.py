@@ -0,0 +1,29 @@
+"""Retrieval confidence and the low-confidence fast path"""
+
+import os
+import sys
+
+import pytest
+
+for module in ("numpy", "faiss", "langchain_core"):
+    pytest.importorskip(module)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from src.chatbot.confidence import (confidence_from_sources, is_low_confidence, stamp_confidence,
+                                    CONFIDENCE_THRESHOLD)
+
+
+def test_no_hits_is_low_confidence():
+    assert confidence_from_sources([]) == 0.0
+    assert is_low_confidence(confidence_from_sources([]))
+    assert is_low_confidence(confidence_from_sources(None))
+
+
+def test_stamped_confidence_is_read_back():
+    docs = stamp_confidence([Document(page_content="Asthma narrows the airways.")], CONFIDENCE_THRESHOLD + 0.1)
+    assert not is_low_confidence(confidence_from_sources(docs))
+    # Sources a retriever did not stamp carry no opinion
+    assert confidence_from_sources([Document(page_content="unscored")]) is None
@@ -0,0 +1,68 @@
+"""Conversation memory folding runs off the request path"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.conversation_memory import ConversationMemory, ConversationMemoryStore, ConversationSummarizer
+
+
+class InMemorySessions:
+    def __init__(self):
+        self.memories = {}
+
+    def get_session_memory(self, session_id):
+        return self.memories.get(session_id)
+
+    def save_session_memory(self, session_id, memory):
+        self.memories[session_id] = memory
+        return True
+
+
+class BlockingSummarizer(ConversationSummarizer):
+    """Folds only once released, so a test can see the turn returned first"""
+
+    def __init__(self):
+        super().__init__(llm=None)
+        self.release = threading.Event()
+        self.folded = threading.Event()
+
+    def fold(self, summary, turns):
+        self.release.wait(5)
+        self.folded.set()
+        return f"{summary} {' '.join(turn['user'] for turn in turns)}".strip()
+
+
+def test_turns_are_saved_before_the_summary_is_folded():
+    sessions, summarizer = InMemorySessions(), BlockingSummarizer()
+    store = ConversationMemoryStore(sessions, summarizer, recent_turns=2)
+
+    for i in range(3):
+        assert store.record("s", f"question {i}", f"answer {i}")
+    # The third turn overflowed the window, but the summarizer has not run yet
+    assert not summarizer.folded.is_set()
+    assert len(store.load("s").recent) == 3
+
+    store.record("s", "question 3", "answer 3")
+    summarizer.release.set()
+    store.close(wait=True)
+
+    memory = store.load("s")
+    assert [turn["user"] for turn in memory.recent] == ["question 2", "question 3"]
+    assert memory.summary == "question 0 question 1"
+    assert memory.summarized_turns == 2
+
+
+def test_follow_ups_are_retrieved_with_the_previous_question():
+    memory = ConversationMemory(recent=[{"user": "What is metformin used for?", "assistant": "Type 2 diabetes."}])
+
+    assert memory.retrieval_query("What are its side effects?") == \
+        "What is metformin used for? What are its side effects?"
+    assert ConversationMemory().retrieval_query("What is asthma?") == "What is asthma?"
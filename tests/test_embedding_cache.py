@@ -0,0 +1,102 @@
+"""Crash recovery of the on-disk embedding cache"""
+
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.embedding_cache import EmbeddingCache, text_digest, DIGEST_SIZE
+
+MODEL = "test-model"
+DIM = 4
+
+
+def vector(seed):
+    return [float(seed)] * DIM
+
+
+def put(cache, *texts):
+    cache.put_many([text_digest(text) for text in texts], [vector(i + len(cache)) for i, text in enumerate(texts)])
+
+
+def get(cache, text):
+    return cache.get_many([text_digest(text)])[0]
+
+
+@pytest.mark.parametrize("orphan_bytes", [DIM * 4, DIM * 4 * 2 + 3, 5])
+def test_orphan_vector_rows_are_dropped_on_load(tmp_path, orphan_bytes):
+    cache = EmbeddingCache(str(tmp_path), MODEL)
+    put(cache, "a", "b")
+
+    # Crash after the vectors append but before the keys append: whole or partial rows, no keys
+    with open(cache.vectors_path, "ab") as f:
+        f.write(b"\x7f" * orphan_bytes)
+
+    reopened = EmbeddingCache(str(tmp_path), MODEL)
+    assert len(reopened) == 2
+    assert os.path.getsize(reopened.vectors_path) == 2 * DIM * 4
+
+    put(reopened, "c")
+    again = EmbeddingCache(str(tmp_path), MODEL)
+    for cache_view in (reopened, again):
+        assert get(cache_view, "a").tolist() == vector(0)
+        assert get(cache_view, "b").tolist() == vector(1)
+        assert get(cache_view, "c").tolist() == vector(2)
+
+
+def test_orphan_keys_are_dropped_on_load(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL)
+    put(cache, "a")
+    with open(cache.keys_path, "ab") as f:
+        f.write(text_digest("lost") + text_digest("lost")[:3])
+
+    reopened = EmbeddingCache(str(tmp_path), MODEL)
+    assert len(reopened) == 1
+    assert get(reopened, "lost") is None
+    assert os.path.getsize(reopened.keys_path) == DIGEST_SIZE
+
+    put(reopened, "b")
+    assert get(EmbeddingCache(str(tmp_path), MODEL), "b").tolist() == vector(1)
+
+
+def test_duplicate_rows_do_not_shift_later_appends(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL)
+    cache.put_many([text_digest("a")], [vector(0)])
+    # Rows two writers could both have appended: "a" again, then "b"
+    with open(cache.vectors_path, "ab") as f:
+        f.write(np.asarray([vector(0), vector(1)], dtype=np.float32).tobytes())
+    with open(cache.keys_path, "ab") as f:
+        f.write(text_digest("a") + text_digest("b"))
+
+    reopened = EmbeddingCache(str(tmp_path), MODEL)
+    assert len(reopened) == 2
+    reopened.put_many([text_digest("c")], [vector(2)])
+    assert os.path.getsize(reopened.keys_path) == 4 * DIGEST_SIZE
+
+    for cache_view in (reopened, EmbeddingCache(str(tmp_path), MODEL)):
+        assert get(cache_view, "a").tolist() == vector(0)
+        assert get(cache_view, "b").tolist() == vector(1)
+        assert get(cache_view, "c").tolist() == vector(2)
+
+
+def test_writers_sharing_a_directory_see_each_others_rows(tmp_path):
+    first = EmbeddingCache(str(tmp_path), MODEL)
+    second = EmbeddingCache(str(tmp_path), MODEL)
+
+    first.put_many([text_digest("a"), text_digest("b")], [vector(0), vector(1)])
+    # second loaded before first wrote; "a" must not be appended again
+    second.put_many([text_digest("a"), text_digest("c")], [vector(0), vector(2)])
+    first.put_many([text_digest("d")], [vector(3)])
+
+    reopened = EmbeddingCache(str(tmp_path), MODEL)
+    assert len(reopened) == 4
+    assert os.path.getsize(reopened.keys_path) == 4 * DIGEST_SIZE
+    for cache_view in (first, reopened):
+        for seed, text in enumerate("abcd"):
+            assert get(cache_view, text).tolist() == vector(seed)
+    assert get(second, "c").tolist() == vector(2)
@@ -0,0 +1,53 @@
+"""The int8 ONNX backend embeds like the sentence-transformers model it was exported from"""
+
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+for module in ("onnxruntime", "torch", "transformers", "langchain_huggingface"):
+    pytest.importorskip(module)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.onnx_embeddings import OnnxEmbeddings, load_embedding_model, EMBEDDING_MODEL_NAME
+
+# Same floor bench_embeddings.py enforces with --min-cosine
+MIN_COSINE = 0.98
+
+SENTENCES = [
+    "What are the symptoms of type 2 diabetes?",
+    "How does cataract form?",
+    "Asthma is a chronic condition in which the airways narrow and swell and may produce extra mucus, "
+    "making breathing difficult and triggering coughing, wheezing and shortness of breath.",
+    "Is it safe to take ibuprofen with paracetamol?",
+    "Thanks, goodbye.",
+]
+
+
+@pytest.fixture(scope="module")
+def onnx_model(tmp_path_factory):
+    # A small batch size so length sorting spreads the sentences over several batches
+    return OnnxEmbeddings(EMBEDDING_MODEL_NAME, model_dir=str(tmp_path_factory.mktemp("onnx")), batch_size=2)
+
+
+@pytest.fixture(scope="module")
+def torch_model():
+    return load_embedding_model(EMBEDDING_MODEL_NAME, "torch")
+
+
+def test_documents_match_the_torch_model(onnx_model, torch_model):
+    expected = np.asarray(torch_model.embed_documents(SENTENCES), dtype=np.float32)
+    actual = np.asarray(onnx_model.embed_documents(SENTENCES), dtype=np.float32)
+
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(np.linalg.norm(actual, axis=1), 1.0, atol=1e-4)
+    assert np.sum(actual * expected, axis=1).min() >= MIN_COSINE
+
+
+def test_queries_match_the_torch_model(onnx_model, torch_model):
+    for sentence in SENTENCES[:2]:
+        expected = np.asarray(torch_model.embed_query(sentence), dtype=np.float32)
+        actual = np.asarray(onnx_model.embed_query(sentence), dtype=np.float32)
+        assert float(actual @ expected) >= MIN_COSINE
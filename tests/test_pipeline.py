@@ -0,0 +1,57 @@
+"""ChatPipeline turns with the index and LLM replaced by stand-ins"""
+
+import os
+import sys
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("numpy", "faiss", "langchain", "langchain_community", "langchain_mistralai"):
+    pytest.importorskip(module)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.chatbot.pipeline import ChatPipeline, PERSONAL_INQUIRY_INTENT, PERSONAL_INQUIRY_RESPONSE
+from src.chatbot.single_flight import SingleFlight
+
+
+class FixedIndex:
+    @contextmanager
+    def acquire(self):
+        yield SimpleNamespace(version="v1", chain=None)
+
+
+class PersonalInquiryClassifier:
+    def predict_with_score(self, query):
+        return PERSONAL_INQUIRY_INTENT, 0.9
+
+
+def test_personal_inquiry_keeps_the_callers_session():
+    pipeline = ChatPipeline(index=None, classifier=PersonalInquiryClassifier(), coalesce=False)
+
+    result = pipeline.run("I have been feeling unwell", session_id="session-1",
+                          session_factory=lambda: pytest.fail("no session should be created"))
+
+    assert result.route == PERSONAL_INQUIRY_INTENT
+    assert result.answer == PERSONAL_INQUIRY_RESPONSE
+    assert result.session_id == "session-1"
+
+
+def test_coalesced_turn_answers_itself_when_the_leader_stalls(monkeypatch):
+    flights = SingleFlight(wait_seconds=0.01)
+    # A leader for the same query and index version that never finishes
+    flights.join("What is asthma?", "v1")
+    pipeline = ChatPipeline(index=FixedIndex(), single_flight=flights)
+
+    def generate(snapshot, result, on_token=None, memory=None):
+        result.answer = "Asthma is a chronic condition of the airways."
+        return SimpleNamespace(answer=result.answer, sources=[], low_confidence=False)
+
+    monkeypatch.setattr(pipeline, "_generate", generate)
+    result = pipeline.run("What is asthma?")
+
+    assert result.error is None
+    assert result.answer == "Asthma is a chronic condition of the airways."
+    assert not result.coalesced
+    assert flights.stats()["timeouts"] == 1